@@ -1,87 +1,247 @@
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage
-import pandas as pd
+import asyncio
+import os
+import threading
+from datetime import datetime
+from tools import tracing
+from tools.context_builder import DEFAULT_TOKEN_BUDGET, SymbolIndex, build_context
+from tools.fact_answers import answer_factual_question
+from tools.history_store import HistoryStore
+from tools.llm_cache import get_llm_cache, snapshot_hash
+from tools.llm_clients import SharedClient, human_message
+from tools.portfolio import get_portfolio
 from tools.portfolio_calculator import calculate_portfolio_value
+from tools.risk import DEFAULT_BENCHMARK, RISK_PATTERN, format_risk_summary, portfolio_risk
 from tools.stock_recommender import StockRecommender
 
 class StockAdvisor:
-    def __init__(self, file_path: str, api_key: str):
+    # stream_usage reports token counts on streamed responses too
+    llm = SharedClient("chat", stream_usage=True)
+
+    def __init__(self, file_path: str, api_key: str, background_refresh: bool = True,
+                 context_token_budget: int = DEFAULT_TOKEN_BUDGET, fast_path: bool = True):
         """
         Initializes the StockAdvisor with stock data and an API key.
 
+        The last stored recommendations are available immediately;
+        fresh ones are computed in a background thread unless ``background_refresh``
+        is False, in which case the refresh runs before the constructor returns.
+
         Args:
             file_path (str): Path to the Excel file containing stock data.
             api_key (str): OpenAI API key for LangGraph interaction.
+            background_refresh (bool): Refresh recommendations without blocking startup.
+            context_token_budget (int): Maximum estimated tokens of portfolio context per prompt.
+            fast_path (bool): Answer factual questions (prices, values, recommendations)
+                directly from the portfolio data instead of asking the LLM.
         """
         self.file_path = file_path
-        self.llm = ChatOpenAI(model="gpt-4", openai_api_key=api_key)
-        self.recommender = StockRecommender()
+        self.api_key = api_key
+        self.context_token_budget = context_token_budget
+        self.fast_path = fast_path
+        self.last_context = None
+        self._symbol_index = None
+        self._indexed_tickers = None
+        self.recommender = StockRecommender(
+            history_store=HistoryStore(os.getenv("HISTORY_STORE_DIR", os.path.join(".market_data", "history")))
+        )
+
+        self.recommendations = {}
+        self.recommendations_as_of = None
+        self._refresh_thread = None
+        self._refresh_lock = threading.Lock()
+        self._load_persisted_recommendations()
+
+        if background_refresh:
+            self.start_refresh()
+        else:
+            self.refresh_recommendations()
+
+    def _load_persisted_recommendations(self):
+        """Loads the last stored recommendations, timestamped with when they were written."""
+        recommendations = self._read_recommendations()
+        if "error" not in recommendations:
+            portfolio = get_portfolio(self.file_path)
+            self.recommendations = recommendations
+            self.recommendations_as_of = portfolio.derived.updated_at("Recommendation") or portfolio.modified_at
+
+    @tracing.traced("refresh_recommendations")
+    def refresh_recommendations(self):
+        """Recomputes recommendations (re-scoring only changed tickers) and persists them."""
+        with self._refresh_lock:
+            recommendations = self.recommender.update_excel_with_recommendations(self.file_path)
+            if recommendations is not None:
+                self.recommendations = recommendations
+                self.recommendations_as_of = datetime.now()
+
+    def start_refresh(self):
+        """Starts a background recommendation refresh unless one is already running."""
+        if self.is_refreshing:
+            return
+        self._refresh_thread = threading.Thread(target=self.refresh_recommendations, daemon=True)
+        self._refresh_thread.start()
+
+    @property
+    def is_refreshing(self) -> bool:
+        return self._refresh_thread is not None and self._refresh_thread.is_alive()
+
+    def wait_for_refresh(self, timeout: float = None):
+        """Blocks until the running background refresh (if any) has finished."""
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout)
+
+    def _read_recommendations(self):
+        try:
+            recommendations = get_portfolio(self.file_path).recommendation_map()
+            if not recommendations:
+                raise ValueError("Excel file must contain 'Ticker' and 'Recommendation' columns.")
 
-        self.recommender.update_excel_with_recommendations(self.file_path)
+            return recommendations
+        except Exception as e:
+            return {"error": f"Failed to read recommendations: {e}"}
 
     def get_stock_recommendations(self):
         """
-        Reads recommendations from the updated Excel file.
+        Returns the last known recommendations, reading the Excel file if none are loaded yet.
 
         Returns:
             dict: A dictionary of recommendations for all stocks.
         """
-        try:
-            df = pd.read_excel(self.file_path)
-            if "Ticker" not in df.columns or "Recommendation" not in df.columns:
-                raise ValueError("Excel file must contain 'Ticker' and 'Recommendation' columns.")
+        if self.recommendations:
+            return dict(self.recommendations)
+        return self._read_recommendations()
 
-            return dict(zip(df["Ticker"], df["Recommendation"]))
-        except Exception as e:
-            return {"error": f"Failed to read recommendations: {e}"}
-
-    def ask_stock_question(self, question: str) -> str:
+    def ask_stock_question(self, question: str, portfolio_data: dict = None) -> str:
         """
         Uses LangChain to generate a response to stock-related questions.
 
+        Factual questions are answered directly from the portfolio data.
+
         Args:
             question (str): User's query about the stocks.
+            portfolio_data (dict): Result of calculate_portfolio_value, if already computed.
 
         Returns:
             str: The response from ChatGPT.
         """
-        portfolio_data = calculate_portfolio_value(self.file_path)
+        if portfolio_data is None:
+            portfolio_data = calculate_portfolio_value(self.file_path)
 
         if not portfolio_data:
             return "Error: Could not retrieve portfolio data."
 
-        stock_values = portfolio_data["stocks"]
-        quantities = portfolio_data["quantities"]
-        total_value = portfolio_data["total_value"]
+        answer = self.answer_directly(question, portfolio_data)
+        if answer is not None:
+            return answer
+
+        # Identical questions against an unchanged portfolio are answered from the cache
+        messages, snapshot = self._build_messages(question, portfolio_data)
+        return get_llm_cache().invoke(self.llm, messages, snapshot=snapshot, scope=f"stock:{self.file_path}")
 
-        # Calculate stock prices
-        stock_prices = {ticker: stock_values[ticker] / quantities[ticker] for ticker in stock_values}
+    async def astream_stock_question(self, question: str, portfolio_data: dict = None):
+        """
+        Streams the response to a stock-related question token by token.
 
-        # Read stock recommendations from Excel
+        Args:
+            question (str): User's query about the stocks.
+            portfolio_data (dict): Result of calculate_portfolio_value, if already computed.
+
+        Yields:
+            str: Chunks of the response as they arrive from ChatGPT.
+        """
+        if portfolio_data is None:
+            portfolio_data = await asyncio.to_thread(calculate_portfolio_value, self.file_path)
+
+        if not portfolio_data:
+            yield "Error: Could not retrieve portfolio data."
+            return
+
+        answer = self.answer_directly(question, portfolio_data)
+        if answer is not None:
+            yield answer
+            return
+
+        messages, snapshot = self._build_messages(question, portfolio_data)
+        async for token in get_llm_cache().astream(self.llm, messages, snapshot=snapshot, scope=f"stock:{self.file_path}"):
+            yield token
+
+    def _index_for(self, tickers: set) -> SymbolIndex:
+        """Returns the symbol index, rebuilding it only when the portfolio's tickers change."""
+        if tickers != self._indexed_tickers:
+            self._symbol_index = SymbolIndex(tickers)
+            self._indexed_tickers = tickers
+        return self._symbol_index
+
+    def _question_data(self, portfolio_data: dict):
+        """Returns the last known recommendations, their timestamp label and the symbol index."""
         recommendations = self.get_stock_recommendations()
-        recommendation_str = "\n".join([f"{ticker}: {rec}" for ticker, rec in recommendations.items()])
-
-        stock_prices_str = "\n".join([f"{ticker}: {round(price, 2)}" for ticker, price in stock_prices.items()])
-        stock_values_str = "\n".join([f"{ticker}: {round(value, 2)}" for ticker, value in stock_values.items()])
-
-        # Prepare context for the prompt
-        context = (
-            f"Here is the stock data:\n\n"
-            f"Stock Prices:\n{stock_prices_str}\n\n"
-            f"Stock Values:\n{stock_values_str}\n\n"
-            f"Total Portfolio Value: {round(total_value, 2)}\n\n"
-            f"Stock Recommendations:\n{recommendation_str}\n\n"
-            f"You can now ask questions about this portfolio."
-        )
+        known = {} if "error" in recommendations else recommendations
+        as_of = self.recommendations_as_of.strftime("%Y-%m-%d %H:%M") if self.recommendations_as_of else "unknown"
+        if self.is_refreshing:
+            as_of += " (refresh in progress)"
+        return recommendations, known, as_of, self._index_for(set(portfolio_data["stocks"]) | set(known))
+
+    def answer_directly(self, question: str, portfolio_data: dict):
+        """
+        Answers price, position value, total value and recommendation questions without the LLM.
+
+        Args:
+            question (str): User's query about the stocks.
+            portfolio_data (dict): Result of calculate_portfolio_value.
+
+        Returns:
+            str: The templated answer, or None if the question needs the LLM.
+        """
+        if not self.fast_path:
+            return None
+        with tracing.span("stock.fast_path") as span:
+            _, known, as_of, index = self._question_data(portfolio_data)
+            answer = answer_factual_question(question, portfolio_data, known, as_of, index)
+            span.set("answered", answer is not None)
+            tracing.count("fast_path.hits" if answer is not None else "fast_path.misses")
+            return answer
+
+    def risk_summary(self, portfolio_data: dict, benchmark: str = DEFAULT_BENCHMARK):
+        """
+        Computes volatility, beta, VaR/CVaR, drawdowns and correlations of the holdings.
+
+        Uses the daily history already stored for the held tickers; only the
+        benchmark's history is brought up to date first.
+
+        Args:
+            portfolio_data (dict): Result of calculate_portfolio_value.
+            benchmark (str): Ticker betas are measured against.
+
+        Returns:
+            dict: PortfolioRisk.summary(), or None if there is not enough history.
+        """
+        store = self.recommender.history_store
+        try:
+            store.update(benchmark)
+        except Exception as e:
+            print(f"Could not update {benchmark} history: {e}")
+        try:
+            return portfolio_risk(store, portfolio_data, benchmark).summary()
+        except ValueError as e:
+            print(f"Risk summary unavailable: {e}")
+            return None
+
+    def _build_messages(self, question: str, portfolio_data: dict):
+        """Builds the prompt messages and the snapshot hash of the data they contain."""
+        recommendations, known, as_of, index = self._question_data(portfolio_data)
+
+        # Risk questions also get the portfolio's risk figures
+        risk = self.risk_summary(portfolio_data) if RISK_PATTERN.search(question) else None
+        sections = [format_risk_summary(risk)] if risk else []
+
+        # Only the rows the question needs, within the token budget
+        built = build_context(question, portfolio_data, known, as_of, index, self.context_token_budget, sections)
+        self.last_context = {key: value for key, value in built.items() if key != "context"}
 
         prompt = (
-            f"{context}"
+            f"{built['context']}"
             f"The user has asked the following question about their portfolio:\n"
             f"{question}\n\n"
             f"Please respond clearly and concisely."
         )
 
-        messages = [HumanMessage(content=prompt)]
-        response = self.llm.invoke(messages)
-
-        return response.content if hasattr(response, "content") else str(response)
+        return [human_message(prompt)], snapshot_hash(portfolio_data, recommendations, sections)
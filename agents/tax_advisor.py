@@ -1,30 +1,102 @@
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage
+import threading
+from tools import tracing
+from tools.document_index import DEFAULT_TOP_K, DocumentIndex, default_tax_index, format_passages
+from tools.llm_cache import get_llm_cache
+from tools.llm_clients import SharedClient, human_message
+from tools.portfolio import get_portfolio
 from tools.tax_analyser import TaxAnalyser
+from tools.withdrawal_planner import WithdrawalPlanner, summarize_plan
 
 class TaxAdvisor:
-    def __init__(self, api_key: str):
+    llm = SharedClient("chat", stream_usage=True)
+
+    def __init__(self, api_key: str, document_index: DocumentIndex = None, top_k: int = DEFAULT_TOP_K):
         """
         Initializes the TaxAdvisor agent.
 
         Args:
             api_key (str): OpenAI API key for tax analysis.
+            document_index (DocumentIndex): Tax documents to ground answers in. Defaults
+                to the index of TAX_DOCUMENTS_DIR, if that is set, which is built on
+                the first retrieval rather than here.
+            top_k (int): Passages retrieved per question.
         """
+        self.api_key = api_key
         self.tax_analyser = TaxAnalyser(api_key)
-        self.llm = ChatOpenAI(model="gpt-4", openai_api_key=api_key)
+        self._document_index = document_index
+        self._index_loaded = document_index is not None
+        self._index_lock = threading.Lock()
+        self.top_k = top_k
+
+    @property
+    def document_index(self):
+        """The tax document index, or None; the default one is brought up to date on first access."""
+        if not self._index_loaded:
+            with self._index_lock:
+                if not self._index_loaded:
+                    self._document_index = default_tax_index(self.api_key)
+                    self._index_loaded = True
+        return self._document_index
 
-    def analyse_tax_strategy(self, recommendations: dict, stock_data: dict) -> str:
+    def analyse_tax_strategy(self, recommendations: dict, stock_data: dict, lots=None, prices: dict = None,
+                             sells: dict = None, file_path: str = None) -> str:
         """
         Uses the tax_analyser tool to determine a tax-efficient selling strategy.
 
         Args:
             recommendations (dict): Stock recommendations (buy/hold/sell).
             stock_data (dict): Stock details including buy price & holding period.
+            lots (TaxLots): Every tax lot of the portfolio, if known.
+            prices (dict): Current price per ticker, used to compute realized gains.
+            sells (dict): Shares to sell per ticker; whole positions by default.
+            file_path (str): Portfolio file whose share counts size the lots when
+                ``lots`` is not given.
 
         Returns:
             str: Tax-efficient stock selling strategy.
         """
-        return self.tax_analyser.analyse_selling_strategy(recommendations, stock_data)
+        quantities = None
+        if lots is None and file_path is not None:
+            portfolio = get_portfolio(file_path)
+            quantities = dict(zip(portfolio.unique_tickers, portfolio.position_quantities().tolist()))
+        return self.tax_analyser.analyse_selling_strategy(recommendations, stock_data, lots=lots, prices=prices,
+                                                          sells=sells, quantities=quantities)
+
+    def plan_withdrawals(self, balance: float, age: int, question: str = None, scenarios: int = 5000,
+                         seed: int = None, **planner_kwargs) -> str:
+        """
+        Simulates IRA withdrawals and RMDs locally and asks ChatGPT to explain the outcome.
+
+        The balances, RMDs and taxes come from WithdrawalPlanner across ``scenarios``
+        market return paths; the LLM only summarizes the percentile results.
+
+        Args:
+            balance (float): Current traditional IRA balance.
+            age (int): Age reached this year.
+            question (str): The user's question, if any, to focus the explanation.
+            scenarios (int): Number of simulated return paths.
+            seed (int): Random seed for reproducible results.
+            **planner_kwargs: Passed to WithdrawalPlanner (years, filing_status,
+                other_income, strategy, target_bracket, annual_withdrawal, ...).
+
+        Returns:
+            str: ChatGPT's explanation of the simulated plan.
+        """
+        try:
+            plan = WithdrawalPlanner(balance, age, **planner_kwargs).plan(scenarios, seed=seed)
+        except ValueError as e:
+            return f"Error: Could not plan withdrawals: {e}"
+
+        prompt = f"""
+        You are a retirement tax expert. A retiree's IRA withdrawals were simulated across
+        market return scenarios. The figures below are already calculated; explain what they
+        mean in plain language, and do not recalculate them.
+
+        {summarize_plan(plan)}
+
+        {f"The user asked: {question}" if question else "Summarize the plan and its main risks."}
+        """
+        return get_llm_cache().invoke(self.llm, [human_message(prompt)], scope="tax")
 
     def ask_tax_question(self, question: str) -> str:
         """
@@ -36,15 +108,46 @@ class TaxAdvisor:
         Returns:
             str: ChatGPT's response.
         """
+        return get_llm_cache().invoke(self.llm, self._build_messages(question), scope="tax")
+
+    async def astream_tax_question(self, question: str):
+        """
+        Streams the response to a tax-related question token by token.
+
+        Args:
+            question (str): User's tax-related query.
+
+        Yields:
+            str: Chunks of the response as they arrive from ChatGPT.
+        """
+        async for token in get_llm_cache().astream(self.llm, self._build_messages(question), scope="tax"):
+            yield token
+
+    def retrieve(self, question: str) -> list:
+        """
+        Finds the tax document passages most relevant to a question.
+
+        Returns:
+            list: Search results from the document index; empty without an index.
+        """
+        if self.document_index is None:
+            return []
+        try:
+            return self.document_index.search(question, self.top_k)
+        except Exception as e:
+            print(f"Error searching tax documents: {e}")
+            tracing.record_error(e)
+            return []
+
+    def _build_messages(self, question: str) -> list:
         prompt = f"""
         You are a tax expert with deep knowledge of stock taxation.
         The user has a tax-related question:
         
         {question}
 
+        {format_passages(self.retrieve(question))}
+
         Provide a clear and accurate answer, following best tax practices.
         """
-        messages = [HumanMessage(content=prompt)]
-        response = self.llm.invoke(messages)
-
-        return response.content if hasattr(response, "content") else str(response)
+        return [human_message(prompt)]
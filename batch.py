@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from agents.tax_advisor import TaxAdvisor
+from tools import tracing
+from tools.portfolio import get_portfolio
+from tools.portfolio_calculator import calculate_portfolio_value
+from tools.stock_fetcher import get_stock_prices
+from workflow import PortfolioWorkflow, shared_classifier
+
+DEFAULT_CONCURRENCY = 8
+
+
+def job_id(path: str, question: str) -> str:
+    """Stable identifier of one portfolio × question pair, used to resume a run."""
+    return hashlib.sha1(f"{path}\n{question}".encode()).hexdigest()[:16]
+
+
+def load_manifest(manifest_path: str) -> list:
+    """
+    Reads a batch manifest and expands it into jobs.
+
+    The manifest is a JSON object with "portfolios" (a list of file paths, or a
+    mapping of name to path) and "questions" (asked of every portfolio). A
+    portfolio may also be {"name", "path", "questions"} to ask it its own
+    questions. Relative paths are resolved against the manifest's directory.
+
+    Args:
+        manifest_path (str): Path to the manifest file.
+
+    Returns:
+        list: Job dicts with "id", "portfolio", "path" and "question", grouped by portfolio.
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    portfolios = manifest.get("portfolios") or []
+    if isinstance(portfolios, dict):
+        portfolios = [{"name": name, "path": path} for name, path in portfolios.items()]
+    questions = manifest.get("questions") or []
+    base = os.path.dirname(os.path.abspath(manifest_path))
+
+    jobs = []
+    for entry in portfolios:
+        entry = {"path": entry} if isinstance(entry, str) else entry
+        path = os.path.normpath(os.path.join(base, entry["path"]))
+        name = entry.get("name") or entry["path"]
+        for question in entry.get("questions") or questions:
+            question = question.strip()
+            if question:
+                jobs.append({"id": job_id(path, question), "portfolio": name, "path": path, "question": question})
+
+    if not jobs:
+        raise ValueError(f"Manifest {manifest_path} defines no portfolio questions.")
+    return jobs
+
+
+def completed_jobs(output_path: str) -> set:
+    """
+    Ids of the jobs already answered in an earlier run's output.
+
+    Failed jobs are not counted, so a resumed run retries them. A line cut off by
+    an interruption is ignored.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "answer" in record:
+                done.add(record["id"])
+    return done
+
+
+class BatchRunner:
+    def __init__(self, api_key: str, concurrency: int = DEFAULT_CONCURRENCY):
+        """
+        Answers many questions against many portfolios without user interaction.
+
+        Prices for every ticker in the batch are fetched once up front, so
+        portfolios holding the same tickers share them; fundamentals are shared
+        through the market data cache. All workflows reuse one TaxAdvisor, one
+        trained query classifier and the shared LLM clients, and at most ``concurrency`` questions are answered at a time.
+
+        Args:
+            api_key (str): OpenAI API key.
+            concurrency (int): Questions answered in parallel.
+        """
+        self.api_key = api_key
+        self.concurrency = max(1, concurrency)
+        self.tax_agent = TaxAdvisor(api_key)
+        self.classifier = shared_classifier(api_key)
+        self.prices = {}
+        self._portfolios = {}
+        self._remaining = {}
+
+    def prefetch_prices(self, paths) -> dict:
+        """Fetches the prices of every ticker held across ``paths`` in one batched download."""
+        tickers = []
+        for path in dict.fromkeys(paths):
+            try:
+                tickers.extend(get_portfolio(path).unique_tickers)
+            except Exception as e:
+                # The portfolio's own jobs report the error
+                print(f"Error reading portfolio {path}: {e}")
+        with tracing.span("batch.prefetch_prices") as span:
+            self.prices = get_stock_prices(tickers)
+            span.set("tickers", len(self.prices))
+        return self.prices
+
+    def _load(self, path: str):
+        """Builds the workflow for one portfolio and values it from the shared prices."""
+        workflow = PortfolioWorkflow(path, self.api_key, tax_agent=self.tax_agent, classifier=self.classifier)
+        portfolio_data = calculate_portfolio_value(path, prices=self.prices)
+        if portfolio_data is None:
+            raise RuntimeError(f"Could not retrieve portfolio data for {path}")
+        # Nightly reports should use today's recommendations, not the last stored ones
+        workflow.stock_agent.wait_for_refresh()
+        return workflow, portfolio_data
+
+    async def _portfolio(self, path: str):
+        """Loads each portfolio once, however many of its questions run concurrently."""
+        if path not in self._portfolios:
+            self._portfolios[path] = asyncio.ensure_future(asyncio.to_thread(self._load, path))
+        return await self._portfolios[path]
+
+    async def run_job(self, job: dict) -> dict:
+        """Answers one job and returns its output record; errors are recorded, not raised."""
+        start = time.perf_counter()
+        record = {key: job[key] for key in ("id", "portfolio", "question")}
+        try:
+            with tracing.span("batch.job", portfolio=job["portfolio"]):
+                workflow, portfolio_data = await self._portfolio(job["path"])
+                record["answer"] = await asyncio.to_thread(workflow.handle_query, job["question"], portfolio_data)
+        except Exception as e:
+            print(f"Error answering {job['id']} ({job['portfolio']}): {e}")
+            tracing.record_error(e)
+            record["error"] = str(e)
+        finally:
+            self._release(job["path"])
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        record["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        return record
+
+    def _release(self, path: str):
+        """Drops a portfolio's workflow once its last question has been answered."""
+        self._remaining[path] -= 1
+        if not self._remaining[path]:
+            self._portfolios.pop(path, None)
+
+    async def run(self, jobs: list, output_path: str) -> dict:
+        """
+        Runs the jobs, appending one JSON line per job to ``output_path`` as each finishes.
+
+        Jobs already answered in ``output_path`` are skipped, so an interrupted
+        run picks up where it stopped when started again with the same output.
+
+        Args:
+            jobs (list): Jobs from load_manifest.
+            output_path (str): JSONL file receiving the results.
+
+        Returns:
+            dict: Counts of jobs, skipped, completed and failed, tickers priced and seconds taken.
+        """
+        start = time.perf_counter()
+        done = completed_jobs(output_path)
+        pending = [job for job in jobs if job["id"] not in done]
+        self._remaining = {}
+        for job in pending:
+            self._remaining[job["path"]] = self._remaining.get(job["path"], 0) + 1
+
+        if pending:
+            await asyncio.to_thread(self.prefetch_prices, list(self._remaining))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        completed = failed = 0
+
+        async def bounded(job):
+            async with semaphore:
+                return await self.run_job(job)
+
+        with open(output_path, "a") as out:
+            if out.tell() and not _ends_with_newline(output_path):
+                out.write("\n")  # the previous run stopped mid-line
+            for finished in asyncio.as_completed([bounded(job) for job in pending]):
+                record = await finished
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+                if "error" in record:
+                    failed += 1
+                else:
+                    completed += 1
+
+        return {
+            "jobs": len(jobs),
+            "skipped": len(jobs) - len(pending),
+            "completed": completed,
+            "failed": failed,
+            "tickers": len(self.prices),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+async def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Answer a manifest of questions against many portfolios.")
+    parser.add_argument("manifest", help="JSON manifest with 'portfolios' and 'questions'")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL results file; reused to resume")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Questions answered at once")
+    args = parser.parse_args(argv)
+
+    jobs = load_manifest(args.manifest)
+    runner = BatchRunner(os.getenv("OPENAI_API_KEY"), concurrency=args.concurrency)
+    summary = await runner.run(jobs, args.output)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,180 @@
+"""
+Deterministic local stand-ins for yfinance, OpenAI and ChatOpenAI.
+
+Every fake derives its data from a hash of the ticker so runs are reproducible,
+and can sleep for a configurable latency per call to simulate network round trips.
+"""
+import asyncio
+import contextlib
+import time
+import zlib
+from types import SimpleNamespace
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+
+
+def _seed(ticker: str) -> int:
+    return zlib.crc32(ticker.encode())
+
+
+def fake_price(ticker: str) -> float:
+    """Deterministic price in [10, 510) for a ticker."""
+    return round(10 + (_seed(ticker) % 50000) / 100, 2)
+
+
+def synthetic_portfolio(size: int) -> pd.DataFrame:
+    """Builds a portfolio of ``size`` distinct tickers with deterministic quantities."""
+    tickers = [f"T{i:05d}" for i in range(size)]
+    return pd.DataFrame({"Ticker": tickers, "Quantity": [1 + _seed(t) % 500 for t in tickers]})
+
+
+class FakeTicker:
+    def __init__(self, ticker: str, latency: float = 0.0):
+        self.ticker = ticker
+        self.latency = latency
+
+    @property
+    def info(self) -> dict:
+        time.sleep(self.latency)
+        seed = _seed(self.ticker)
+        price = fake_price(self.ticker)
+        return {
+            "currentPrice": price,
+            "targetMeanPrice": round(price * (0.8 + (seed % 60) / 100), 2),
+            "priceToBook": 0.5 + (seed % 40) / 10,
+            "returnOnEquity": -0.1 + (seed % 40) / 100,
+            "totalDebt": 1000 + seed % 5000,
+            "totalStockholderEquity": 1000 + (seed // 7) % 5000,
+        }
+
+    def history(self, period: str = None, start=None, **kwargs) -> pd.DataFrame:
+        time.sleep(self.latency)
+        end = pd.Timestamp.today().normalize()
+        begin = pd.Timestamp(start) if start is not None else end - pd.DateOffset(months=6)
+        index = pd.bdate_range(begin, end)
+        rng = np.random.default_rng(_seed(self.ticker))
+        closes = fake_price(self.ticker) * np.cumprod(1 + rng.normal(0, 0.01, len(index)))
+        return pd.DataFrame(
+            {"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 1e6},
+            index=index,
+        )
+
+
+class FakeYFinance:
+    def __init__(self, latency: float = 0.0):
+        """
+        Stands in for the parts of yfinance the tools use.
+
+        Args:
+            latency (float): Seconds slept per simulated network request.
+        """
+        self.latency = latency
+        self.requests = 0
+
+    def Ticker(self, ticker: str) -> FakeTicker:
+        self.requests += 1
+        return FakeTicker(ticker, self.latency)
+
+    def download(self, tickers, **kwargs) -> pd.DataFrame:
+        self.requests += 1
+        time.sleep(self.latency)
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        columns = pd.MultiIndex.from_product([["Close"], tickers])
+        return pd.DataFrame([[fake_price(t) for t in tickers]], columns=columns)
+
+
+class FakeChatLLM:
+    def __init__(self, latency: float = 0.0, answer: str = "This is a simulated answer.", model_name: str = "fake-gpt-4"):
+        """
+        Stands in for ChatOpenAI.
+
+        Args:
+            latency (float): Seconds slept per invoke (spread across tokens when streaming).
+            answer (str): Text returned for every prompt.
+            model_name (str): Reported model name.
+        """
+        self.latency = latency
+        self.answer = answer
+        self.model_name = model_name
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        self.prompt_chars += sum(len(m.content) for m in messages)
+        time.sleep(self.latency)
+        return SimpleNamespace(content=self.answer)
+
+    async def astream(self, messages):
+        self.calls += 1
+        self.prompt_chars += sum(len(m.content) for m in messages)
+        tokens = self.answer.split(" ")
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(self.latency / len(tokens))
+            yield SimpleNamespace(content=token if i == 0 else " " + token)
+
+
+class FakeOpenAI:
+    def __init__(self, latency: float = 0.0, label: str = "stock", **kwargs):
+        """Stands in for openai.OpenAI; chat completions always answer ``label``."""
+        self.latency = latency
+        self.label = label
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        time.sleep(self.latency)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.label))])
+
+
+class FakeWorkbooks:
+    """In-memory replacement for reading and writing portfolio workbooks."""
+
+    def __init__(self):
+        self.frames = {}
+        self.versions = {}
+
+    def add(self, path: str, frame: pd.DataFrame):
+        self.frames[path] = frame
+        self.versions[path] = self.versions.get(path, 0) + 1
+
+    def read_excel(self, path, *args, **kwargs) -> pd.DataFrame:
+        return self.frames[path].copy()
+
+    def signature(self, portfolio) -> tuple:
+        return self.versions[portfolio.file_path], len(self.frames[portfolio.file_path])
+
+
+@contextlib.contextmanager
+def offline_environment(yf_latency: float = 0.0, llm_latency: float = 0.0):
+    """
+    Patches yfinance, OpenAI, ChatOpenAI and Excel I/O with local fakes.
+
+    Args:
+        yf_latency (float): Simulated seconds per yfinance request.
+        llm_latency (float): Simulated seconds per LLM call.
+
+    Yields:
+        SimpleNamespace: The fakes (``yf``, ``llm``, ``workbooks``) for inspection.
+    """
+    yf = FakeYFinance(yf_latency)
+    llm = FakeChatLLM(llm_latency)
+    workbooks = FakeWorkbooks()
+
+    def write_excel(frame, path, *args, **kwargs):
+        workbooks.add(path, frame.copy())
+
+    patches = [
+        patch("tools.stock_fetcher.yf", yf),
+        patch("tools.stock_recommender.yf", yf),
+        patch("tools.history_store.yf", yf),
+        patch("tools.llm_clients.LLMClients.chat", lambda self, *a, **k: llm),
+        patch("tools.llm_clients.LLMClients.openai", lambda self: FakeOpenAI(llm_latency)),
+        patch("tools.portfolio.pd.read_excel", workbooks.read_excel),
+        patch("tools.portfolio.pd.DataFrame.to_excel", write_excel),
+        patch("tools.portfolio.Portfolio._file_signature", lambda portfolio: workbooks.signature(portfolio)),
+    ]
+    with contextlib.ExitStack() as stack:
+        for p in patches:
+            stack.enter_context(p)
+        yield SimpleNamespace(yf=yf, llm=llm, workbooks=workbooks)
@@ -0,0 +1,169 @@
+"""
+Load test for the HTTP service against the local fakes.
+
+Starts PortfolioService on a free port and drives it with many concurrent
+keep-alive clients asking for prices, the portfolio value and answers, then
+reports latency percentiles, throughput, rejections and how many upstream
+calls the traffic actually caused.
+
+Usage:
+    python -m benchmarks.load_test --clients 50 --requests 20 --yf-latency 0.05 --llm-latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.fakes import offline_environment, synthetic_portfolio
+from tools.llm_cache import LLMResponseCache, set_llm_cache
+from tools.market_cache import MarketDataCache, set_market_cache
+from tools.portfolio import clear_portfolios
+
+QUESTIONS = (
+    "What is the current value of my portfolio?",
+    "How diversified is my portfolio?",
+    "Which of my holdings look weakest right now?",
+)
+
+
+async def http_request(reader, writer, method: str, path: str, body: dict = None, client_id: str = None):
+    """Sends one request on a keep-alive connection and returns (status, decoded JSON body)."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(payload)}\r\n"
+    if client_id:
+        head += f"X-Client-Id: {client_id}\r\n"
+    writer.write(head.encode() + b"\r\n" + payload)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def run_client(host: str, port: int, client: int, requests: int, tickers: list, latencies: list, statuses: list):
+    rng = random.Random(client)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            kind = rng.random()
+            if kind < 0.5:
+                args = ("GET", f"/price?ticker={rng.choice(tickers)}")
+            elif kind < 0.75:
+                args = ("GET", "/portfolio")
+            else:
+                args = ("POST", "/ask", {"question": rng.choice(QUESTIONS)})
+            start = time.perf_counter()
+            status, _ = await http_request(reader, writer, *args, client_id=f"client-{client}")
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status)
+    finally:
+        writer.close()
+
+
+async def _drive(service, clients: int, requests: int, tickers: list) -> dict:
+    server = await service.start("127.0.0.1", 0)
+    host, port = server.sockets[0].getsockname()[:2]
+    latencies, statuses = [], []
+    start = time.perf_counter()
+    async with server:
+        await asyncio.gather(*(
+            run_client(host, port, client, requests, tickers, latencies, statuses) for client in range(clients)
+        ))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    statuses = np.array(statuses)
+    return {
+        "requests": len(statuses),
+        "ok": int((statuses == 200).sum()),
+        "rejected": int((statuses == 429).sum()),
+        "errors": int(((statuses != 200) & (statuses != 429)).sum()),
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(statuses) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 2),
+    }
+
+
+def run_load_test(clients: int = 50, requests: int = 20, portfolio_size: int = 20, yf_latency: float = 0.02,
+                  llm_latency: float = 0.05, max_per_client: int = 4) -> dict:
+    """
+    Runs the service against the offline fakes under concurrent load.
+
+    Args:
+        clients (int): Concurrent keep-alive clients.
+        requests (int): Sequential requests sent by each client.
+        portfolio_size (int): Tickers in the served synthetic portfolio.
+        yf_latency (float): Simulated seconds per yfinance request.
+        llm_latency (float): Simulated seconds per LLM call.
+        max_per_client (int): Per-client in-flight limit of the service.
+
+    Returns:
+        dict: Latency and throughput figures, plus upstream yfinance and LLM calls
+            and singleflight statistics.
+    """
+    with tempfile.TemporaryDirectory() as data_dir, \
+            patch.dict(os.environ, {
+                "HISTORY_STORE_DIR": os.path.join(data_dir, "history"),
+                "DERIVED_STORE_DIR": os.path.join(data_dir, "derived"),
+            }), \
+            offline_environment(yf_latency=yf_latency, llm_latency=llm_latency) as env, \
+            patch("agents.stock_advisor.StockAdvisor.start_refresh"):
+        from server import PortfolioService
+
+        previous_market, previous_llm = set_market_cache(MarketDataCache()), set_llm_cache(LLMResponseCache(enabled=False))
+        try:
+            holdings = synthetic_portfolio(portfolio_size)
+            env.workbooks.add("load_test.xlsx", holdings)
+            clear_portfolios()
+
+            # Every simulated client connects from localhost, which stands in for a proxy naming them
+            service = PortfolioService({"default": "load_test.xlsx"}, "offline", max_per_client=max_per_client,
+                                       trusted_proxies=("127.0.0.1",))
+            env.yf.requests, env.llm.calls = 0, 0
+            report = asyncio.run(_drive(service, clients, requests, holdings["Ticker"].tolist()))
+        finally:
+            set_market_cache(previous_market)
+            set_llm_cache(previous_llm)
+            clear_portfolios()
+
+        report.update({
+            "clients": clients,
+            "upstream_yfinance_requests": env.yf.requests,
+            "upstream_llm_calls": env.llm.calls,
+            "singleflight": service.flights.stats(),
+        })
+        return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the HTTP service offline.")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent clients.")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client.")
+    parser.add_argument("--portfolio-size", type=int, default=20, help="Tickers in the served portfolio.")
+    parser.add_argument("--yf-latency", type=float, default=0.02, help="Simulated seconds per yfinance request.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated seconds per LLM call.")
+    parser.add_argument("--max-per-client", type=int, default=4, help="Per-client in-flight limit.")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.clients, args.requests, args.portfolio_size, args.yf_latency,
+                           args.llm_latency, args.max_per_client)
+    print(json.dumps(report, indent=2))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Offline benchmarks for portfolio valuation, recommendation refresh and the query pipeline.
+
+All network and LLM access goes through the deterministic fakes in benchmarks/fakes.py,
+so results only reflect local work plus the simulated latency you ask for.
+
+Usage:
+    python -m benchmarks.run_benchmarks --sizes 10,1000,10000 --output bench_results.json
+    python -m benchmarks.run_benchmarks --compare baseline.json --output bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import patch
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.fakes import offline_environment, synthetic_portfolio
+from tools.llm_cache import LLMResponseCache, set_llm_cache
+from tools.market_cache import MarketDataCache, set_market_cache
+from tools.portfolio import clear_portfolios, get_portfolio
+from tools.portfolio_calculator import calculate_portfolio_value
+from tools.stock_recommender import StockRecommender
+
+DEFAULT_SIZES = (10, 1000, 10000)
+DEFAULT_REPEATS = 5
+DEFAULT_THRESHOLD = 0.2
+
+# Metrics compared between runs; higher is worse for all of them.
+COMPARED_METRICS = ("p50_ms", "p95_ms", "peak_mem_mb")
+
+
+def cold_caches():
+    """Starts an iteration with empty market data and LLM caches."""
+    set_market_cache(MarketDataCache())
+    set_llm_cache(LLMResponseCache(enabled=False))
+
+
+def measure(stage: str, size: int, func, repeats: int, setup=None) -> dict:
+    """
+    Times ``func`` over several runs and measures its peak traced memory in one extra run.
+
+    Returns:
+        dict: Latency percentiles, throughput and peak memory for one stage and size.
+    """
+    latencies = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies)
+    return {
+        "stage": stage,
+        "size": size,
+        "repeats": repeats,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        "ops_per_sec": round(repeats / float(latencies.sum()), 3),
+        "tickers_per_sec": round(size * repeats / float(latencies.sum()), 1),
+        "peak_mem_mb": round(peak / 2 ** 20, 3),
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeats: int = DEFAULT_REPEATS, yf_latency: float = 0.0,
+                   llm_latency: float = 0.0) -> dict:
+    """
+    Runs every stage for every portfolio size against the local fakes.
+
+    Args:
+        sizes (Iterable[int]): Number of tickers in each synthetic portfolio.
+        repeats (int): Timed runs per stage and size.
+        yf_latency (float): Simulated seconds per yfinance request.
+        llm_latency (float): Simulated seconds per LLM call.
+
+    Returns:
+        dict: Run metadata and a list of per-stage results.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir, \
+            patch.dict(os.environ, {
+                "HISTORY_STORE_DIR": os.path.join(data_dir, "history"),
+                "DERIVED_STORE_DIR": os.path.join(data_dir, "derived"),
+            }), \
+            offline_environment(yf_latency=yf_latency, llm_latency=llm_latency) as env, \
+            patch("agents.stock_advisor.StockAdvisor.start_refresh"):
+        from workflow import PortfolioWorkflow
+
+        for size in sizes:
+            path = f"synthetic_{size}.xlsx"
+            holdings = synthetic_portfolio(size)
+            env.workbooks.add(path, holdings)
+            clear_portfolios()
+
+            results.append(measure(
+                "calculate_portfolio_value", size, lambda: calculate_portfolio_value(path), repeats, cold_caches
+            ))
+
+            def reset_workbook():
+                cold_caches()
+                get_portfolio(path).derived.clear()
+
+            def refresh():
+                recommender = StockRecommender(max_workers=16, requests_per_second=1e9)
+                recommender.update_excel_with_recommendations(path)
+
+            results.append(measure("update_recommendations", size, refresh, repeats, reset_workbook))
+
+            # Leave recommendations in the sidecar store so the workflow starts from persisted data
+            refresh()
+            workflow = PortfolioWorkflow(path, "offline")
+            # Measure the LLM path; the fast path would answer this question from a template
+            workflow.stock_agent.fast_path = False
+            results.append(measure(
+                "handle_query", size, lambda: workflow.handle_query("What is the current value of my portfolio?"),
+                repeats, cold_caches,
+            ))
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": repeats,
+            "yf_latency": yf_latency,
+            "llm_latency": llm_latency,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Compares two benchmark runs stage by stage.
+
+    Args:
+        baseline (dict): Earlier output of run_benchmarks.
+        current (dict): Newer output of run_benchmarks.
+        threshold (float): Relative increase above which a metric counts as a regression.
+
+    Returns:
+        list: One row per (stage, size, metric) present in both runs with the
+            relative change and a ``regression`` flag.
+    """
+    previous = {(r["stage"], r["size"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = previous.get((result["stage"], result["size"]))
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            change = (result[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            rows.append({
+                "stage": result["stage"],
+                "size": result["size"],
+                "metric": metric,
+                "baseline": old[metric],
+                "current": result[metric],
+                "change": round(change, 4),
+                "regression": change > threshold,
+            })
+    return rows
+
+
+def print_results(report: dict):
+    print(f"{'stage':<28}{'size':>8}{'p50 ms':>12}{'p95 ms':>12}{'tickers/s':>14}{'peak MB':>10}")
+    for r in report["results"]:
+        print(f"{r['stage']:<28}{r['size']:>8}{r['p50_ms']:>12.2f}{r['p95_ms']:>12.2f}"
+              f"{r['tickers_per_sec']:>14.0f}{r['peak_mem_mb']:>10.2f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma-separated portfolio sizes.")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Timed runs per stage and size.")
+    parser.add_argument("--yf-latency", type=float, default=0.0, help="Simulated seconds per yfinance request.")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--compare", help="Earlier results file to diff against.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown that counts as a regression.")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        sizes=[int(size) for size in args.sizes.split(",")],
+        repeats=args.repeats,
+        yf_latency=args.yf_latency,
+        llm_latency=args.llm_latency,
+    )
+    print_results(report)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {args.output}")
+
+    if not args.compare:
+        return 0
+
+    with open(args.compare) as f:
+        rows = compare(json.load(f), report, args.threshold)
+    regressions = [row for row in rows if row["regression"]]
+    for row in regressions:
+        print(f"REGRESSION {row['stage']} size={row['size']} {row['metric']}: "
+              f"{row['baseline']} -> {row['current']} ({row['change']:+.1%})")
+    print(f"{len(regressions)} regression(s) against {args.compare}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,43 @@
+import asyncio
 import os
+import time
 from workflow import PortfolioWorkflow
 
 EXCEL_FILE_PATH = "stock_portfolio.xlsx"
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-if __name__ == "__main__":
+
+async def stream_answer(workflow: PortfolioWorkflow, question: str):
+    """Prints the answer as it streams in, followed by time-to-first-token and total latency."""
+    start = time.perf_counter()
+    first_token = None
+
+    print("\nAssistant: ", end="", flush=True)
+    async for token in workflow.ahandle_query(question):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        print(token, end="", flush=True)
+
+    total = time.perf_counter() - start
+    ttft = f"{first_token:.2f}s" if first_token is not None else "n/a"
+    print(f"\n\n[first token {ttft} | total {total:.2f}s]\n")
+
+
+async def main():
     print("Welcome to the Stock Portfolio Assistant!")
     print("Ask any stock or tax-related question. Type 'exit' to quit.\n")
 
     workflow = PortfolioWorkflow(EXCEL_FILE_PATH, OPENAI_API_KEY)
 
     while True:
-        user_input = input("You: ").strip()
+        user_input = (await asyncio.to_thread(input, "You: ")).strip()
 
         if user_input.lower() in {"exit", "quit"}:
             print("Goodbye!")
             break
 
-        response = workflow.handle_query(user_input)
-        print(f"\nAssistant: {response}\n")
+        await stream_answer(workflow, user_input)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
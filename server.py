@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import json
+import os
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from agents.tax_advisor import TaxAdvisor
+from tools import tracing
+from tools.portfolio_calculator import calculate_portfolio_value
+from tools.rate_limiter import PerClientLimiter
+from tools.singleflight import SingleFlight
+from tools.stock_fetcher import get_stock_prices
+from workflow import PortfolioWorkflow, shared_classifier
+
+DEFAULT_PORT = 8080
+MAX_BODY_BYTES = 64 * 1024
+MAX_TICKERS_PER_REQUEST = 50
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class PortfolioService:
+    def __init__(self, portfolios: dict, api_key: str, max_per_client: int = 4, trusted_proxies=()):
+        """
+        Keeps one warm PortfolioWorkflow per portfolio for serving many users.
+
+        Every workflow shares one TaxAdvisor, one trained query classifier and the
+        LLM clients of get_llm_clients, so their connection pools are reused across
+        requests. Concurrent requests for the same ticker, portfolio or question are
+        coalesced into one upstream call.
+
+        Args:
+            portfolios (dict): Portfolio name to file path; the first one is the default.
+            api_key (str): OpenAI API key.
+            max_per_client (int): Requests each client may have in flight at once.
+            trusted_proxies (Iterable[str]): Peer addresses of reverse proxies whose
+                X-Client-Id / X-Forwarded-For headers name the real client. Requests
+                from any other peer are limited by their own address.
+        """
+        if not portfolios:
+            raise ValueError("At least one portfolio is required.")
+        self.portfolios = dict(portfolios)
+        self.default_portfolio = next(iter(self.portfolios))
+        self.tax_agent = TaxAdvisor(api_key)
+        self.classifier = shared_classifier(api_key)
+        self.workflows = {
+            name: PortfolioWorkflow(path, api_key, tax_agent=self.tax_agent, classifier=self.classifier)
+            for name, path in self.portfolios.items()
+        }
+        self.flights = SingleFlight()
+        self.limiter = PerClientLimiter(max_per_client)
+        self.trusted_proxies = frozenset(trusted_proxies)
+
+    def _portfolio(self, name: str) -> str:
+        name = name or self.default_portfolio
+        if name not in self.portfolios:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown portfolio '{name}'")
+        return name
+
+    async def prices(self, tickers: list) -> dict:
+        """
+        Current price per ticker.
+
+        Tickers another request is already fetching are shared; the rest are
+        downloaded together in one batched get_stock_prices call.
+        """
+        async def fetch(keys):
+            prices = await asyncio.to_thread(get_stock_prices, [ticker for _, ticker in keys])
+            return {("price", ticker): prices.get(ticker) for _, ticker in keys}
+
+        results = await self.flights.do_many([("price", ticker) for ticker in tickers], fetch)
+        return {ticker: results[("price", ticker)] for ticker in tickers}
+
+    async def portfolio_value(self, name: str = None) -> dict:
+        """Result of calculate_portfolio_value, shared by every request for the same portfolio in flight."""
+        name = self._portfolio(name)
+        data = await self.flights.do(("portfolio", name), asyncio.to_thread,
+                                     calculate_portfolio_value, self.portfolios[name])
+        if not data:
+            raise HTTPError(HTTPStatus.BAD_GATEWAY, "Could not retrieve portfolio data.")
+        return data
+
+    async def ask(self, question: str, name: str = None) -> str:
+        """Answers a question; identical questions in flight against the same portfolio share one answer."""
+        name = self._portfolio(name)
+        question = (question or "").strip()
+        if not question:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'question' is required")
+        return await self.flights.do(("ask", name, question), asyncio.to_thread,
+                                     self.workflows[name].handle_query, question)
+
+    def stats(self) -> dict:
+        return {"singleflight": self.flights.stats(), "rejected": self.limiter.rejected}
+
+    async def route(self, method: str, target: str, body: bytes) -> dict:
+        """Dispatches one request and returns the JSON-serializable response body."""
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if method == "GET" and url.path == "/health":
+            return {"status": "ok", "portfolios": list(self.portfolios)}
+        if method == "GET" and url.path == "/stats":
+            return self.stats()
+        if method == "GET" and url.path == "/price":
+            tickers = [t.strip().upper() for t in query.get("ticker", "").split(",") if t.strip()]
+            if not tickers or len(tickers) > MAX_TICKERS_PER_REQUEST:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Pass 1-{MAX_TICKERS_PER_REQUEST} tickers as ?ticker=AAPL,MSFT")
+            return {"prices": await self.prices(list(dict.fromkeys(tickers)))}
+        if method == "GET" and url.path == "/portfolio":
+            return await self.portfolio_value(query.get("portfolio"))
+        if method == "POST" and url.path == "/ask":
+            try:
+                payload = json.loads(body or b"{}")
+            except json.JSONDecodeError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+            if not isinstance(payload, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+            return {"answer": await self.ask(payload.get("question"), payload.get("portfolio"))}
+        if url.path in {"/health", "/stats", "/price", "/portfolio", "/ask"}:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not supported on {url.path}")
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {url.path}")
+
+    def client_id(self, headers: dict, peer: str) -> str:
+        """
+        The key a request is rate-limited under.
+
+        Clients can set any header they like, so the headers are only believed
+        when the connection comes from a trusted proxy. X-Forwarded-For is read
+        from the right, the entry the proxy itself appended.
+        """
+        if peer in self.trusted_proxies:
+            forwarded = headers.get("x-forwarded-for", "").rsplit(",", 1)[-1].strip()
+            return headers.get("x-client-id") or forwarded or peer
+        return peer
+
+    async def handle(self, method: str, target: str, headers: dict, body: bytes, peer: str):
+        """
+        Applies the per-client limit, then routes the request.
+
+        Returns:
+            tuple: (HTTPStatus, response body dict).
+        """
+        client = self.client_id(headers, peer)
+        if not self.limiter.try_acquire(client):
+            return HTTPStatus.TOO_MANY_REQUESTS, {"error": "Too many concurrent requests for this client"}
+        try:
+            with tracing.span("http.request", method=method, path=urlsplit(target).path):
+                return HTTPStatus.OK, await self.route(method, target, body)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            tracing.record_error(e)
+            print(f"Error handling {method} {target}: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+        finally:
+            self.limiter.release(client)
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves HTTP/1.1 requests on one connection, keeping it open between requests."""
+        peer = writer.get_extra_info("peername")
+        peer = peer[0] if peer else "unknown"
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                status, payload = await self.handle(method, target, headers, body, peer)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            writer.write(encode_response(e.status, {"error": str(e)}, keep_alive=False))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        """Starts listening; pass port 0 to pick a free port (see server.sockets)."""
+        return await asyncio.start_server(self.serve_connection, host, port)
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """
+    Reads one HTTP request.
+
+    Returns:
+        tuple: (method, target, version, headers, body), or None when the client closed the connection.
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, version, headers, body
+
+
+def encode_response(status: HTTPStatus, payload: dict, keep_alive: bool = True) -> bytes:
+    body = json.dumps(payload, default=str).encode()
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+    )
+    if status == HTTPStatus.TOO_MANY_REQUESTS:
+        head += "Retry-After: 1\r\n"
+    return head.encode() + b"\r\n" + body
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Serve the portfolio assistant over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--portfolio", action="append", default=[], metavar="NAME=PATH",
+                        help="Portfolio to serve (repeatable); defaults to default=stock_portfolio.xlsx")
+    parser.add_argument("--max-per-client", type=int, default=4, help="In-flight requests allowed per client")
+    parser.add_argument("--trusted-proxy", action="append", default=[], metavar="ADDRESS",
+                        help="Proxy address whose X-Client-Id/X-Forwarded-For headers are trusted (repeatable)")
+    args = parser.parse_args()
+
+    portfolios = dict(item.split("=", 1) for item in args.portfolio) or {"default": "stock_portfolio.xlsx"}
+    service = PortfolioService(portfolios, os.getenv("OPENAI_API_KEY"), max_per_client=args.max_per_client,
+                               trusted_proxies=args.trusted_proxy)
+    server = await service.start(args.host, args.port)
+    print(f"Serving {', '.join(portfolios)} on http://{args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+import pytest
+from tools.llm_cache import LLMResponseCache, set_llm_cache
+from tools.llm_clients import clear_llm_clients
+from tools.market_cache import MarketDataCache, set_market_cache
+from tools.portfolio import clear_portfolios
+
+
+@pytest.fixture(autouse=True)
+def fresh_market_cache():
+    """Gives every test its own empty market data cache."""
+    previous = set_market_cache(MarketDataCache())
+    yield
+    set_market_cache(previous)
+
+
+@pytest.fixture(autouse=True)
+def fresh_portfolios():
+    """Makes every test load portfolio files from scratch."""
+    clear_portfolios()
+    yield
+    clear_portfolios()
+
+
+@pytest.fixture(autouse=True)
+def derived_store_dir(tmp_path, monkeypatch):
+    """Keeps portfolio sidecar stores out of the working directory."""
+    monkeypatch.setenv("DERIVED_STORE_DIR", str(tmp_path / "derived"))
+    return tmp_path / "derived"
+
+
+@pytest.fixture(autouse=True)
+def fresh_llm_cache():
+    """Gives every test its own empty in-memory LLM response cache."""
+    previous = set_llm_cache(LLMResponseCache())
+    yield
+    set_llm_cache(previous)
+
+
+@pytest.fixture(autouse=True)
+def fresh_llm_clients():
+    """Keeps shared LLM clients, and any test doubles they hold, from leaking between tests."""
+    clear_llm_clients()
+    yield
+    clear_llm_clients()
@@ -0,0 +1,121 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from tools.backtester import Panel, price_trend_panel, run_backtest, score_panel, SIGNALS
+from tools.history_store import HistoryStore, price_trend
+from tools.stock_recommender import StockRecommender
+
+rng = np.random.default_rng(0)
+
+
+def strong_and_weak(closes: pd.DataFrame) -> pd.DataFrame:
+    """Fundamentals that make "A" a Buy and "B" a Sell from the first date."""
+    first = closes.index[0]
+    return pd.DataFrame({
+        "Date": [first, first],
+        "Ticker": ["A", "B"],
+        "Target Mean Price": [closes["A"].iloc[0] * 2, np.nan],
+        "Price-to-Book": [0.5, 5.0],
+        "Return on Equity": [0.25, -0.1],
+        "Debt-to-Equity": [0.5, 3.0],
+    })
+
+
+# --- Scoring Tests ---
+def test_panel_scores_match_live_scoring():
+    n_dates, n_tickers = 40, 30
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.02, (n_dates, n_tickers)), axis=0)
+    fundamentals = {
+        "Target Mean Price": closes * rng.uniform(0.8, 1.6, closes.shape),
+        "Price-to-Book": rng.uniform(-1, 4, closes.shape),
+        "Return on Equity": rng.uniform(-0.1, 0.3, closes.shape),
+        "Debt-to-Equity": rng.uniform(0, 3, closes.shape),
+    }
+    panel = Panel(pd.bdate_range("2024-01-01", periods=n_dates), [f"T{i}" for i in range(n_tickers)], closes, fundamentals)
+
+    scores, signals = score_panel(panel, trend_window=20)
+
+    day = n_dates - 1
+    trend = price_trend_panel(closes, 20)[day]
+    live = StockRecommender().score_frame(pd.DataFrame({
+        "Current Price": closes[day],
+        **{field: values[day] for field, values in fundamentals.items()},
+        "Price Trend": trend,
+    }))
+    assert scores[day].tolist() == live["Score"].tolist()
+    assert [SIGNALS[code] for code in signals[day]] == live["Recommendation"].tolist()
+
+def test_price_trend_panel_matches_store_trend_and_bridges_gaps():
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.01, (60, 2)), axis=0)
+    closes[10:15, 1] = np.nan
+
+    trend = price_trend_panel(closes, window=30)
+
+    for column in range(2):
+        window = closes[30:60, column]
+        assert trend[59, column] == pytest.approx(price_trend(window[~np.isnan(window)]))
+    assert np.isnan(trend[0]).all()
+
+def test_fundamentals_are_point_in_time():
+    closes = pd.DataFrame({"A": [10.0, 10.0, 10.0]}, index=pd.bdate_range("2024-01-01", periods=3))
+    reports = pd.DataFrame({"Date": ["2024-01-02"], "Ticker": ["A"], "Price-to-Book": [0.5]})
+
+    panel = Panel.from_frames(closes, reports)
+
+    assert np.isnan(panel.fundamentals["Price-to-Book"][0, 0])
+    assert panel.fundamentals["Price-to-Book"][1:, 0].tolist() == [0.5, 0.5]
+
+
+# --- Simulation Tests ---
+def test_strategy_holds_buy_signals_and_benchmark_holds_everything():
+    closes = pd.DataFrame({"A": [10.0, 11.0, 12.1], "B": [10.0, 9.0, 8.0]}, index=pd.bdate_range("2024-01-01", periods=3))
+
+    result = run_backtest(Panel.from_frames(closes, strong_and_weak(closes)), horizons=(1,), rebalance_every=5)
+
+    assert result["signal_counts"] == {"Buy": 3, "Hold": 0, "Sell": 3}
+    assert result["equity_curve"]["strategy"].tolist() == pytest.approx([1.0, 1.1, 1.21])
+    assert result["equity_curve"]["benchmark"].tolist() == pytest.approx([1.0, 1.0, 1.005])
+    assert result["forward_returns"][1]["Buy"] == {"count": 2, "mean_return": 0.1, "positive_rate": 1.0, "hit_rate": 1.0}
+    assert result["forward_returns"][1]["Sell"]["hit_rate"] == 1.0
+
+def test_turnover_and_costs_when_signals_flip():
+    dates = pd.bdate_range("2024-01-01", periods=5)
+    closes = pd.DataFrame({"A": [10.0] * 5, "B": [10.0] * 5}, index=dates)
+    # A is the Buy on even days and B on odd ones, so every rebalance swaps the holding
+    flips = pd.DataFrame([
+        {"Date": date, "Ticker": ticker, "Price-to-Book": 0.5 if (i % 2 == 0) == (ticker == "A") else 5.0,
+         "Target Mean Price": 20.0 if (i % 2 == 0) == (ticker == "A") else 5.0, "Return on Equity": 0.25,
+         "Debt-to-Equity": 0.5}
+        for i, date in enumerate(dates) for ticker in ("A", "B")
+    ])
+
+    result = run_backtest(Panel.from_frames(closes, flips), horizons=(1,), rebalance_every=1, cost_bps=10)
+
+    assert result["strategy"]["average_turnover"] == 1.0
+    assert result["strategy"]["total_return"] < 0 == result["benchmark"]["total_return"]
+
+
+# --- Offline Data and Scale Tests ---
+def test_panel_from_history_store(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    index = pd.bdate_range("2024-01-01", periods=4)
+    store.append("A", pd.DataFrame({"Close": [1.0, 2.0, 3.0, 4.0]}, index=index))
+    store.append("B", pd.DataFrame({"Close": [5.0, 6.0]}, index=index[2:]))
+
+    panel = Panel.from_history_store(store, ["A", "B"], start="2024-01-02")
+
+    assert panel.shape == (3, 2)
+    assert panel.closes[:, 0].tolist() == [2.0, 3.0, 4.0]
+    assert np.isnan(panel.closes[0, 1]) and panel.closes[1:, 1].tolist() == [5.0, 6.0]
+
+def test_ten_year_panel_of_500_tickers_in_seconds():
+    n_dates, n_tickers = 2520, 500
+    closes = 100 * np.cumprod(1 + rng.normal(0.0003, 0.02, (n_dates, n_tickers)), axis=0)
+    fundamentals = {"Target Mean Price": closes * 1.2, "Price-to-Book": np.full(closes.shape, 1.5)}
+    panel = Panel(pd.bdate_range("2015-01-01", periods=n_dates), [f"T{i}" for i in range(n_tickers)], closes, fundamentals)
+
+    start = time.perf_counter()
+    result = run_backtest(panel)
+    assert time.perf_counter() - start < 5.0
+    assert result["period"]["rebalances"] == 120
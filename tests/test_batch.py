@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from batch import BatchRunner, completed_jobs, job_id, load_manifest
+
+holdings = {"a.xlsx": ["AAPL", "MSFT"], "b.xlsx": ["AAPL", "TSLA"]}
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({
+        "portfolios": {"alice": "a.xlsx", "bob": "b.xlsx"},
+        "questions": ["What is my portfolio worth?", "How diversified am I?"],
+    }))
+    return str(path)
+
+
+@pytest.fixture
+def env():
+    """Patches the workflow, market data and portfolio reads used by BatchRunner."""
+    with patch("batch.PortfolioWorkflow") as workflow, patch("batch.TaxAdvisor"), \
+            patch("batch.get_portfolio") as get_portfolio, \
+            patch("batch.get_stock_prices", side_effect=lambda tickers: {t: 100.0 for t in tickers}) as prices, \
+            patch("batch.calculate_portfolio_value", side_effect=lambda path, prices: {"path": path}) as calculate:
+        get_portfolio.side_effect = lambda path: MagicMock(unique_tickers=holdings[path.rsplit("/", 1)[-1]])
+        workflow.return_value.handle_query.side_effect = lambda question, data: f"{data['path']}: {question}"
+        yield MagicMock(workflow=workflow, prices=prices, calculate=calculate)
+
+
+def run(runner, jobs, output):
+    return asyncio.run(runner.run(jobs, str(output)))
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+# --- Manifest Tests ---
+def test_load_manifest_expands_portfolios_by_questions(manifest, tmp_path):
+    jobs = load_manifest(manifest)
+
+    assert [(job["portfolio"], job["question"]) for job in jobs] == [
+        ("alice", "What is my portfolio worth?"), ("alice", "How diversified am I?"),
+        ("bob", "What is my portfolio worth?"), ("bob", "How diversified am I?"),
+    ]
+    assert jobs[0]["path"] == str(tmp_path / "a.xlsx")
+    assert jobs[0]["id"] == job_id(str(tmp_path / "a.xlsx"), "What is my portfolio worth?")
+
+def test_load_manifest_per_portfolio_questions(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({
+        "portfolios": ["a.xlsx", {"name": "bob", "path": "b.xlsx", "questions": ["Any losers?"]}],
+        "questions": ["Total?"],
+    }))
+
+    assert [(job["portfolio"], job["question"]) for job in load_manifest(str(path))] == [
+        ("a.xlsx", "Total?"), ("bob", "Any losers?"),
+    ]
+
+def test_load_manifest_without_jobs_raises(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"portfolios": ["a.xlsx"], "questions": []}))
+
+    with pytest.raises(ValueError):
+        load_manifest(str(path))
+
+
+# --- Run Tests ---
+def test_run_streams_every_answer_and_shares_prices(env, manifest, tmp_path):
+    output = tmp_path / "results.jsonl"
+    runner = BatchRunner("test_api_key", concurrency=2)
+    summary = run(runner, load_manifest(manifest), output)
+
+    records = read_records(output)
+    assert summary["completed"] == 4 and summary["failed"] == 0 and summary["tickers"] == 3
+    assert sorted(record["answer"] for record in records) == sorted(
+        f"{tmp_path / name}: {question}"
+        for name in ("a.xlsx", "b.xlsx") for question in ("What is my portfolio worth?", "How diversified am I?")
+    )
+    # One batched download for the union of tickers, one workflow and valuation per portfolio
+    env.prices.assert_called_once_with(["AAPL", "MSFT", "AAPL", "TSLA"])
+    assert env.workflow.call_count == 2
+    assert all(call.kwargs["classifier"] is runner.classifier for call in env.workflow.call_args_list)
+    assert env.calculate.call_count == 2
+    for call in env.calculate.call_args_list:
+        assert call.kwargs["prices"] == {"AAPL": 100.0, "MSFT": 100.0, "TSLA": 100.0}
+
+def test_run_respects_concurrency_limit(env, manifest, tmp_path):
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def answer(question, data):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return "ok"
+
+    env.workflow.return_value.handle_query.side_effect = answer
+    run(BatchRunner("test_api_key", concurrency=2), load_manifest(manifest), tmp_path / "results.jsonl")
+
+    assert peak[0] == 2
+
+def test_failed_job_is_recorded_and_others_continue(env, manifest, tmp_path):
+    env.workflow.return_value.handle_query.side_effect = (
+        lambda question, data: (_ for _ in ()).throw(RuntimeError("LLM down")) if "diversified" in question else "ok"
+    )
+    output = tmp_path / "results.jsonl"
+
+    summary = run(BatchRunner("test_api_key"), load_manifest(manifest), output)
+
+    assert summary["completed"] == 2 and summary["failed"] == 2
+    assert {record.get("error") for record in read_records(output)} == {None, "LLM down"}
+
+def test_resume_skips_answered_jobs_and_retries_failures(env, manifest, tmp_path):
+    jobs = load_manifest(manifest)
+    output = tmp_path / "results.jsonl"
+    output.write_text(
+        json.dumps({"id": jobs[0]["id"], "answer": "done"}) + "\n"
+        + json.dumps({"id": jobs[1]["id"], "error": "LLM down"}) + "\n"
+        + '{"id": "' + jobs[2]["id"]  # cut off by the interruption
+    )
+
+    summary = run(BatchRunner("test_api_key"), jobs, output)
+
+    assert completed_jobs(str(output)) == {job["id"] for job in jobs}
+    assert summary["skipped"] == 1 and summary["completed"] == 3
+    resumed = [json.loads(line) for line in output.read_text().splitlines()[3:]]
+    assert sorted(record["id"] for record in resumed) == sorted(job["id"] for job in jobs[1:])
+
+def test_resume_of_finished_run_does_nothing(env, manifest, tmp_path):
+    jobs = load_manifest(manifest)
+    output = tmp_path / "results.jsonl"
+    output.write_text("".join(json.dumps({"id": job["id"], "answer": "done"}) + "\n" for job in jobs))
+
+    summary = run(BatchRunner("test_api_key"), jobs, output)
+
+    assert summary["skipped"] == 4 and summary["completed"] == 0
+    assert not env.prices.called and not env.workflow.called
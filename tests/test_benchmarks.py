@@ -0,0 +1,24 @@
+import pytest
+from benchmarks.run_benchmarks import compare, run_benchmarks
+
+
+def test_run_benchmarks_covers_every_stage_offline():
+    report = run_benchmarks(sizes=[5], repeats=1)
+
+    stages = {result["stage"] for result in report["results"]}
+    assert stages == {"calculate_portfolio_value", "update_recommendations", "handle_query"}
+    for result in report["results"]:
+        assert result["size"] == 5
+        assert result["p95_ms"] >= result["p50_ms"] > 0
+
+
+def test_compare_flags_regressions_above_threshold():
+    baseline = {"results": [{"stage": "s", "size": 10, "p50_ms": 10.0, "p95_ms": 20.0, "peak_mem_mb": 1.0}]}
+    current = {"results": [{"stage": "s", "size": 10, "p50_ms": 13.0, "p95_ms": 21.0, "peak_mem_mb": 1.0}]}
+
+    rows = {row["metric"]: row for row in compare(baseline, current, threshold=0.2)}
+
+    assert rows["p50_ms"]["regression"]
+    assert rows["p50_ms"]["change"] == pytest.approx(0.3)
+    assert not rows["p95_ms"]["regression"]
+    assert not rows["peak_mem_mb"]["regression"]
@@ -0,0 +1,65 @@
+import pytest
+from tools import tracing
+from tools.context_builder import SymbolIndex, build_context, detect_intents
+
+portfolio_data = {
+    "stocks": {"AAPL": 1500.0, "MSFT": 3000.0, "INFY": 200.0, "TSLA": 800.0},
+    "quantities": {"AAPL": 10, "MSFT": 10, "INFY": 10, "TSLA": 4},
+    "total_value": 5500.0,
+}
+recommendations = {"AAPL": "Buy", "MSFT": "Hold", "INFY": "Sell", "TSLA": "Hold"}
+
+
+# --- Symbol Index Tests ---
+@pytest.mark.parametrize("question, expected", [
+    ("What is the price of INFY?", ["INFY"]),
+    ("Compare $msft and aapl", ["MSFT", "AAPL"]),
+    ("Should I sell tsla or INFY?", ["TSLA", "INFY"]),
+    ("What is my total value?", []),
+])
+def test_symbol_index_extracts_tickers(question, expected):
+    assert SymbolIndex(recommendations).extract(question) == expected
+
+def test_common_words_only_match_in_capitals():
+    index = SymbolIndex(["ALL", "NOW", "IT"])
+    assert index.extract("Should I sell all of it now?") == []
+    assert index.extract("How is ALL doing?") == ["ALL"]
+
+def test_detect_intents():
+    assert detect_intents("What is the price of INFY?") == {"price"}
+    assert detect_intents("Which are my biggest holdings?") == {"ranking", "value"}
+
+
+# --- Context Tests ---
+def test_context_includes_only_mentioned_rows_and_aggregates():
+    built = build_context("What is the price of INFY?", portfolio_data, recommendations, "2025-01-01")
+
+    assert built["rows"] == ["INFY"] and built["omitted"] == 3
+    assert "INFY: 20.0" in built["context"] and "INFY: Sell" in built["context"]
+    assert "MSFT: 300.0" not in built["context"]
+    assert "Total Portfolio Value: 5500.0" in built["context"]
+    assert "Buy 1, Hold 2, Sell 1" in built["context"]
+    assert built["tokens_saved"] == built["full_tokens"] - built["tokens"] > 0
+
+def test_total_value_question_needs_only_aggregates():
+    built = build_context("What is the total value of my portfolio?", portfolio_data, recommendations)
+    assert built["rows"] == []
+
+def test_open_question_fills_budget_by_position_size():
+    full = build_context("How diversified am I?", portfolio_data, recommendations)
+    assert full["rows"] == ["MSFT", "AAPL", "TSLA", "INFY"] and full["tokens_saved"] == 0
+
+    budget = full["tokens"] - 1
+    trimmed = build_context("How diversified am I?", portfolio_data, recommendations, token_budget=budget)
+    assert trimmed["rows"] == full["rows"][:len(trimmed["rows"])] and trimmed["omitted"] > 0
+    assert trimmed["tokens"] <= budget < trimmed["full_tokens"]
+
+def test_tokens_saved_is_traced():
+    sink = tracing.MemorySink()
+    previous = tracing.set_tracer(tracing.Tracer(sink))
+    try:
+        with tracing.span("ask"):
+            built = build_context("Price of INFY", portfolio_data, recommendations)
+    finally:
+        tracing.set_tracer(previous)
+    assert sink.find("ask")[0]["counters"]["context.tokens_saved"] == built["tokens_saved"]
@@ -0,0 +1,219 @@
+import os
+import time
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from agents.tax_advisor import TaxAdvisor
+from tools import document_index
+from tools.document_index import DocumentIndex, HashingEmbedder, OpenAIEmbedder, chunk_text, format_passages
+
+WASH_SALE = (
+    "Wash sales. You cannot deduct a loss from a sale of stock if you buy substantially identical "
+    "stock within 30 days before or after the sale. The disallowed loss is added to the basis of the new shares."
+)
+CAPITAL_GAINS = (
+    "Capital gains holding period. Gains on assets held more than one year are long-term capital gains "
+    "and are taxed at 0%, 15% or 20% depending on taxable income."
+)
+RMD = (
+    "Required minimum distributions. You must start taking required minimum distributions from a "
+    "traditional IRA at age 73. The amount is the prior year-end balance divided by the life expectancy factor."
+)
+
+
+@pytest.fixture
+def docs(tmp_path):
+    folder = tmp_path / "docs"
+    (folder / "irs").mkdir(parents=True)
+    (folder / "irs" / "pub550.txt").write_text(f"{WASH_SALE}\n\n{CAPITAL_GAINS}")
+    (folder / "pub590b.md").write_text(RMD)
+    (folder / "notes.pdf").write_text("not indexed")
+    return folder
+
+
+def make_index(tmp_path, embedder=None, **kwargs):
+    return DocumentIndex(str(tmp_path / "index"), embedder or HashingEmbedder(), chunk_chars=200, **kwargs)
+
+
+# --- Chunking Tests ---
+def test_chunk_text_packs_paragraphs_and_splits_long_ones():
+    assert chunk_text("One.\n\nTwo.\n\n\nThree.", chunk_chars=20) == ["One. Two. Three."]
+    assert chunk_text("a" * 8 + "\n\n" + "b" * 8, chunk_chars=12) == ["a" * 8, "b" * 8]
+
+    words = " ".join(f"word{i}" for i in range(100))
+    chunks = chunk_text(words, chunk_chars=100, overlap=20)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert chunks[0].startswith("word0 ") and chunks[-1].endswith("word99")
+    # Consecutive pieces overlap by whole words
+    assert chunks[1].split()[0] in chunks[0].split()
+
+
+# --- Embedder Tests ---
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    vectors = embedder.embed(["wash sale rules", "wash sale rules", "the"])
+
+    assert vectors.dtype == np.float32 and vectors.shape == (3, 64)
+    assert np.array_equal(vectors[0], vectors[1])
+    assert np.linalg.norm(vectors[0]) == pytest.approx(1.0)
+    assert not vectors[2].any()  # only stop words
+
+def test_openai_embedder_batches_requests():
+    client = MagicMock()
+    client.embeddings.create.side_effect = lambda model, input, dimensions: MagicMock(
+        data=[MagicMock(embedding=[3.0, 4.0]) for _ in input]
+    )
+    embedder = OpenAIEmbedder(client, dim=2, batch_size=2)
+
+    vectors = embedder.embed(["a", "b", "c"])
+
+    assert client.embeddings.create.call_count == 2
+    assert np.allclose(vectors, [[0.6, 0.8]] * 3)
+
+
+# --- Index Tests ---
+def test_search_finds_relevant_passage(docs, tmp_path):
+    index = make_index(tmp_path)
+    stats = index.build(str(docs))
+
+    assert stats == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0, "chunks": 3}
+    results = index.search("When do required minimum distributions from my IRA start?", k=2)
+    assert results[0]["path"].endswith("pub590b.md")
+    assert results[0]["text"] == RMD
+    assert results[0]["score"] > results[1]["score"] > 0
+    assert index.search("wash sale substantially identical stock", k=1)[0]["text"] == WASH_SALE
+
+def test_build_is_incremental(docs, tmp_path):
+    index = make_index(tmp_path)
+    index.build(str(docs))
+    with patch.object(index.embedder, "embed", wraps=index.embedder.embed) as embed:
+        assert index.build(str(docs))["unchanged"] == 2
+
+        # Touched but identical content is not re-embedded either
+        os.utime(docs / "pub590b.md", ns=(time.time_ns(), time.time_ns() + 10**9))
+        assert index.build(str(docs))["unchanged"] == 2
+        assert not embed.called
+
+    (docs / "pub590b.md").write_text(RMD + "\n\nQualified charitable distributions count toward your RMD.")
+    (docs / "irs" / "pub550.txt").unlink()
+    stats = index.build(str(docs))
+
+    assert stats == {"added": 0, "updated": 1, "removed": 1, "unchanged": 0, "chunks": 2}
+    assert len(index) == 2
+    assert {result["path"] for result in index.search("wash sale capital gains rmd", k=5, min_score=-1)} == {
+        str(docs / "pub590b.md")
+    }
+
+def test_index_persists_and_compacts(docs, tmp_path):
+    make_index(tmp_path).build(str(docs))
+    reopened = make_index(tmp_path)
+
+    assert len(reopened) == 3
+    assert reopened.search("wash sale", k=1)[0]["text"] == WASH_SALE
+
+    # Replacing most of the documents leaves mostly deleted rows, which triggers a compaction
+    (docs / "irs" / "pub550.txt").write_text("Short sales are reported on Form 8949.")
+    reopened.build(str(docs))
+
+    assert os.path.getsize(reopened.vectors_path) == 2 * reopened.embedder.dim * 4
+    assert reopened.search("short sales form 8949", k=1)[0]["text"] == "Short sales are reported on Form 8949."
+    assert reopened.search("required minimum distributions", k=1)[0]["text"] == RMD
+
+def test_changing_embedder_rebuilds(docs, tmp_path):
+    make_index(tmp_path).build(str(docs))
+    index = make_index(tmp_path, HashingEmbedder(dim=32))
+
+    assert len(index) == 0
+    assert index.build(str(docs))["added"] == 2
+
+def bulk_index(tmp_path, vectors):
+    """An index holding ``vectors`` as passages "passage <row>", clustered by an empty build."""
+    index = make_index(tmp_path)
+    vectors.astype(np.float32).tofile(index.vectors_path)
+    with index._db:
+        index._db.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)",
+                              ((row, "bulk.txt", row, f"passage {row}") for row in range(len(vectors))))
+    index.build([])
+    return index
+
+def test_clustered_search_finds_nearest_rows(tmp_path):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((300, 256))
+    vectors = centers[rng.integers(0, 300, 30_000)] + 0.3 * rng.standard_normal((30_000, 256))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = bulk_index(tmp_path, vectors)
+
+    assert index._state[3] is not None  # clusters were trained
+    for row in (0, 12_345, 29_999):
+        with patch.object(index.embedder, "embed", return_value=vectors[row:row + 1].astype(np.float32)):
+            results = index.search("anything", k=3)
+        exact = np.argsort(-(vectors @ vectors[row]))[:3]
+        assert [r["text"] for r in results] == [f"passage {i}" for i in exact]
+
+def test_search_100k_chunks_in_milliseconds(tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((100_000, 256))
+    index = bulk_index(tmp_path, vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+    index.search("capital gains", k=5)
+    start = time.perf_counter()
+    for _ in range(20):
+        results = index.search("capital gains", k=5, min_score=-1)
+    elapsed = (time.perf_counter() - start) / 20
+
+    assert len(results) == 5
+    assert elapsed < 0.01
+
+
+# --- Tax Advisor Integration ---
+def test_tax_advisor_grounds_prompt_in_retrieved_passages(docs, tmp_path):
+    index = make_index(tmp_path)
+    index.build(str(docs))
+    advisor = TaxAdvisor("test_api_key", document_index=index, top_k=1)
+    advisor.llm = MagicMock()
+    advisor.llm.invoke.return_value = MagicMock(content="Wait 31 days.")
+
+    assert advisor.ask_tax_question("Can I rebuy stock after a wash sale?") == "Wait 31 days."
+    prompt = advisor.llm.invoke.call_args[0][0][0].content
+    assert "[1] pub550.txt: " + WASH_SALE in prompt
+    assert RMD not in prompt
+
+def test_tax_advisor_without_documents_sends_bare_question(monkeypatch):
+    monkeypatch.delenv("TAX_DOCUMENTS_DIR", raising=False)
+    advisor = TaxAdvisor("test_api_key")
+
+    assert advisor.document_index is None
+    assert format_passages(advisor.retrieve("What is a wash sale?")) == ""
+
+def test_default_tax_index_builds_from_environment(docs, tmp_path, monkeypatch):
+    monkeypatch.setenv("TAX_DOCUMENTS_DIR", str(docs))
+    monkeypatch.setenv("TAX_INDEX_DIR", str(tmp_path / "tax_index"))
+
+    with patch.object(document_index, "OpenAIEmbedder", lambda **kwargs: HashingEmbedder()):
+        index = document_index.default_tax_index("test_api_key")
+
+    assert len(index) == 2 and index.root == str(tmp_path / "tax_index")
+
+def test_tax_advisor_builds_default_index_on_first_retrieval(docs, tmp_path, monkeypatch):
+    monkeypatch.setenv("TAX_DOCUMENTS_DIR", str(docs))
+    monkeypatch.setenv("TAX_INDEX_DIR", str(tmp_path / "tax_index"))
+    local = HashingEmbedder(dim=512)
+
+    with patch.object(OpenAIEmbedder, "embed", side_effect=local.embed) as embed, \
+            patch("tools.llm_clients.LLMClients.openai") as openai_client:
+        advisor = TaxAdvisor("test_api_key")
+        assert not embed.called and not openai_client.called
+
+        results = advisor.retrieve("When do required minimum distributions start?")
+
+    assert results[0]["text"] == RMD
+    assert embed.called
+    assert advisor.document_index is advisor.document_index
+
+def test_openai_embedder_creates_client_on_first_embedding():
+    with patch("tools.llm_clients.LLMClients.openai") as openai_client:
+        embedder = OpenAIEmbedder(api_key="test_api_key", dim=2)
+        assert not openai_client.called
+
+        openai_client.return_value.embeddings.create.return_value = MagicMock(data=[MagicMock(embedding=[3.0, 4.0])])
+        assert np.allclose(embedder.embed(["a"]), [[0.6, 0.8]])
+        assert openai_client.call_count == 1
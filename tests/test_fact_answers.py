@@ -0,0 +1,78 @@
+import pytest
+from tools.fact_answers import answer_factual_question, fact_intents
+
+portfolio_data = {
+    "stocks": {"AAPL": 1500.0, "INFY": 200.0, "MSFT": 3000.0},
+    "quantities": {"AAPL": 10, "INFY": 10, "MSFT": 10},
+    "total_value": 4700.0,
+}
+recommendations = {"AAPL": "Buy", "INFY": "Sell", "MSFT": "Hold", "TSLA": "Hold"}
+
+
+# --- Factual Answer Tests ---
+@pytest.mark.parametrize("question, expected", [
+    ("What is the price of INFY?", "INFY is trading at $20.00 per share."),
+    ("How much is my AAPL position worth?", "Your 10 shares of AAPL are worth $1,500.00."),
+    ("What is the current value of my portfolio?", "Your portfolio is worth $4,700.00 across 3 positions."),
+    ("What's the recommendation for msft?", "The current recommendation for MSFT is Hold (as of 2025-01-01)."),
+])
+def test_factual_questions_are_templated(question, expected):
+    assert answer_factual_question(question, portfolio_data, recommendations, "2025-01-01") == expected
+
+def test_multiple_tickers_and_intents():
+    answer = answer_factual_question("Price and recommendation for AAPL and INFY?", portfolio_data, recommendations)
+    assert answer.splitlines() == [
+        "AAPL is trading at $150.00 per share.",
+        "The current recommendation for AAPL is Buy (as of unknown).",
+        "INFY is trading at $20.00 per share.",
+        "The current recommendation for INFY is Sell (as of unknown).",
+    ]
+
+@pytest.mark.parametrize("question", [
+    "Should I sell INFY?",
+    "Why is the price of INFY so low?",
+    "How diversified is my portfolio?",
+    "What is the price of TSLA?",
+    "What is the price of NVDA?",
+    "What is my portfolio's recommendation?",
+    "Tell me about AAPL",
+])
+def test_open_ended_or_unanswerable_questions_fall_through(question):
+    assert answer_factual_question(question, portfolio_data, recommendations) is None
+
+@pytest.mark.parametrize("question", [
+    "How much has my portfolio gained this year?",
+    "How much of my portfolio is in cash?",
+    "What was my portfolio value last month?",
+    "What is the total value of my tech holdings?",
+    "How much did AAPL gain today?",
+    "How much dividend income does AAPL give?",
+    "What is the value of AAPL relative to my total portfolio?",
+    "Price of AAPL and MSFT compared to last week?",
+    "What was the price of AAPL yesterday?",
+    "What percentage of my portfolio is MSFT?",
+    "How many shares of AAPL do I own?",
+])
+def test_questions_with_qualifiers_go_to_the_llm(question):
+    assert answer_factual_question(question, portfolio_data, recommendations) is None
+
+@pytest.mark.parametrize("question, expected", [
+    ("What's AAPL's price?", "AAPL is trading at $150.00 per share."),
+    ("Where is $MSFT trading?", "MSFT is trading at $300.00 per share."),
+    ("Price of AAPL, INFY and MSFT", "AAPL is trading at $150.00 per share.\n"
+                                     "INFY is trading at $20.00 per share.\n"
+                                     "MSFT is trading at $300.00 per share."),
+    ("What is my portfolio worth?", "Your portfolio is worth $4,700.00 across 3 positions."),
+    ("Is MSFT a buy, hold or sell?", "The current recommendation for MSFT is Hold (as of unknown)."),
+])
+def test_template_variants(question, expected):
+    assert answer_factual_question(question, portfolio_data, recommendations) == expected
+
+def test_fact_intents():
+    assert fact_intents("How much is my portfolio worth in total?") == {"value", "total"}
+    assert fact_intents("Price and rating for AAPL?", ["AAPL"]) == {"price", "recommendation"}
+    assert fact_intents("How much is my portfolio worth compared to last year?") == set()
+
+def test_risk_questions_about_the_portfolio_are_not_total_value_questions():
+    assert answer_factual_question("How volatile is my portfolio?", portfolio_data, recommendations) is None
+    assert answer_factual_question("What is my portfolio's beta?", portfolio_data, recommendations) is None
@@ -0,0 +1,131 @@
+import pytest
+from unittest.mock import patch, MagicMock
+import numpy as np
+import pandas as pd
+from tools.history_store import HistoryStore, price_trend
+from tools.stock_recommender import StockRecommender
+
+
+def bars(start, closes):
+    index = pd.date_range(start, periods=len(closes), freq="D", tz="America/New_York")
+    return pd.DataFrame({
+        "Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": [1000] * len(closes)
+    }, index=index)
+
+# --- Append / Load Tests ---
+def test_append_only_adds_new_bars(tmp_path):
+    store = HistoryStore(str(tmp_path))
+
+    assert store.append("AAPL", bars("2024-01-01", [1.0, 2.0, 3.0])) == 3
+    assert store.append("AAPL", bars("2024-01-02", [2.0, 3.0, 4.0, 5.0])) == 2
+
+    loaded = store.load("AAPL")
+    assert isinstance(loaded, np.memmap)
+    assert loaded["close"].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert store.last_date("AAPL") == np.datetime64("2024-01-05", "D").astype(np.int64)
+
+def test_window_is_a_view(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append("AAPL", bars("2024-01-01", [1.0, 2.0, 3.0, 4.0, 5.0]))
+
+    window = store.window("AAPL", start="2024-01-02", end="2024-01-04")
+    assert window["close"].tolist() == [2.0, 3.0, 4.0]
+    assert isinstance(window, np.memmap)
+
+def test_missing_ticker_is_empty(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    assert len(store.load("NONE")) == 0
+    assert store.last_date("NONE") is None
+
+# --- Incremental Update Tests ---
+@patch("tools.history_store._today", return_value=np.datetime64("2024-01-10", "D").astype(np.int64))
+@patch("tools.history_store.yf.Ticker")
+def test_update_fetches_only_missing_range(mock_ticker_class, mock_today, tmp_path):
+    store = HistoryStore(str(tmp_path), min_update_interval=0)
+    mock_ticker = mock_ticker_class.return_value
+
+    mock_ticker.history.return_value = bars("2024-01-01", [1.0, 2.0, 3.0])
+    assert store.update("AAPL") == 3
+    assert mock_ticker.history.call_args.kwargs == {"period": "1y"}
+
+    # The last stored bar is downloaded again to catch revised closes
+    mock_ticker.history.return_value = bars("2024-01-03", [3.0, 4.0])
+    assert store.update("AAPL") == 1
+    assert mock_ticker.history.call_args.kwargs == {"start": "2024-01-03"}
+    assert store.load("AAPL")["close"].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+@patch("tools.history_store.yf.Ticker")
+def test_update_never_stores_unfinished_sessions(mock_ticker_class, tmp_path):
+    store = HistoryStore(str(tmp_path), min_update_interval=0)
+    mock_ticker = mock_ticker_class.return_value
+
+    # Mid-session on Jan 3: the download includes the unfinished bar
+    mock_ticker.history.return_value = bars("2024-01-01", [1.0, 2.0, 2.5])
+    with patch("tools.history_store._today", return_value=np.datetime64("2024-01-03", "D").astype(np.int64)):
+        assert store.update("AAPL") == 2
+        assert store.update("AAPL") == 0
+    assert mock_ticker.history.call_count == 1
+
+    # The next day the final close of Jan 3 is stored
+    mock_ticker.history.return_value = bars("2024-01-02", [2.0, 3.0, 3.5])
+    with patch("tools.history_store._today", return_value=np.datetime64("2024-01-04", "D").astype(np.int64)):
+        assert store.update("AAPL") == 1
+    assert mock_ticker.history.call_args.kwargs == {"start": "2024-01-02"}
+    assert store.load("AAPL")["close"].tolist() == [1.0, 2.0, 3.0]
+
+@patch("tools.history_store._today", return_value=np.datetime64("2024-01-10", "D").astype(np.int64))
+@patch("tools.history_store.yf.Ticker")
+def test_split_rewrites_history_from_full_download(mock_ticker_class, mock_today, tmp_path):
+    store = HistoryStore(str(tmp_path), min_update_interval=0)
+    mock_ticker = mock_ticker_class.return_value
+    store.append("AAPL", bars("2024-01-01", [100.0, 102.0, 104.0]))
+
+    # A 2-for-1 split on Jan 4: yfinance now reports every earlier close halved
+    split = bars("2024-01-03", [52.0, 53.0])
+    split["Stock Splits"] = [0.0, 2.0]
+    adjusted = bars("2024-01-01", [50.0, 51.0, 52.0, 53.0])
+    mock_ticker.history.side_effect = [split, adjusted]
+
+    assert store.update("AAPL") == 4
+    assert mock_ticker.history.call_args_list[1].kwargs == {"start": "2024-01-01"}
+    assert store.load("AAPL")["close"].tolist() == [50.0, 51.0, 52.0, 53.0]
+
+@patch("tools.history_store._today", return_value=np.datetime64("2024-01-10", "D").astype(np.int64))
+@patch("tools.history_store.yf.Ticker")
+def test_revised_close_rewrites_history(mock_ticker_class, mock_today, tmp_path):
+    store = HistoryStore(str(tmp_path), min_update_interval=0)
+    mock_ticker = mock_ticker_class.return_value
+    store.append("AAPL", bars("2024-01-01", [100.0, 102.0]))
+
+    # A dividend re-adjusted the stored closes
+    mock_ticker.history.side_effect = [bars("2024-01-02", [101.5, 103.0]), bars("2024-01-01", [99.5, 101.5, 103.0])]
+
+    assert store.update("AAPL") == 3
+    assert store.load("AAPL")["close"].tolist() == [99.5, 101.5, 103.0]
+
+@patch("tools.history_store.yf.Ticker")
+def test_update_skips_recently_checked_tickers(mock_ticker_class, tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append("AAPL", bars("2024-01-01", [1.0]))
+
+    assert store.update("AAPL") == 0
+    assert not mock_ticker_class.called
+
+# --- Trend Tests ---
+def test_price_trend_matches_pandas():
+    closes = np.array([100, 105, 110, 108, 115], dtype=float)
+    assert price_trend(closes) == pytest.approx(pd.Series(closes).pct_change().mean())
+    assert price_trend(np.array([])) == 0
+    assert np.isnan(price_trend(np.array([1.0])))
+
+@patch("tools.stock_recommender.yf.Ticker")
+def test_recommender_uses_history_store(mock_ticker_class, tmp_path):
+    mock_ticker_class.return_value.info = {"currentPrice": 100}
+    store = MagicMock()
+    store.closes.return_value = np.array([100, 105, 110, 108, 115], dtype=float)
+
+    result = StockRecommender(history_store=store).fetch_stock_data("AAPL")
+
+    store.update.assert_called_once()
+    assert not mock_ticker_class.return_value.history.called
+    assert result["Price Trend"] == pytest.approx(pd.Series([100, 105, 110, 108, 115]).pct_change().mean())
@@ -0,0 +1,101 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from tools.live_valuation import LiveValuation, QueueTickSource, ReplayTickSource, Tick
+from tools.portfolio import get_portfolio
+
+
+@pytest.fixture
+def engine():
+    return LiveValuation(["AAPL", "MSFT", "INFY"], [10, 5, 100], {"AAPL": 150.0, "MSFT": 300.0})
+
+
+# --- Tick Application Tests ---
+def test_tick_updates_position_and_running_total(engine):
+    assert engine.total == 3000.0
+
+    event = engine.apply("AAPL", 155.0, 1.0)
+
+    assert event == {"ticker": "AAPL", "price": 155.0, "previous_price": 150.0, "value": 1550.0,
+                     "change": 50.0, "total": 3050.0, "timestamp": 1.0}
+    assert engine.apply("INFY", 20.0)["total"] == 5050.0
+
+def test_unknown_tickers_and_nan_prices_are_ignored(engine):
+    assert engine.apply("TSLA", 200.0) is None
+    assert engine.apply("AAPL", float("nan")) is None
+    assert engine.ignored == 2 and engine.total == 3000.0
+
+def test_subscribers_receive_events_and_errors_are_isolated(engine):
+    events = []
+    engine.subscribe(lambda event: 1 / 0)
+    unsubscribe = engine.subscribe(events.append)
+
+    engine.apply("MSFT", 310.0)
+    unsubscribe()
+    engine.apply("MSFT", 320.0)
+
+    assert [event["price"] for event in events] == [310.0]
+
+def test_snapshot_matches_calculator_format(engine):
+    engine.apply("AAPL", 151.0)
+    assert engine.snapshot() == {
+        "stocks": {"AAPL": 1510.0, "MSFT": 1500.0},
+        "quantities": {"AAPL": 10.0, "MSFT": 5.0},
+        "total_value": 3010.0,
+    }
+
+
+# --- Tick Source Tests ---
+def test_replay_source_round_trip(engine, tmp_path):
+    path = str(tmp_path / "ticks.csv")
+    ReplayTickSource.record(path, [Tick("AAPL", 151.0, 1.0), Tick("TSLA", 9.0, 2.0), Tick("MSFT", 301.0, 3.0)])
+
+    assert engine.run(ReplayTickSource(path)) == 3
+    assert engine.total == 1510.0 + 1505.0
+
+def test_replay_jsonl_respects_speed(engine, tmp_path):
+    path = tmp_path / "ticks.jsonl"
+    path.write_text('{"timestamp": 0, "ticker": "AAPL", "price": 1}\n{"timestamp": 0.5, "ticker": "AAPL", "price": 2}\n')
+
+    start = time.monotonic()
+    engine.run(ReplayTickSource(str(path), speed=10.0))
+    assert time.monotonic() - start >= 0.04
+    assert engine.prices[0] == 2.0
+
+def test_queue_source_feeds_engine_in_background(engine):
+    source = QueueTickSource()
+    thread = engine.start(source)
+    for price in (151.0, 152.0, 153.0):
+        source.put("AAPL", price)
+    source.close()
+    thread.join(2)
+
+    assert engine.ticks == 3 and engine.total == 3030.0
+
+
+# --- Portfolio and Throughput Tests ---
+def test_from_portfolio_uses_stored_last_prices(tmp_path):
+    path = str(tmp_path / "portfolio.csv")
+    pd.DataFrame({"Ticker": ["AAPL", "MSFT", "AAPL"], "Quantity": [10, 5, 2]}).to_csv(path, index=False)
+    get_portfolio(path).update_derived("Last Price", {"AAPL": 100.0})
+
+    engine = LiveValuation.from_portfolio(path)
+
+    assert engine.tickers == ["AAPL", "MSFT"]
+    assert engine.total == 1200.0
+
+def test_burst_of_ticks_stays_fast_and_exact():
+    rng = np.random.default_rng(0)
+    tickers = [f"T{i}" for i in range(1000)]
+    engine = LiveValuation(tickers, rng.integers(1, 100, 1000))
+    ticks = [Tick(tickers[i], float(p)) for i, p in zip(rng.integers(0, 1000, 100_000), rng.uniform(1, 500, 100_000))]
+
+    start = time.perf_counter()
+    for tick in ticks:
+        engine.apply(*tick)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 2.0  # well over the thousands of ticks per second a live feed bursts to
+    assert engine.total == pytest.approx(float(np.nansum(engine.prices * engine.quantities)))
@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+import pytest
+from unittest.mock import patch, MagicMock
+from langchain.schema import HumanMessage
+from tools.llm_cache import LLMResponseCache, get_llm_cache, normalize_prompt, snapshot_hash
+from tools.tax_analyser import TaxAnalyser
+
+
+class FakeLLM:
+    """Local stand-in for ChatOpenAI that counts calls."""
+
+    def __init__(self, model_name="fake-gpt"):
+        self.model_name = model_name
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return MagicMock(content=f"answer {self.calls}")
+
+    async def astream(self, messages):
+        self.calls += 1
+        for token in ["answer", " ", str(self.calls)]:
+            yield MagicMock(content=token)
+
+
+def ask(cache, llm, prompt, **kwargs):
+    return cache.invoke(llm, [HumanMessage(content=prompt)], **kwargs)
+
+# --- Hit / Miss Tests ---
+def test_repeated_prompt_is_served_from_cache():
+    cache, llm = LLMResponseCache(), FakeLLM()
+
+    assert ask(cache, llm, "What is my portfolio worth?", snapshot="s1") == "answer 1"
+    assert ask(cache, llm, "What is my   portfolio worth?", snapshot="s1") == "answer 1"
+    assert llm.calls == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "bypassed": 0, "entries": 1}
+
+def test_key_includes_model_name():
+    cache = LLMResponseCache()
+    ask(cache, FakeLLM("model-a"), "question")
+    other = FakeLLM("model-b")
+    ask(cache, other, "question")
+    assert other.calls == 1
+
+# --- Invalidation and Eviction Tests ---
+def test_snapshot_change_invalidates_scope():
+    cache, llm = LLMResponseCache(), FakeLLM()
+    ask(cache, llm, "q1", snapshot="old", scope="stock")
+    ask(cache, llm, "q2", snapshot="old", scope="tax")
+
+    ask(cache, llm, "q3", snapshot="new", scope="stock")
+    assert cache.get("q1", "fake-gpt", "old") is None
+    assert cache.get("q2", "fake-gpt", "old") == "answer 2"
+
+def test_ttl_expiry():
+    cache, llm = LLMResponseCache(ttl=60), FakeLLM()
+    with patch("tools.llm_cache.time.time", return_value=1000.0):
+        ask(cache, llm, "question")
+    with patch("tools.llm_cache.time.time", return_value=1061.0):
+        assert ask(cache, llm, "question") == "answer 2"
+
+def test_size_bound_evicts_least_recently_used():
+    cache, llm = LLMResponseCache(max_entries=2), FakeLLM()
+    with patch("tools.llm_cache.time.time", side_effect=itertools.count(1.0)):
+        ask(cache, llm, "a")
+        ask(cache, llm, "b")
+        cache.get("a", "fake-gpt")    # a is now more recently used than b
+        ask(cache, llm, "c")          # evicts b
+        assert cache.stats()["entries"] == 2
+        assert cache.get("b", "fake-gpt") is None
+        assert cache.get("a", "fake-gpt") == "answer 1"
+
+# --- Bypass Tests ---
+def test_bypass_switches():
+    cache, llm = LLMResponseCache(), FakeLLM()
+    ask(cache, llm, "question")
+    assert ask(cache, llm, "question", bypass=True) == "answer 2"
+
+    cache.enabled = False
+    assert ask(cache, llm, "question") == "answer 3"
+    assert cache.stats()["bypassed"] == 2
+
+def test_persists_to_disk(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    ask(LLMResponseCache(path=path), FakeLLM(), "question")
+    assert LLMResponseCache(path=path).get("question", "fake-gpt") == "answer 1"
+
+def test_helpers():
+    assert normalize_prompt("  a \n  b ") == "a b"
+    assert snapshot_hash({"AAPL": 1}) == snapshot_hash({"AAPL": 1})
+    assert snapshot_hash({"AAPL": 1}) != snapshot_hash({"AAPL": 2})
+
+# --- Streaming Tests ---
+def test_astream_caches_full_response():
+    cache, llm = LLMResponseCache(), FakeLLM()
+
+    async def collect():
+        return [token async for token in cache.astream(llm, [HumanMessage(content="question")])]
+
+    assert asyncio.run(collect()) == ["answer", " ", "1"]
+    assert asyncio.run(collect()) == ["answer 1"]
+    assert llm.calls == 1
+
+# --- Agent Integration Tests ---
+def test_tax_analyser_reuses_response_for_same_snapshot():
+    ta = TaxAnalyser("test_api_key")
+    fake = FakeLLM()
+    ta.llm = fake
+    recommendations = {"AAPL": "Sell"}
+    stock_data = {"AAPL": {"buy_price": 100, "holding_period": 24}}
+
+    first = ta.analyse_selling_strategy(recommendations, stock_data)
+    assert ta.analyse_selling_strategy(recommendations, stock_data) == first
+    assert fake.calls == 1
+
+    stock_data["AAPL"]["holding_period"] = 25
+    ta.analyse_selling_strategy(recommendations, stock_data)
+    assert fake.calls == 2
+    assert get_llm_cache().stats()["entries"] == 1
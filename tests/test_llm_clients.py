@@ -0,0 +1,62 @@
+import sys
+from unittest.mock import MagicMock, patch
+from agents.stock_advisor import StockAdvisor
+from agents.tax_advisor import TaxAdvisor
+from tools.lazy import LazyModule, lazy_import
+from tools.llm_clients import get_llm_clients
+from tools.tax_analyser import TaxAnalyser
+from workflow import PortfolioWorkflow
+
+
+# --- Lazy Import Tests ---
+def test_lazy_module_imports_on_first_attribute():
+    module = LazyModule("json")
+
+    assert "not loaded" in repr(module)
+    assert module.dumps([1]) == "[1]"
+    assert "(loaded)" in repr(module)
+
+def test_lazy_import_returns_already_imported_module():
+    assert lazy_import("os") is sys.modules["os"]
+    assert isinstance(lazy_import("not_imported_yet_module"), LazyModule)
+
+def test_patching_through_lazy_module_patches_real_module():
+    module = LazyModule("json")
+    with patch.object(module, "dumps", return_value="patched"):
+        assert sys.modules["json"].dumps([1]) == "patched"
+    assert sys.modules["json"].dumps([1]) == "[1]"
+
+
+# --- Shared Client Tests ---
+@patch("tools.llm_clients.langchain_openai")
+def test_agents_share_one_chat_model_per_key(mock_langchain):
+    mock_langchain.ChatOpenAI.side_effect = lambda **kwargs: MagicMock(kwargs=kwargs)
+    stock = StockAdvisor("portfolio.xlsx", "test_api_key", background_refresh=False)
+    tax, analyser = TaxAdvisor("test_api_key"), TaxAnalyser("test_api_key")
+
+    # Nothing is built until a prompt needs it
+    assert not mock_langchain.ChatOpenAI.called
+
+    assert stock.llm is tax.llm is analyser.llm
+    assert mock_langchain.ChatOpenAI.call_count == 1
+    assert stock.llm.kwargs == {"model": "gpt-4", "openai_api_key": "test_api_key", "stream_usage": True}
+    assert TaxAdvisor("other_key").llm is not stock.llm
+
+@patch("tools.llm_clients.openai")
+def test_workflows_share_one_openai_client(mock_openai):
+    first = PortfolioWorkflow("a.xlsx", "test_api_key", tax_agent=MagicMock())
+    second = PortfolioWorkflow("b.xlsx", "test_api_key", tax_agent=MagicMock())
+
+    assert not mock_openai.OpenAI.called
+    assert first.openai_client is second.openai_client
+    mock_openai.OpenAI.assert_called_once_with(api_key="test_api_key")
+
+def test_assigned_client_overrides_only_that_instance():
+    clients = get_llm_clients("test_api_key")
+    shared = MagicMock()
+    with patch.object(clients, "chat", return_value=shared):
+        advisor, other = TaxAdvisor("test_api_key"), TaxAdvisor("test_api_key")
+        advisor.llm = MagicMock()
+
+        assert advisor.llm is not shared
+        assert other.llm is shared
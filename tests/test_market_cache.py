@@ -0,0 +1,173 @@
+import sqlite3
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+import pandas as pd
+from tools.market_cache import PRUNE_INTERVAL, MarketDataCache
+from tools.stock_fetcher import get_stock_price, get_stock_prices
+from tools.stock_recommender import StockRecommender
+
+# --- Cache Behaviour Tests ---
+def test_get_or_fetch_counts_hits_and_misses():
+    cache = MarketDataCache()
+    fetch = MagicMock(return_value=123.0)
+
+    assert cache.get_or_fetch("quote", "AAPL", fetch) == 123.0
+    assert cache.get_or_fetch("quote", "AAPL", fetch) == 123.0
+    assert fetch.call_count == 1
+    assert cache.stats()["kinds"]["quote"] == {"hits": 1, "misses": 1}
+
+def test_concurrent_misses_share_one_fetch():
+    cache = MarketDataCache()
+    release = threading.Event()
+    fetch = MagicMock(side_effect=lambda: release.wait() and {"sector": "Tech"})
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(cache.get_or_fetch, "fundamentals", "AAPL", fetch) for _ in range(4)]
+        time.sleep(0.05)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == [{"sector": "Tech"}] * 4
+    assert fetch.call_count == 1
+
+def test_failed_fetch_is_retried_by_waiters():
+    cache = MarketDataCache()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait()
+        raise ConnectionError("down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(cache.get_or_fetch, "quote", "AAPL", failing)
+        started.wait()
+        waiter = pool.submit(cache.get_or_fetch, "quote", "AAPL", lambda: 123.0)
+        time.sleep(0.05)
+        release.set()
+
+        with pytest.raises(ConnectionError):
+            leader.result()
+        assert waiter.result() == 123.0
+
+def test_expired_entries_are_refetched():
+    cache = MarketDataCache(ttls={"quote": 10})
+    with patch("tools.market_cache.time.time", return_value=1000.0):
+        cache.set("quote", "AAPL", 1.0)
+    with patch("tools.market_cache.time.time", return_value=1005.0):
+        assert cache.get("quote", "AAPL") == 1.0
+    with patch("tools.market_cache.time.time", return_value=1011.0):
+        assert cache.get("quote", "AAPL") is None
+
+def test_lru_eviction():
+    cache = MarketDataCache(max_entries=2)
+    cache.set("quote", "A", 1.0)
+    cache.set("quote", "B", 2.0)
+    cache.get("quote", "A")  # A is now most recently used
+    cache.set("quote", "C", 3.0)
+
+    assert cache.get("quote", "B") is None
+    assert cache.get("quote", "A") == 1.0
+    assert cache.stats()["size"] == 2
+
+def test_failures_are_not_cached():
+    cache = MarketDataCache()
+    cache.set("quote", "BAD", None)
+    cache.set("history", "EMPTY", pd.DataFrame())
+    assert cache.stats()["size"] == 0
+
+def test_disk_store_survives_restart(tmp_path):
+    path = str(tmp_path / "market.sqlite")
+    MarketDataCache(path=path).set("fundamentals", "AAPL", {"currentPrice": 100})
+
+    restarted = MarketDataCache(path=path)
+    assert restarted.get("fundamentals", "AAPL") == {"currentPrice": 100}
+
+def count_rows(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COUNT(*) FROM market_cache").fetchone()[0]
+
+def test_disk_store_prunes_expired_rows(tmp_path):
+    path = str(tmp_path / "market.sqlite")
+    cache = MarketDataCache(ttls={"quote": 10}, path=path)
+    with patch("tools.market_cache.time.time", return_value=1000.0):
+        cache.set("quote", "OLD", 1.0)
+        cache.set("fundamentals", "AAPL", {"currentPrice": 100})
+    with patch("tools.market_cache.time.time", return_value=1005.0):
+        cache.set("quote", "NEW", 2.0)
+
+    # Reopening the store drops the expired quote and keeps the fresh rows
+    with patch("tools.market_cache.time.time", return_value=1012.0):
+        reopened = MarketDataCache(ttls={"quote": 10}, path=path)
+        assert count_rows(path) == 2
+        assert reopened.get("quote", "NEW") == 2.0
+
+    # While running, expired rows are deleted at most every PRUNE_INTERVAL seconds
+    with patch("tools.market_cache.time.time", return_value=1012.0 + PRUNE_INTERVAL - 1):
+        reopened.set("quote", "LATER", 3.0)
+    assert count_rows(path) == 3
+    with patch("tools.market_cache.time.time", return_value=1012.0 + PRUNE_INTERVAL):
+        reopened.set("quote", "LATEST", 4.0)
+    assert count_rows(path) == 3  # fundamentals, LATER and LATEST
+
+def test_set_many_writes_one_transaction(tmp_path):
+    path = str(tmp_path / "market.sqlite")
+    cache = MarketDataCache(path=path)
+    cache._db = MagicMock(wraps=cache._db)
+
+    cache.set_many("quote", {"AAPL": 190.0, "MSFT": 410.0, "BAD": None})
+
+    assert cache._db.commit.call_count == 1
+    assert count_rows(path) == 2
+    assert cache.get_many("quote", ["AAPL", "MSFT", "BAD"]) == {"AAPL": 190.0, "MSFT": 410.0}
+
+@patch("tools.stock_fetcher.yf.download")
+def test_batched_prices_are_cached_with_one_write_per_download(mock_download, tmp_path):
+    columns = pd.MultiIndex.from_product([["Close"], ["AAPL", "MSFT"]])
+    mock_download.return_value = pd.DataFrame([[190.0, 410.0]], columns=columns)
+    cache = MarketDataCache(path=str(tmp_path / "market.sqlite"))
+
+    with patch("tools.stock_fetcher.get_market_cache", return_value=cache), \
+            patch.object(cache, "set_many", wraps=cache.set_many) as set_many:
+        get_stock_prices(["AAPL", "MSFT"])
+
+    set_many.assert_called_once_with("quote", {"AAPL": 190.0, "MSFT": 410.0})
+
+# --- Read-through Tests ---
+@patch("tools.stock_fetcher.yf.Ticker")
+def test_get_stock_price_reads_through_cache(mock_ticker_class):
+    mock_ticker_class.return_value.history.return_value = pd.DataFrame({"Close": [123.45]})
+
+    assert get_stock_price("AAPL") == 123.45
+    assert get_stock_price("AAPL") == 123.45
+    assert mock_ticker_class.return_value.history.call_count == 1
+
+@patch("tools.stock_fetcher.yf.download")
+def test_get_stock_prices_only_downloads_misses(mock_download):
+    mock_download.return_value = pd.DataFrame(
+        [[410.5]], columns=pd.MultiIndex.from_product([["Close"], ["MSFT"]])
+    )
+
+    with patch("tools.stock_fetcher.yf.Ticker") as mock_ticker_class:
+        mock_ticker_class.return_value.history.return_value = pd.DataFrame({"Close": [123.45]})
+        get_stock_price("AAPL")
+
+    assert get_stock_prices(["AAPL", "MSFT"]) == {"AAPL": 123.45, "MSFT": 410.5}
+    assert mock_download.call_args[0][0] == ["MSFT"]
+
+@patch("tools.stock_recommender.yf.Ticker")
+def test_fetch_stock_data_reuses_cached_fundamentals(mock_ticker_class):
+    mock_ticker = MagicMock()
+    mock_ticker.info = {"currentPrice": 100, "targetMeanPrice": 120}
+    mock_ticker.history.return_value = pd.DataFrame({"Close": [100, 105]})
+    mock_ticker_class.return_value = mock_ticker
+
+    sr = StockRecommender(cache=MarketDataCache())
+    sr.fetch_stock_data("AAPL")
+    sr.fetch_stock_data("AAPL")
+
+    assert mock_ticker.history.call_count == 1
+    assert sr.cache.stats()["kinds"]["fundamentals"] == {"hits": 1, "misses": 1}
@@ -0,0 +1,88 @@
+import pytest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from tools.portfolio import Portfolio, get_portfolio
+
+holdings = pd.DataFrame({
+    "Ticker": ["AAPL", "MSFT", "AAPL"],
+    "Quantity": [10, 5, 2],
+    "Recommendation": ["Buy", "Hold", "Buy"],
+})
+
+# --- Loading Tests ---
+@patch("tools.portfolio.pd.read_excel", return_value=holdings)
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(1, 100))
+def test_loads_columns(mock_signature, mock_read_excel):
+    portfolio = Portfolio("portfolio.xlsx")
+
+    assert portfolio.tickers.tolist() == ["AAPL", "MSFT", "AAPL"]
+    assert portfolio.quantities.dtype == np.float64
+    assert portfolio.unique_tickers == ["AAPL", "MSFT"]
+    assert portfolio.recommendation_map() == {"AAPL": "Buy", "MSFT": "Hold"}
+
+@patch("tools.portfolio.pd.read_excel", return_value=holdings)
+@patch("tools.portfolio.Portfolio._file_signature")
+def test_reloads_only_when_file_changes(mock_signature, mock_read_excel):
+    mock_signature.return_value = (1, 100)
+    get_portfolio("portfolio.xlsx")
+    get_portfolio("portfolio.xlsx")
+    assert mock_read_excel.call_count == 1
+
+    mock_signature.return_value = (2, 100)
+    get_portfolio("portfolio.xlsx")
+    assert mock_read_excel.call_count == 2
+
+@patch("tools.portfolio.pd.read_excel", return_value=pd.DataFrame({"Symbol": ["AAPL"]}))
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(1, 100))
+def test_missing_columns_raises(mock_signature, mock_read_excel):
+    with pytest.raises(ValueError):
+        Portfolio("portfolio.xlsx")
+
+@patch("tools.portfolio.Portfolio._file_signature")
+def test_reload_publishes_columns_and_codes_together(mock_signature):
+    mock_signature.return_value = (1, 100)
+    with patch("tools.portfolio.pd.read_excel", return_value=holdings):
+        portfolio = Portfolio("portfolio.xlsx")
+
+    # A reader running while the reload is still factorizing sees the old holdings whole
+    seen = []
+    factorize = pd.factorize
+
+    def factorize_while_reading(*args, **kwargs):
+        seen.append((portfolio.unique_tickers, portfolio.position_quantities().tolist()))
+        return factorize(*args, **kwargs)
+
+    mock_signature.return_value = (2, 100)
+    grown = pd.DataFrame({"Ticker": ["AAPL", "MSFT", "NVDA", "TSLA"], "Quantity": [1, 2, 3, 4]})
+    with patch("tools.portfolio.pd.read_excel", return_value=grown), \
+            patch("tools.portfolio.pd.factorize", side_effect=factorize_while_reading):
+        assert portfolio.refresh()
+
+    assert seen == [(["AAPL", "MSFT"], [12.0, 5.0])]
+    assert portfolio.position_quantities().tolist() == [1.0, 2.0, 3.0, 4.0]
+
+# --- Valuation Tests ---
+@patch("tools.portfolio.pd.read_excel", return_value=holdings)
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(1, 100))
+def test_vectorized_valuation(mock_signature, mock_read_excel):
+    portfolio = Portfolio("portfolio.xlsx")
+
+    assert portfolio.position_quantities().tolist() == [12.0, 5.0]
+    values = portfolio.position_values({"AAPL": 150.0, "MSFT": None})
+    assert values[0] == 1800.0 and np.isnan(values[1])
+    assert portfolio.total_value({"AAPL": 150.0, "MSFT": 400.0}) == 3800.0
+
+@patch("tools.portfolio.pd.DataFrame.to_excel")
+@patch("tools.portfolio.pd.read_excel", return_value=holdings[["Ticker", "Quantity"]])
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(1, 100))
+def test_write_recommendations(mock_signature, mock_read_excel, mock_to_excel):
+    portfolio = Portfolio("portfolio.xlsx")
+    assert portfolio.recommendation_map() == {}
+
+    assert portfolio.write_recommendations(["Sell", "Buy", "Sell"]) == 2
+
+    assert not mock_to_excel.called
+    assert portfolio.recommendation_map() == {"AAPL": "Sell", "MSFT": "Buy"}
+    assert not portfolio.refresh()
+    assert portfolio.write_recommendations(["Sell", "Buy", "Sell"]) == 0
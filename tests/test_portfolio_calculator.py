@@ -10,9 +10,10 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from tools.portfolio_calculator import calculate_portfolio_value
 
 
-@patch("tools.portfolio_calculator.get_stock_price")
-@patch("tools.portfolio_calculator.pd.read_excel")
-def test_calculate_portfolio_value_returns_correct_result(mock_read_excel, mock_get_stock_price):
+@patch("tools.portfolio_calculator.get_stock_prices")
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(0, 0))
+@patch("tools.portfolio.pd.read_excel")
+def test_calculate_portfolio_value_returns_correct_result(mock_read_excel, mock_signature, mock_get_stock_prices):
     # Simulate Excel file content
     data = pd.DataFrame({
         "Ticker": ["AAPL", "GOOGL", "MSFT"],
@@ -21,7 +22,7 @@ def test_calculate_portfolio_value_returns_correct_result(mock_read_excel, mock_
     mock_read_excel.return_value = data
 
     # Mock stock prices
-    mock_get_stock_price.side_effect = [150.0, 2800.0, 300.0]  # Prices for AAPL, GOOGL, MSFT
+    mock_get_stock_prices.return_value = {"AAPL": 150.0, "GOOGL": 2800.0, "MSFT": 300.0}
 
     result = calculate_portfolio_value("fake_path.xlsx")
 
@@ -34,9 +35,48 @@ def test_calculate_portfolio_value_returns_correct_result(mock_read_excel, mock_
     }
     expected_total = round(150.0 * 10 + 2800.0 * 5 + 300.0 * 8, 2)
     assert result["total_value"] == expected_total
+    mock_get_stock_prices.assert_called_once_with(["AAPL", "GOOGL", "MSFT"])
 
 
-@patch("tools.portfolio_calculator.pd.read_excel", side_effect=Exception("File error"))
+@patch("tools.portfolio_calculator.get_stock_prices", return_value={"AAPL": 150.0})
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(0, 0))
+@patch("tools.portfolio.pd.read_excel", return_value=pd.DataFrame({"Ticker": ["AAPL"], "Quantity": [10]}))
+def test_calculate_portfolio_value_does_not_write_derived_store(mock_read_excel, mock_signature, mock_get_stock_prices,
+                                                                derived_store_dir):
+    assert calculate_portfolio_value("fake_path.xlsx")["total_value"] == 1500.0
+    assert not derived_store_dir.exists() or not any(derived_store_dir.iterdir())
+
+
+@patch("tools.portfolio_calculator.get_stock_prices")
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(0, 0))
+@patch("tools.portfolio.pd.read_excel")
+def test_calculate_portfolio_value_skips_failed_tickers(mock_read_excel, mock_signature, mock_get_stock_prices):
+    mock_read_excel.return_value = pd.DataFrame({
+        "Ticker": ["AAPL", "BAD", "AAPL"],
+        "Quantity": [10, 3, 5]
+    })
+    mock_get_stock_prices.return_value = {"AAPL": 150.0, "BAD": None}
+
+    result = calculate_portfolio_value("fake_path.xlsx")
+
+    assert result["quantities"] == {"AAPL": 15}
+    assert result["stocks"] == {"AAPL": 150.0 * 15}
+    assert result["total_value"] == 2250.0
+
+
+@patch("tools.portfolio_calculator.get_stock_prices", return_value={"MSFT": 300.0})
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(0, 0))
+@patch("tools.portfolio.pd.read_excel")
+def test_calculate_portfolio_value_only_fetches_missing_prices(mock_read_excel, mock_signature, mock_get_stock_prices):
+    mock_read_excel.return_value = pd.DataFrame({"Ticker": ["AAPL", "MSFT"], "Quantity": [10, 8]})
+
+    result = calculate_portfolio_value("fake_path.xlsx", prices={"AAPL": 150.0, "GOOGL": 2800.0})
+
+    assert result["stocks"] == {"AAPL": 1500.0, "MSFT": 2400.0}
+    mock_get_stock_prices.assert_called_once_with(["MSFT"])
+
+
+@patch("tools.portfolio.pd.read_excel", side_effect=Exception("File error"))
 def test_calculate_portfolio_value_file_error_returns_none(mock_read_excel):
     result = calculate_portfolio_value("invalid.xlsx")
     assert result is None
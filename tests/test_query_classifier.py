@@ -0,0 +1,88 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+from tools.query_classifier import NgramModel, QueryClassifier, SEED_EXAMPLES, normalize_query
+
+# --- Rule Tier Tests ---
+@pytest.mark.parametrize("query, expected", [
+    ("What is the current value of my portfolio?", "stock"),
+    ("What is the price of INFY?", "stock"),
+    ("How should I withdraw funds from my IRA efficiently?", "tax"),
+    ("What is my capital gains liability?", "tax"),
+])
+def test_rules_answer_clear_queries(query, expected):
+    llm = MagicMock()
+    classifier = QueryClassifier(llm_classify=llm)
+
+    assert classifier.classify(query) == expected
+    assert classifier.stats()["rules"] == 1
+    assert not llm.called
+
+# --- Model Tier Tests ---
+def test_model_learns_seed_examples():
+    model = NgramModel().fit(*zip(*SEED_EXAMPLES))
+    for text, label in SEED_EXAMPLES:
+        assert (model.predict_proba(text) >= 0.5) == (label == "tax")
+
+def test_model_round_trips_through_disk(tmp_path):
+    model = NgramModel().fit(*zip(*SEED_EXAMPLES))
+    path = str(tmp_path / "router.npz")
+    model.save(path)
+
+    loaded = NgramModel.load(path)
+    assert loaded.predict_proba("Is my RMD due?") == pytest.approx(model.predict_proba("Is my RMD due?"))
+
+# --- Fallback, Memo and Threshold Tests ---
+def test_uncertain_queries_fall_back_to_llm():
+    llm = MagicMock(return_value="tax")
+    classifier = QueryClassifier(llm_classify=llm, threshold=1.01)
+
+    assert classifier.classify("Should I sell my shares to pay the tax bill?") == "tax"
+    assert classifier.classify("Should I sell my shares to pay the tax bill?") == "tax"
+    assert llm.call_count == 1
+    assert classifier.stats()["llm"] == 1
+    assert classifier.stats()["memo"] == 1
+
+def test_low_threshold_keeps_queries_local():
+    llm = MagicMock(return_value="tax")
+    classifier = QueryClassifier(llm_classify=llm, threshold=0.0)
+
+    classifier.classify("Tell me something interesting")
+    assert not llm.called
+    assert classifier.stats()["model"] == 1
+
+def test_needs_llm_matches_the_fallback():
+    llm = MagicMock(return_value="tax")
+    classifier = QueryClassifier(llm_classify=llm, threshold=1.01)
+
+    assert not classifier.needs_llm("What is the price of INFY?")
+    assert not classifier.needs_llm("Should I sell AAPL and what is the tax hit?")
+    assert classifier.needs_llm("Tell me something interesting")
+    classifier.classify("Tell me something interesting")
+    assert not classifier.needs_llm("Tell me something interesting")
+    assert not QueryClassifier(threshold=1.01).needs_llm("Tell me something interesting")
+
+def test_memoizes_normalized_queries():
+    classifier = QueryClassifier()
+    classifier.classify("What is the price of INFY?")
+    classifier.classify("  what is the PRICE of infy? ")
+
+    assert classifier.stats() == {"memo": 1, "rules": 1, "model": 0, "llm": 0}
+    assert normalize_query("  A   b ") == "a b"
+
+def test_local_classification_is_fast():
+    classifier = QueryClassifier(memo_size=0)
+    start = time.perf_counter()
+    for _ in range(200):
+        classifier.classify_local("Tell me something interesting about my account")
+    assert (time.perf_counter() - start) / 200 < 0.001
+
+# --- Mixed Routing Tests ---
+@pytest.mark.parametrize("query, expected", [
+    ("Should I sell TSLA and what's the tax hit?", "both"),
+    ("What is my portfolio worth? Also how much is my RMD?", "both"),
+    ("How can I sell stocks with minimum tax impact?", "tax"),
+    ("What is the price of INFY?", "stock"),
+])
+def test_route_detects_mixed_questions(query, expected):
+    assert QueryClassifier(llm_classify=MagicMock(return_value="stock")).route(query) == expected
@@ -0,0 +1,84 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from tools.rate_limiter import AdaptiveConcurrency, PerClientLimiter, TokenBucket, is_throttle_error, retry_with_backoff
+
+# --- Throttle Detection Tests ---
+def test_is_throttle_error():
+    assert is_throttle_error(Exception("HTTP Error 429"))
+    assert is_throttle_error(Exception("Too Many Requests. Rate limited."))
+    assert not is_throttle_error(ValueError("No data found"))
+
+# --- Token Bucket Tests ---
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # One token is available immediately, the other five arrive at 50/s
+    assert time.monotonic() - start >= 0.09
+
+# --- Adaptive Concurrency Tests ---
+def test_adaptive_concurrency_halves_on_throttle_and_recovers():
+    limiter = AdaptiveConcurrency(max_limit=8)
+
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 5
+
+def test_adaptive_concurrency_bounds_in_flight():
+    limiter = AdaptiveConcurrency(max_limit=2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        limiter.acquire()
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        limiter.release()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] <= 2
+
+# --- Retry Tests ---
+@patch("tools.rate_limiter.time.sleep")
+def test_retry_with_backoff_succeeds_after_failures(mock_sleep):
+    func = MagicMock(side_effect=[OSError("reset"), OSError("reset"), "ok"])
+    assert retry_with_backoff(func, retries=3) == "ok"
+    assert func.call_count == 3
+    for call in mock_sleep.call_args_list:
+        assert 0 <= call.args[0] <= 8.0
+
+@patch("tools.rate_limiter.time.sleep")
+def test_retry_with_backoff_stops_on_non_retryable(mock_sleep):
+    func = MagicMock(side_effect=ValueError("bad data"))
+    with pytest.raises(ValueError):
+        retry_with_backoff(func, retries=3, retry_on=lambda e: isinstance(e, OSError))
+    assert func.call_count == 1
+    assert not mock_sleep.called
+
+# --- Per-Client Limiter Tests ---
+def test_per_client_limiter_rejects_over_limit_only_for_that_client():
+    limiter = PerClientLimiter(max_concurrent=2)
+
+    assert limiter.try_acquire("a") and limiter.try_acquire("a")
+    assert not limiter.try_acquire("a")
+    assert limiter.try_acquire("b")
+
+    limiter.release("a")
+    assert limiter.try_acquire("a")
+    assert limiter.rejected == 1
@@ -0,0 +1,137 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from statistics import NormalDist
+from unittest.mock import patch, MagicMock
+from tools.history_store import HistoryStore
+from tools.risk import PortfolioRisk, format_risk_summary, max_drawdowns, portfolio_risk, returns_matrix
+
+rng = np.random.default_rng(7)
+
+
+def random_closes(days: int, tickers: int) -> np.ndarray:
+    return 100 * np.cumprod(1 + rng.normal(0.0005, 0.015, (days, tickers)), axis=0)
+
+
+# --- Returns and Drawdown Tests ---
+def test_returns_matrix_bridges_missing_bars():
+    closes = np.array([[10.0, 20.0], [11.0, np.nan], [12.1, 22.0]])
+    assert returns_matrix(closes) == pytest.approx(np.array([[0.1, 0.0], [0.1, 0.1]]))
+
+def test_returns_before_first_bar_are_missing():
+    closes = np.array([[10.0, np.nan], [11.0, np.nan], [12.1, 20.0], [12.1, 22.0]])
+    returns = returns_matrix(closes)
+    assert np.isnan(returns[:2, 1]).all()
+    assert returns[2] == pytest.approx([0.0, 0.1])
+
+def test_max_drawdowns():
+    returns = np.array([[0.1], [-0.5], [0.2]])
+    worst, current = max_drawdowns(returns)
+    assert worst[0] == pytest.approx(-0.5)
+    assert current[0] == pytest.approx(-0.4)
+
+
+# --- Portfolio Risk Tests ---
+def test_vectorized_figures_match_pandas_and_definitions():
+    closes = random_closes(250, 4)
+    benchmark = random_closes(250, 1)[:, 0]
+    values = [4000.0, 3000.0, 2000.0, 1000.0]
+    risk = PortfolioRisk(["A", "B", "C", "D"], values, closes, benchmark)
+
+    frame = pd.DataFrame(closes, columns=list("ABCD")).pct_change().dropna()
+    weights = np.array(values) / sum(values)
+    portfolio = frame.to_numpy() @ weights
+
+    position_vol, portfolio_vol = risk.volatility()
+    assert position_vol == pytest.approx(frame.std().to_numpy() * np.sqrt(252))
+    assert portfolio_vol == pytest.approx(np.std(portfolio, ddof=1) * np.sqrt(252))
+    assert risk.correlation().to_numpy() == pytest.approx(frame.corr().to_numpy())
+
+    corr = frame.corr().to_numpy()
+    assert risk.average_correlation() == pytest.approx(corr[np.triu_indices(4, 1)].mean())
+    assert risk.risk_contributions().sum() == pytest.approx(1.0)
+
+    bench = pd.Series(benchmark).pct_change().dropna().to_numpy()
+    betas, portfolio_beta = risk.betas()
+    assert betas[0] == pytest.approx(np.cov(frame["A"], bench)[0, 1] / np.var(bench, ddof=1))
+    assert portfolio_beta == pytest.approx(betas @ weights)
+
+def test_late_listed_position_is_measured_over_its_own_history():
+    closes = random_closes(250, 3)
+    closes[:230, 2] = np.nan  # C only has its last 20 bars in the window
+    benchmark = random_closes(250, 1)[:, 0]
+    risk = PortfolioRisk(["A", "B", "C"], [5000.0, 3000.0, 2000.0], closes, benchmark)
+
+    frame = pd.DataFrame(closes, columns=list("ABC")).pct_change(fill_method=None).iloc[1:]
+    position_vol, _ = risk.volatility()
+    assert position_vol == pytest.approx(frame.std().to_numpy() * np.sqrt(252))
+    assert risk.correlation().to_numpy() == pytest.approx(frame.corr().to_numpy())
+
+    bench = pd.Series(benchmark).pct_change().iloc[1:].to_numpy()
+    recent = frame["C"].notna().to_numpy()
+    betas, _ = risk.betas()
+    assert betas[2] == pytest.approx(np.cov(frame["C"][recent], bench[recent])[0, 1] / np.var(bench[recent], ddof=1))
+
+    # Before C trades, the portfolio return is that of A and B, reweighted
+    assert risk.portfolio_returns[0] == pytest.approx(frame.iloc[0, :2] @ np.array([5, 3]) / 8)
+    summary = risk.summary()
+    assert summary["short_history"] == [("C", 19)]
+    assert "Short History (figures less reliable): C 19 days" in format_risk_summary(summary)
+
+def test_value_at_risk():
+    closes = random_closes(1000, 3)
+    risk = PortfolioRisk(["A", "B", "C"], [1, 1, 1], closes)
+    returns = risk.portfolio_returns
+
+    figures = risk.value_at_risk(0.95)
+
+    assert figures["historical_var"] == pytest.approx(-np.quantile(returns, 0.05))
+    assert figures["historical_cvar"] >= figures["historical_var"] > 0
+    assert figures["parametric_var"] == pytest.approx(-(returns.mean() - 1.6448536 * returns.std(ddof=1)), rel=1e-6)
+    assert figures["parametric_cvar"] > figures["parametric_var"]
+
+def test_no_benchmark_means_no_beta():
+    risk = PortfolioRisk(["A"], [100.0], random_closes(30, 1), benchmark_closes=np.full(30, np.nan))
+    assert risk.betas() == (None, None)
+    assert risk.summary()["beta"] is None
+
+def test_requires_history():
+    with pytest.raises(ValueError):
+        PortfolioRisk(["A"], [100.0], random_closes(2, 1))
+
+
+# --- Summary Tests ---
+def test_summary_and_prompt_text():
+    closes = random_closes(250, 6)
+    tickers = ["A", "B", "C", "D", "E", "F"]
+    summary = PortfolioRisk(tickers, [6, 5, 4, 3, 2, 1], closes, random_closes(250, 1)[:, 0],
+                            pd.bdate_range("2024-01-01", periods=250)).summary(top=3)
+
+    assert [p["ticker"] for p in summary["positions"]] == ["A", "B", "C"]
+    assert len(summary["top_risk_contributors"]) == 3
+    assert summary["var"][0.99]["historical_var"] >= summary["var"][0.95]["historical_var"]
+
+    text = format_risk_summary(summary)
+    assert "Annualized Volatility:" in text and "1-Day VaR 95%" in text and "Most Correlated Pairs:" in text
+
+def test_portfolio_risk_reads_local_history(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=60)
+    for ticker, column in zip(["AAPL", "MSFT", "SPY"], random_closes(60, 3).T):
+        store.append(ticker, pd.DataFrame({"Close": column}, index=index))
+
+    portfolio_data = {"stocks": {"AAPL": 1000.0, "MSFT": 500.0, "NEW": 50.0}, "quantities": {}, "total_value": 1550.0}
+    risk = portfolio_risk(store, portfolio_data)
+
+    assert risk.tickers == ["AAPL", "MSFT"]
+    assert risk.betas()[1] is not None
+
+def test_thousands_of_positions():
+    closes = random_closes(252, 3000)
+    risk = PortfolioRisk([f"T{i}" for i in range(3000)], rng.uniform(1, 100, 3000), closes, random_closes(252, 1)[:, 0])
+
+    start = time.perf_counter()
+    summary = risk.summary()
+    assert time.perf_counter() - start < 2.0
+    assert summary["positions_count"] == 3000
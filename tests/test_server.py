@@ -0,0 +1,158 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+from http import HTTPStatus
+from unittest.mock import patch
+from benchmarks.load_test import http_request, run_load_test
+from server import PortfolioService
+
+portfolio_data = {"stocks": {"AAPL": 1500.0}, "quantities": {"AAPL": 10}, "total_value": 1500.0}
+
+
+@pytest.fixture
+def service():
+    with patch("server.PortfolioWorkflow") as workflow, patch("server.TaxAdvisor"):
+        workflow.return_value.handle_query.side_effect = lambda question: f"answer to {question}"
+        yield PortfolioService({"main": "portfolio.xlsx", "ira": "ira.xlsx"}, "test_api_key", max_per_client=2,
+                                trusted_proxies=("proxy",))
+
+
+def call(service, *requests):
+    async def run():
+        server = await service.start("127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+        async with server:
+            reader, writer = await asyncio.open_connection(host, port)
+            results = [await http_request(reader, writer, *request) for request in requests]
+            writer.close()
+            return results
+    return asyncio.run(run())
+
+
+# --- Routing Tests ---
+@patch("server.TaxAdvisor")
+@patch("server.PortfolioWorkflow")
+def test_workflows_share_one_tax_agent_and_classifier(mock_workflow, mock_tax_advisor):
+    service = PortfolioService({"main": "portfolio.xlsx", "ira": "ira.xlsx"}, "test_api_key")
+
+    assert mock_workflow.call_count == 2 and mock_tax_advisor.call_count == 1
+    for call_args in mock_workflow.call_args_list:
+        assert call_args.kwargs == {"tax_agent": service.tax_agent, "classifier": service.classifier}
+
+@patch("server.calculate_portfolio_value", return_value=portfolio_data)
+def test_routes_over_one_keep_alive_connection(mock_calculate, service):
+    results = call(
+        service,
+        ("GET", "/health"),
+        ("GET", "/portfolio?portfolio=ira"),
+        ("POST", "/ask", {"question": "How diversified am I?"}),
+        ("POST", "/ask", {"question": "  "}),
+        ("GET", "/portfolio?portfolio=unknown"),
+        ("DELETE", "/ask"),
+        ("GET", "/nope"),
+    )
+
+    assert [status for status, _ in results] == [200, 200, 200, 400, 404, 405, 404]
+    assert results[1][1] == portfolio_data
+    assert results[2][1] == {"answer": "answer to How diversified am I?"}
+    mock_calculate.assert_called_once_with("ira.xlsx")
+
+@patch("server.get_stock_prices", side_effect=lambda tickers: {t: 100.0 for t in tickers})
+def test_price_route_validates_tickers(mock_prices, service):
+    ok, empty = call(service, ("GET", "/price?ticker=aapl,MSFT,AAPL"), ("GET", "/price"))
+    assert ok == (200, {"prices": {"AAPL": 100.0, "MSFT": 100.0}})
+    assert empty[0] == 400
+
+@patch("server.get_stock_prices", side_effect=lambda tickers: {t: 100.0 for t in tickers})
+def test_price_route_downloads_many_tickers_in_one_call(mock_prices, service):
+    tickers = [f"T{i}" for i in range(50)]
+    (status, body), = call(service, ("GET", "/price?ticker=" + ",".join(tickers)))
+
+    assert status == 200 and body["prices"] == {ticker: 100.0 for ticker in tickers}
+    mock_prices.assert_called_once_with(tickers)
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_invalid_content_length_returns_400(service, length):
+    async def run():
+        server = await service.start("127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+        async with server:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f"POST /ask HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+    assert asyncio.run(run()).startswith(b"HTTP/1.1 400 ")
+
+
+# --- Coalescing and Limit Tests ---
+def test_concurrent_portfolio_requests_are_coalesced(service):
+    calls = []
+
+    def slow_value(path):
+        calls.append(path)
+        time.sleep(0.05)
+        return portfolio_data
+
+    async def run():
+        return await asyncio.gather(*(service.portfolio_value("main") for _ in range(10)))
+
+    with patch("server.calculate_portfolio_value", side_effect=slow_value):
+        assert asyncio.run(run()) == [portfolio_data] * 10
+    assert calls == ["portfolio.xlsx"]
+
+def test_per_client_limit_returns_429(service):
+    release = threading.Event()
+    service.workflows["main"].handle_query.side_effect = lambda question: release.wait(5) and question
+
+    async def run():
+        requests = [
+            service.handle("POST", "/ask", {"x-client-id": "alice"}, json.dumps({"question": f"q{i}"}).encode(), "proxy")
+            for i in range(3)
+        ]
+        tasks = [asyncio.create_task(request) for request in requests]
+        await asyncio.sleep(0.05)
+        other = await service.handle("GET", "/health", {"x-client-id": "bob"}, b"", "proxy")
+        release.set()
+        return [status for status, _ in await asyncio.gather(*tasks)], other[0]
+
+    statuses, other = asyncio.run(run())
+    assert sorted(statuses) == [HTTPStatus.OK, HTTPStatus.OK, HTTPStatus.TOO_MANY_REQUESTS]
+    assert other == HTTPStatus.OK
+
+def test_rotating_client_header_does_not_bypass_limit(service):
+    release = threading.Event()
+    service.workflows["main"].handle_query.side_effect = lambda question: release.wait(5) and question
+
+    async def run():
+        tasks = [
+            asyncio.create_task(service.handle(
+                "POST", "/ask", {"x-client-id": f"user-{i}", "x-forwarded-for": f"10.0.0.{i}"},
+                json.dumps({"question": f"q{i}"}).encode(), "203.0.113.7",
+            ))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        release.set()
+        return [status for status, _ in await asyncio.gather(*tasks)]
+
+    assert sorted(asyncio.run(run())) == [HTTPStatus.OK, HTTPStatus.OK, HTTPStatus.TOO_MANY_REQUESTS]
+
+def test_client_id_trusts_headers_only_from_proxies(service):
+    assert service.client_id({"x-client-id": "alice"}, "203.0.113.7") == "203.0.113.7"
+    assert service.client_id({"x-client-id": "alice"}, "proxy") == "alice"
+    assert service.client_id({"x-forwarded-for": "1.2.3.4, 10.0.0.5"}, "proxy") == "10.0.0.5"
+    assert service.client_id({}, "proxy") == "proxy"
+
+
+# --- Load Test ---
+def test_load_test_coalesces_upstream_calls():
+    report = run_load_test(clients=10, requests=5, portfolio_size=5, yf_latency=0.01, llm_latency=0.01)
+
+    assert report["requests"] == 50 and report["errors"] == 0
+    assert report["singleflight"]["shared"] > 0
+    assert report["upstream_llm_calls"] < report["requests"]
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from tools.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch(ticker):
+        calls.append(ticker)
+        await asyncio.sleep(0.01)
+        return f"{ticker}-price"
+
+    async def run():
+        return await asyncio.gather(*(flights.do(("price", t), fetch, t) for t in ["AAPL"] * 5 + ["MSFT"]))
+
+    assert asyncio.run(run()) == ["AAPL-price"] * 5 + ["MSFT-price"]
+    assert calls == ["AAPL", "MSFT"]
+    assert flights.stats() == {"started": 2, "shared": 4, "in_flight": 0}
+
+def test_finished_calls_are_not_cached():
+    flights = SingleFlight()
+
+    async def run():
+        await flights.do("key", asyncio.sleep, 0, "first")
+        return await flights.do("key", asyncio.sleep, 0, "second")
+
+    assert asyncio.run(run()) == "second"
+    assert flights.started == 2
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ConnectionError] * 3
+    assert flights.started == 1
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flights = SingleFlight()
+
+    async def run():
+        first = asyncio.create_task(flights.do("key", asyncio.sleep, 0.02, "done"))
+        second = asyncio.create_task(flights.do("key", asyncio.sleep, 0.02, "done"))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
+
+def test_do_many_batches_missing_keys_and_shares_in_flight_ones():
+    flights = SingleFlight()
+    batches = []
+
+    async def fetch(keys):
+        batches.append(keys)
+        await asyncio.sleep(0.01)
+        return {key: f"{key}-price" for key in keys if key != "NONE"}
+
+    async def run():
+        first = asyncio.create_task(flights.do_many(["AAPL", "MSFT"], fetch))
+        await asyncio.sleep(0)
+        second = await flights.do_many(["MSFT", "TSLA", "NONE", "TSLA"], fetch)
+        return await first, second
+
+    first, second = asyncio.run(run())
+    assert first == {"AAPL": "AAPL-price", "MSFT": "MSFT-price"}
+    assert second == {"MSFT": "MSFT-price", "TSLA": "TSLA-price", "NONE": None}
+    assert batches == [["AAPL", "MSFT"], ["TSLA", "NONE"]]
+    assert flights.stats() == {"started": 2, "shared": 1, "in_flight": 0}
+
+def test_do_many_errors_reach_every_key():
+    flights = SingleFlight()
+
+    async def fail(keys):
+        raise ConnectionError("upstream down")
+
+    async def run():
+        first = asyncio.create_task(flights.do_many(["A", "B"], fail))
+        await asyncio.sleep(0)
+        return await asyncio.gather(first, flights.do_many(["B"], fail), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ConnectionError] * 2
+    assert flights.in_flight == 0
@@ -0,0 +1,24 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pandas", "yfinance", "openai", "langchain_openai", "langchain_core", "langgraph"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main, workflow, server, batch, tools.backtester
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % HEAVY_MODULES
+
+
+def test_entry_points_import_without_heavy_dependencies():
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert probe["loaded"] == []
+    # Importing the heavy dependencies eagerly took about two seconds
+    assert probe["seconds"] < 1.0
@@ -0,0 +1,101 @@
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+import pandas as pd
+from agents.stock_advisor import StockAdvisor
+
+persisted = pd.DataFrame({"Ticker": ["AAPL", "MSFT"], "Quantity": [10, 5], "Recommendation": ["Hold", "Sell"]})
+
+# --- Startup Tests ---
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(1_700_000_000 * 10**9, 100))
+@patch("tools.portfolio.pd.read_excel", return_value=persisted)
+def test_startup_does_not_wait_for_refresh(mock_read_excel, mock_signature):
+    release = threading.Event()
+
+    def slow_update(file_path):
+        release.wait(5)
+        return {"AAPL": "Buy", "MSFT": "Sell"}
+
+    with patch("agents.stock_advisor.StockRecommender.update_excel_with_recommendations", side_effect=slow_update):
+        advisor = StockAdvisor("portfolio.xlsx", "test_api_key")
+
+        assert advisor.is_refreshing
+        assert advisor.get_stock_recommendations() == {"AAPL": "Hold", "MSFT": "Sell"}
+        assert advisor.recommendations_as_of is not None
+
+        release.set()
+        advisor.wait_for_refresh(5)
+
+    assert not advisor.is_refreshing
+    assert advisor.get_stock_recommendations() == {"AAPL": "Buy", "MSFT": "Sell"}
+
+@patch("tools.portfolio.pd.read_excel", side_effect=Exception("missing file"))
+def test_blocking_refresh(mock_read_excel):
+    with patch("agents.stock_advisor.StockRecommender.update_excel_with_recommendations", return_value={"AAPL": "Buy"}):
+        advisor = StockAdvisor("portfolio.xlsx", "test_api_key", background_refresh=False)
+
+    assert not advisor.is_refreshing
+    assert advisor.get_stock_recommendations() == {"AAPL": "Buy"}
+
+@patch("agents.stock_advisor.calculate_portfolio_value")
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(1_700_000_000 * 10**9, 100))
+@patch("tools.portfolio.pd.read_excel", return_value=persisted)
+def test_question_during_refresh_uses_last_known_data(mock_read_excel, mock_signature, mock_calculate):
+    mock_calculate.return_value = {"stocks": {"AAPL": 1500.0}, "quantities": {"AAPL": 10}, "total_value": 1500.0}
+    release = threading.Event()
+
+    with patch("agents.stock_advisor.StockRecommender.update_excel_with_recommendations", side_effect=lambda path: release.wait(5)):
+        advisor = StockAdvisor("portfolio.xlsx", "test_api_key")
+        advisor.llm = MagicMock()
+        advisor.llm.invoke.return_value = MagicMock(content="Hold AAPL.")
+
+        assert advisor.ask_stock_question("Should I sell AAPL?") == "Hold AAPL."
+        prompt = advisor.llm.invoke.call_args[0][0][0].content
+        assert "as of 2023-11-1" in prompt
+        assert "(refresh in progress)" in prompt
+        assert "AAPL: Hold" in prompt
+        assert "MSFT: Sell" not in prompt
+        assert advisor.last_context["tickers"] == ["AAPL"]
+
+        release.set()
+        advisor.wait_for_refresh(5)
+
+# --- Fast Path Tests ---
+@patch("tools.portfolio.pd.read_excel", return_value=persisted)
+def test_factual_questions_skip_the_llm(mock_read_excel):
+    portfolio_data = {"stocks": {"AAPL": 1500.0, "MSFT": 1000.0}, "quantities": {"AAPL": 10, "MSFT": 5}, "total_value": 2500.0}
+    with patch("agents.stock_advisor.StockRecommender.update_excel_with_recommendations", return_value={"AAPL": "Buy", "MSFT": "Sell"}):
+        advisor = StockAdvisor("portfolio.xlsx", "test_api_key", background_refresh=False)
+    advisor.llm = MagicMock()
+    advisor.llm.invoke.return_value = MagicMock(content="It depends.")
+
+    assert advisor.ask_stock_question("What is the price of AAPL?", portfolio_data) == "AAPL is trading at $150.00 per share."
+    assert advisor.ask_stock_question("What is the total value of my portfolio?", portfolio_data).startswith("Your portfolio is worth $2,500.00")
+    advisor.llm.invoke.assert_not_called()
+
+    assert advisor.ask_stock_question("Should I sell MSFT?", portfolio_data) == "It depends."
+    advisor.fast_path = False
+    assert advisor.ask_stock_question("What is the price of AAPL?", portfolio_data) == "It depends."
+
+# --- Risk Summary Tests ---
+@patch("tools.portfolio.pd.read_excel", return_value=persisted)
+def test_risk_questions_get_risk_summary(mock_read_excel):
+    import numpy as np
+    from tools.risk import PortfolioRisk
+
+    portfolio_data = {"stocks": {"AAPL": 1500.0, "MSFT": 1000.0}, "quantities": {"AAPL": 10, "MSFT": 5}, "total_value": 2500.0}
+    closes = 100 * np.cumprod(1 + np.random.default_rng(0).normal(0, 0.01, (60, 2)), axis=0)
+    with patch("agents.stock_advisor.StockRecommender.update_excel_with_recommendations", return_value={"AAPL": "Buy"}):
+        advisor = StockAdvisor("portfolio.xlsx", "test_api_key", background_refresh=False)
+    advisor.recommender.history_store = MagicMock()
+    advisor.llm = MagicMock()
+    advisor.llm.invoke.return_value = MagicMock(content="Moderate.")
+
+    with patch("agents.stock_advisor.portfolio_risk", return_value=PortfolioRisk(["AAPL", "MSFT"], [1500.0, 1000.0], closes)):
+        advisor.ask_stock_question("How volatile is my portfolio?", portfolio_data)
+        advisor.ask_stock_question("Summarize my holdings", portfolio_data)
+
+    risky, plain = [call[0][0][0].content for call in advisor.llm.invoke.call_args_list]
+    assert "Annualized Volatility:" in risky and "Largest Risk Contributors:" in risky
+    assert "Annualized Volatility:" not in plain
+    advisor.recommender.history_store.update.assert_called_once_with("SPY")
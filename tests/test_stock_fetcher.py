@@ -7,7 +7,7 @@ from unittest.mock import patch, MagicMock
 # Ensure tools/ is in the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from tools.stock_fetcher import get_stock_price
+from tools.stock_fetcher import get_stock_price, get_stock_prices
 
 # Test: Valid ticker returns expected price
 @patch("tools.stock_fetcher.yf.Ticker")
@@ -39,3 +39,28 @@ def test_get_stock_price_empty_dataframe(mock_ticker_class):
 
     result = get_stock_price("EMPTY")
     assert result is None
+
+# Test: Batched fetch returns a price per ticker and None for failures
+@patch("tools.stock_fetcher.yf.download")
+def test_get_stock_prices_batch(mock_download):
+    columns = pd.MultiIndex.from_product([["Close"], ["AAPL", "MSFT", "BAD"]])
+    mock_download.return_value = pd.DataFrame([[190.123, 410.5, float("nan")]], columns=columns)
+
+    result = get_stock_prices(["AAPL", "MSFT", "BAD", "AAPL"])
+    assert result == {"AAPL": 190.12, "MSFT": 410.5, "BAD": None}
+    mock_download.assert_called_once()
+
+# Test: Large lists are split into chunks and a failing chunk does not fail the rest
+@patch("tools.stock_fetcher.yf.download")
+def test_get_stock_prices_chunked(mock_download):
+    def fake_download(chunk, **kwargs):
+        if "C" in chunk:
+            raise Exception("network error")
+        columns = pd.MultiIndex.from_product([["Close"], chunk])
+        return pd.DataFrame([[10.0] * len(chunk)], columns=columns)
+
+    mock_download.side_effect = fake_download
+
+    result = get_stock_prices(["A", "B", "C", "D"], batch_size=2)
+    assert mock_download.call_count == 2
+    assert result == {"A": 10.0, "B": 10.0, "C": None, "D": None}
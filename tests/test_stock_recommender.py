@@ -1,7 +1,9 @@
 import pytest
 from unittest.mock import patch, MagicMock
+import numpy as np
 import pandas as pd
-from tools.stock_recommender import StockRecommender
+from tools.portfolio import get_portfolio
+from tools.stock_recommender import StockRecommender, SCORING_RULES
 
 # --- Mock Data ---
 mock_data_good = {
@@ -89,14 +91,133 @@ def test_fetch_stock_data_error(mock_ticker_class):
     result = sr.fetch_stock_data("FAIL")
     assert "error" in result
 
+# --- Concurrent Fetch Tests ---
+def test_fetch_many_isolates_errors(monkeypatch):
+    sr = StockRecommender(max_workers=4, retries=0)
+
+    def fake_fetch(ticker, throttle=None):
+        if ticker == "BAD":
+            raise ValueError("no data")
+        return {**mock_data_good, "Ticker": ticker}
+
+    monkeypatch.setattr(sr, "_fetch_stock_data", fake_fetch)
+
+    result = sr.fetch_many(["AAPL", "BAD", "MSFT"])
+    assert [row["Ticker"] for row in result] == ["AAPL", "BAD", "MSFT"]
+    assert result[1] == {"Ticker": "BAD", "error": "Failed to fetch data: no data"}
+
+    recommendations = sr.recommend_stocks(["AAPL", "BAD"])["Recommendation"].tolist()
+    assert recommendations == ["Buy", "Error: Failed to fetch data: no data"]
+
+@patch("tools.rate_limiter.time.sleep")
+def test_fetch_many_retries_throttled_requests(mock_sleep, monkeypatch):
+    sr = StockRecommender(max_workers=2, retries=2)
+    attempts = {"AAPL": 0}
+
+    def fake_fetch(ticker, throttle=None):
+        attempts[ticker] += 1
+        if attempts[ticker] < 3:
+            raise Exception("429 Too Many Requests")
+        return mock_data_good
+
+    monkeypatch.setattr(sr, "_fetch_stock_data", fake_fetch)
+
+    assert sr.fetch_many(["AAPL"]) == [mock_data_good]
+    assert attempts["AAPL"] == 3
+    assert mock_sleep.call_count == 2
+
 # --- Excel Update Test ---
-@patch("tools.stock_recommender.pd.read_excel")
-@patch("tools.stock_recommender.pd.DataFrame.to_excel")
-def test_update_excel_with_recommendations(mock_to_excel, mock_read_excel, monkeypatch):
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(0, 0))
+@patch("tools.portfolio.pd.read_excel")
+@patch("tools.portfolio.pd.DataFrame.to_excel")
+def test_update_excel_with_recommendations(mock_to_excel, mock_read_excel, mock_signature, monkeypatch):
     sr = StockRecommender()
     df = pd.DataFrame({"Ticker": ["AAPL"], "Quantity": [10]})
     mock_read_excel.return_value = df
-    monkeypatch.setattr(sr, "recommend_stock", lambda ticker: {"Ticker": ticker, "Recommendation": "Buy"})
+    monkeypatch.setattr(sr, "_fetch_stock_data", lambda ticker, throttle=None: mock_data_good)
 
     sr.update_excel_with_recommendations("mock_file.xlsx")
-    assert mock_to_excel.called
+    assert not mock_to_excel.called
+    portfolio = get_portfolio("mock_file.xlsx")
+    assert portfolio.recommendation_map() == {"AAPL": "Buy"}
+    assert portfolio.derived_values("Score") == {"AAPL": sr.score_stock(mock_data_good)}
+    assert portfolio.derived_values("Last Price") == {"AAPL": 100.0}
+
+# --- Vectorized Scoring Tests ---
+def _random_fundamentals(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # Mix continuous values with exact band thresholds to exercise the boundaries
+    thresholds = sorted({t for rule in SCORING_RULES.values() for t, _ in rule["bands"]} | {0})
+
+    def values(low, high):
+        column = rng.uniform(low, high, n)
+        edge = rng.random(n) < 0.3
+        column[edge] = rng.choice(thresholds, edge.sum())
+        return column
+
+    return pd.DataFrame({
+        "Ticker": [f"T{i}" for i in range(n)],
+        "Current Price": rng.choice([0, 50, 100, 200], n),
+        "Target Mean Price": rng.choice([0, 50, 105, 110, 120, 125, 130, 150, 300], n),
+        "Price-to-Book": values(-1, 5),
+        "Return on Equity": values(-0.2, 0.4),
+        "Debt-to-Equity": values(0, 4),
+        "Price Trend": values(-0.05, 0.06),
+    })
+
+def test_score_frame_matches_score_stock():
+    sr = StockRecommender()
+    df = _random_fundamentals(2000)
+    df.loc[5, "Price Trend"] = np.nan
+
+    result = sr.score_frame(df)
+
+    expected_scores = [sr.score_stock(row) for row in df.to_dict("records")]
+    assert result["Score"].tolist() == expected_scores
+    assert result["Recommendation"].tolist() == [sr.recommendation_for_score(s) for s in expected_scores]
+
+def test_score_frame_errors():
+    sr = StockRecommender()
+    df = pd.DataFrame([mock_data_good, {"Ticker": "ERR", "error": "Failed to fetch data: boom"}])
+
+    result = sr.score_frame(df)
+    assert result["Score"].tolist() == [sr.score_stock(mock_data_good), 0]
+    assert result["Recommendation"].tolist() == ["Buy", "Error: Failed to fetch data: boom"]
+
+def test_score_frame_uses_rule_tables(monkeypatch):
+    sr = StockRecommender()
+    df = pd.DataFrame([mock_data_good])
+    baseline = sr.score_frame(df)["Score"].iloc[0]
+
+    monkeypatch.setitem(SCORING_RULES, "Price Trend", {"op": ">", "bands": [(0.05, 4)], "default": -2, "when": "nonzero"})
+    assert sr.score_frame(df)["Score"].iloc[0] == baseline - 6
+    assert sr.score_stock(mock_data_good) == baseline - 6
+
+# --- Incremental Refresh Tests ---
+def test_recommend_stocks_incremental_rescoring(monkeypatch):
+    sr = StockRecommender(max_workers=1)
+    data = {"AAPL": dict(mock_data_good), "XYZ": dict(mock_data_poor)}
+    monkeypatch.setattr(sr, "_fetch_stock_data", lambda ticker, throttle=None: dict(data[ticker]))
+
+    first = sr.recommend_stocks(["AAPL", "XYZ"], incremental=True)
+    assert sr.last_rescored == ["AAPL", "XYZ"]
+
+    second = sr.recommend_stocks(["AAPL", "XYZ"], incremental=True)
+    assert sr.last_rescored == []
+    assert second.equals(first)
+
+    data["XYZ"]["Price Trend"] = 0.04
+    third = sr.recommend_stocks(["AAPL", "XYZ"], incremental=True)
+    assert sr.last_rescored == ["XYZ"]
+    assert third["Score"].tolist() == [sr.score_stock(data["AAPL"]), sr.score_stock(data["XYZ"])]
+
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(0, 0))
+@patch("tools.portfolio.pd.DataFrame.to_excel")
+@patch("tools.portfolio.pd.read_excel")
+def test_update_excel_skips_write_when_unchanged(mock_read_excel, mock_to_excel, mock_signature, monkeypatch):
+    sr = StockRecommender()
+    mock_read_excel.return_value = pd.DataFrame({"Ticker": ["AAPL"], "Quantity": [10], "Recommendation": ["Buy"]})
+    monkeypatch.setattr(sr, "_fetch_stock_data", lambda ticker, throttle=None: mock_data_good)
+
+    assert sr.update_excel_with_recommendations("mock_file.xlsx") == {"AAPL": "Buy"}
+    assert not mock_to_excel.called
@@ -0,0 +1,88 @@
+import pytest
+import pandas as pd
+from tools import storage
+from tools.portfolio import Portfolio
+from tools.storage import CsvBackend, DerivedStore, SqliteBackend, backend_for, derived_store_path
+
+holdings = pd.DataFrame({"Ticker": ["AAPL", "MSFT", "AAPL", "TSLA", "GOOGL"], "Quantity": [10, 5, 2, 1, 3]})
+
+
+# --- Backend Tests ---
+def test_csv_backend_reads_in_chunks(tmp_path):
+    backend = CsvBackend(str(tmp_path / "portfolio.csv"), chunk_size=2)
+    backend.write(holdings)
+
+    assert [len(chunk) for chunk in backend.read_chunks()] == [2, 2, 1]
+    columns = backend.read_columns()
+    assert columns["Ticker"].tolist() == holdings["Ticker"].tolist()
+    assert columns["Quantity"].tolist() == holdings["Quantity"].tolist()
+
+def test_sqlite_backend_round_trip(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "portfolio.db"), chunk_size=3)
+    backend.write(holdings)
+
+    assert [len(chunk) for chunk in backend.read_chunks()] == [3, 2]
+    assert backend.read().equals(holdings)
+
+def test_backend_for_picks_by_extension():
+    assert isinstance(backend_for("holdings.csv"), CsvBackend)
+    assert isinstance(backend_for("holdings.sqlite"), SqliteBackend)
+    with pytest.raises(ValueError):
+        backend_for("holdings.txt")
+
+def test_parquet_requires_pyarrow(monkeypatch):
+    monkeypatch.setattr(storage, "pq", None)
+    with pytest.raises(ImportError, match="pyarrow"):
+        backend_for("holdings.parquet")
+
+def test_derived_store_path_honours_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("DERIVED_STORE_DIR")
+    assert derived_store_path("data/portfolio.xlsx").endswith("portfolio.derived.sqlite")
+    monkeypatch.setenv("DERIVED_STORE_DIR", str(tmp_path))
+    assert derived_store_path("data/portfolio.xlsx").startswith(str(tmp_path))
+
+
+# --- Derived Store Tests ---
+def test_derived_store_writes_only_changes(tmp_path):
+    store = DerivedStore(str(tmp_path / "derived.sqlite"))
+    assert store.read("Recommendation") == {}
+    assert store.updated_at("Recommendation") is None
+
+    assert store.update("Recommendation", {"AAPL": "Buy", "MSFT": "Hold"}) == 2
+    assert store.update("Recommendation", {"AAPL": "Buy", "MSFT": "Sell"}) == 1
+    assert store.update("Score", {"AAPL": 9}) == 1
+
+    assert store.read("Recommendation") == {"AAPL": "Buy", "MSFT": "Sell"}
+    assert store.fields() == ["Recommendation", "Score"]
+    assert store.updated_at("Recommendation") is not None
+
+def test_derived_store_is_not_created_by_reads(tmp_path):
+    path = tmp_path / "derived.sqlite"
+    DerivedStore(str(path)).read("Recommendation")
+    assert not path.exists()
+
+
+# --- Portfolio Integration Tests ---
+def test_portfolio_keeps_derived_values_out_of_holdings_file(tmp_path):
+    path = str(tmp_path / "portfolio.csv")
+    holdings.to_csv(path, index=False)
+    before = open(path).read()
+
+    portfolio = Portfolio(path)
+    portfolio.update_derived("Recommendation", {"AAPL": "Buy", "MSFT": "Sell", "TSLA": "Hold", "GOOGL": "Buy"})
+
+    assert open(path).read() == before
+    assert Portfolio(path).recommendations.tolist() == ["Buy", "Sell", "Buy", "Hold", "Buy"]
+
+def test_portfolio_export_includes_derived_columns(tmp_path):
+    path = str(tmp_path / "portfolio.csv")
+    holdings.to_csv(path, index=False)
+    portfolio = Portfolio(path)
+    portfolio.update_derived("Last Price", {"AAPL": 150.0, "MSFT": 300.0})
+
+    exported = str(tmp_path / "export.csv")
+    portfolio.export(exported)
+
+    df = pd.read_csv(exported)
+    assert df["Last Price"].tolist()[:3] == [150.0, 300.0, 150.0]
+    assert df["Last Price"].isna().tolist()[3:] == [True, True]
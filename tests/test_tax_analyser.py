@@ -1,6 +1,9 @@
 import pytest
+import pandas as pd
 from unittest.mock import patch, MagicMock
+from agents.tax_advisor import TaxAdvisor
 from tools.tax_analyser import TaxAnalyser
+from tools.tax_lots import TaxLots
 
 # --- Mock Data ---
 mock_recommendations_sell = {
@@ -76,3 +79,74 @@ def test_analyse_selling_strategy_llm_error():
     with patch('langchain_openai.ChatOpenAI.invoke', return_value=None):
         result = ta.analyse_selling_strategy(mock_recommendations_sell, mock_stock_data)
         assert result == "None"
+
+# --- Test: Lot Engine Figures Reach the Prompt ---
+def test_analyse_selling_strategy_sends_computed_figures():
+    ta = TaxAnalyser("test_api_key")
+    stock_data = {
+        "AAPL": {"buy_price": 100, "holding_period": 24, "quantity": 10, "current_price": 150},
+        "TSLA": {"buy_price": 300, "holding_period": 6, "quantity": 2, "current_price": 250},
+    }
+
+    with patch('langchain_openai.ChatOpenAI.invoke', return_value=mock_response) as mock_invoke:
+        ta.analyse_selling_strategy({"AAPL": "Sell", "TSLA": "Sell"}, stock_data)
+
+    prompt = mock_invoke.call_args[0][0][0].content
+    assert "AAPL: Bought at 100 | Held for 24 months (long-term)" in prompt
+    # Selling whole positions realizes the same lots under every method
+    assert "Every relief method sells the same lots: proceeds 2000.00 | short-term gain -100.00 | long-term gain 500.00" in prompt
+    assert "Lowest estimated tax" not in prompt
+    assert "TSLA: short-term -100.00" in prompt
+
+def test_twelve_month_holding_is_short_term_in_labels_and_figures():
+    ta = TaxAnalyser("test_api_key")
+    stock_data = {"TSLA": {"buy_price": 300, "holding_period": 12, "quantity": 2, "current_price": 350}}
+
+    with patch('langchain_openai.ChatOpenAI.invoke', return_value=mock_response) as mock_invoke:
+        ta.analyse_selling_strategy({"TSLA": "Sell"}, stock_data)
+
+    prompt = mock_invoke.call_args[0][0][0].content
+    assert "Held for 12 months (short-term)" in prompt
+    assert "short-term gain 100.00 | long-term gain 0.00" in prompt
+
+def test_partial_sale_compares_relief_methods():
+    ta = TaxAnalyser("test_api_key")
+    lots = TaxLots(["AAPL", "AAPL"], [10, 10], [100, 160], ["2020-01-01", "2025-06-01"])
+    stock_data = {"AAPL": {"buy_price": 130, "holding_period": 24}}
+
+    with patch('langchain_openai.ChatOpenAI.invoke', return_value=mock_response) as mock_invoke:
+        ta.analyse_selling_strategy({"AAPL": "Sell"}, stock_data, lots=lots, prices={"AAPL": 150.0},
+                                    as_of="2025-10-01", sells={"AAPL": 10})
+
+    prompt = mock_invoke.call_args[0][0][0].content
+    assert "FIFO: proceeds 1500.00 | short-term gain 0.00 | long-term gain 500.00" in prompt
+    assert "LIFO: proceeds 1500.00 | short-term gain -100.00 | long-term gain 0.00" in prompt
+    assert "Lowest estimated tax: LIFO" in prompt
+
+def test_holding_without_quantity_gets_no_figures():
+    ta = TaxAnalyser("test_api_key")
+    stock_data = {
+        "AAPL": {"buy_price": 100, "holding_period": 24, "current_price": 150},
+        "TSLA": {"buy_price": 300, "holding_period": 6, "current_price": 250},
+    }
+
+    with patch('langchain_openai.ChatOpenAI.invoke', return_value=mock_response) as mock_invoke:
+        ta.analyse_selling_strategy({"AAPL": "Sell", "TSLA": "Sell"}, stock_data, quantities={"TSLA": 2})
+
+    prompt = mock_invoke.call_args[0][0][0].content
+    # Only TSLA's two shares are priced; AAPL is named rather than sized as one share
+    assert "Every relief method sells the same lots: proceeds 500.00 | short-term gain -100.00" in prompt
+    assert "No figures for AAPL: the number of shares held is unknown." in prompt
+
+@patch("tools.portfolio.Portfolio._file_signature", return_value=(1, 100))
+def test_tax_advisor_sizes_lots_from_portfolio(mock_signature):
+    holdings = pd.DataFrame({"Ticker": ["AAPL", "AAPL"], "Quantity": [10, 2]})
+    advisor = TaxAdvisor("test_api_key", document_index=MagicMock())
+    stock_data = {"AAPL": {"buy_price": 100, "holding_period": 24, "current_price": 150}}
+
+    with patch("tools.portfolio.pd.read_excel", return_value=holdings), \
+            patch('langchain_openai.ChatOpenAI.invoke', return_value=mock_response) as mock_invoke:
+        advisor.analyse_tax_strategy({"AAPL": "Sell"}, stock_data, file_path="portfolio.xlsx")
+
+    prompt = mock_invoke.call_args[0][0][0].content
+    assert "proceeds 1800.00 | short-term gain 0.00 | long-term gain 600.00" in prompt
@@ -0,0 +1,122 @@
+import time
+import pytest
+import numpy as np
+import pandas as pd
+from tools.tax_lots import TaxLots, estimate_tax, is_long_term_holding
+
+# AAPL lots: old cheap lot, recent expensive lot, recent mid-priced lot
+lots = TaxLots(
+    tickers=["AAPL", "AAPL", "AAPL", "MSFT"],
+    quantities=[10, 5, 5, 3],
+    cost_basis=[100, 150, 120, 50],
+    acquired=["2020-01-01", "2025-06-01", "2025-09-01", "2024-01-01"],
+    lot_ids=["a1", "a2", "a3", "m1"],
+)
+prices = {"AAPL": 130.0, "MSFT": 40.0}
+as_of = "2025-10-01"
+
+
+# --- Allocation Tests ---
+@pytest.mark.parametrize("method, expected", [
+    ("FIFO", [10, 2, 0, 0]),
+    ("LIFO", [2, 5, 5, 0]),
+    ("HIFO", [2, 5, 5, 0]),
+])
+def test_allocate_relief_order(method, expected):
+    assert lots.allocate({"AAPL": 12}, method).tolist() == expected
+
+def test_hifo_picks_highest_cost_first():
+    assert lots.allocate({"AAPL": 6}, "HIFO").tolist() == [0, 5, 1, 0]
+
+def test_specific_id_relief():
+    assert lots.allocate({}, "SPECIFIC", {"a2": 3, "m1": 10}).tolist() == [0, 3, 0, 3]
+
+def test_unknown_method_raises():
+    with pytest.raises(ValueError):
+        lots.allocate({"AAPL": 1}, "AVERAGE")
+
+
+# --- Realized Gain Tests ---
+def test_realize_splits_terms_and_reports_unfilled():
+    result = lots.realize({"AAPL": 12, "MSFT": 5}, prices, "FIFO", as_of=as_of)
+
+    assert result["by_ticker"]["AAPL"] == {
+        "quantity": 12.0, "proceeds": 1560.0, "cost_basis": 1300.0, "short_term_gain": -40.0, "long_term_gain": 300.0,
+    }
+    assert result["by_ticker"]["MSFT"]["long_term_gain"] == -30.0
+    assert result["total_gain"] == 230.0
+    assert result["unfilled"] == {"MSFT": 2.0}
+    assert result["estimated_tax"] == estimate_tax(-40.0, 270.0)
+
+def test_realize_requires_price_for_sold_ticker():
+    with pytest.raises(ValueError, match="MSFT"):
+        lots.realize({"MSFT": 1}, {"AAPL": 130.0}, as_of=as_of)
+
+def test_estimate_tax_nets_losses_across_terms():
+    assert estimate_tax(1000, 1000, 0.3, 0.1) == 400.0
+    assert estimate_tax(-400, 1000, 0.3, 0.1) == 60.0
+    assert estimate_tax(1000, -400, 0.3, 0.1) == 180.0
+    assert estimate_tax(-100, -100) == 0.0
+
+def test_unrealized_skips_unpriced_tickers():
+    held = lots.unrealized({"AAPL": 130.0}, as_of=as_of)
+    assert list(held) == ["AAPL"]
+    assert held["AAPL"]["quantity"] == 20.0
+
+def test_from_stock_data_dates_lots_by_holding_period():
+    built = TaxLots.from_stock_data({"AAPL": {"buy_price": 100, "holding_period": 24, "quantity": 4}}, as_of=as_of)
+    result = built.realize({"AAPL": 4}, {"AAPL": 110.0}, as_of=as_of)
+    assert result["long_term_gain"] == 40.0 and result["short_term_gain"] == 0.0
+
+
+@pytest.mark.parametrize("months, as_of_date, long_term", [
+    (12, "2025-10-01", False),  # one year exactly is short-term
+    (12.5, "2025-10-01", True),
+    (13, "2025-10-01", True),
+    (12, "2025-03-31", False),  # month-end dates do not slip into the next month
+])
+def test_holding_period_labels_match_lot_figures(months, as_of_date, long_term):
+    built = TaxLots.from_stock_data({"AAPL": {"buy_price": 100, "holding_period": months, "quantity": 1}}, as_of=as_of_date)
+    result = built.realize({"AAPL": 1}, {"AAPL": 110.0}, as_of=as_of_date)
+
+    assert is_long_term_holding(months, as_of_date) == long_term
+    assert (result["long_term_gain"] == 10.0) == long_term
+
+def test_one_year_anniversary_is_short_term():
+    bought = TaxLots(["AAPL", "AAPL"], [1, 1], [100, 100], ["2024-02-29", "2024-10-01"])
+    assert bought.realize({"AAPL": 2}, {"AAPL": 110.0}, as_of="2025-02-28")["long_term_gain"] == 0.0
+    assert bought.realize({"AAPL": 1}, {"AAPL": 110.0}, as_of="2025-03-01")["long_term_gain"] == 10.0
+    assert bought.realize({"AAPL": 2}, {"AAPL": 110.0}, as_of="2025-10-01")["short_term_gain"] == 10.0
+
+# --- Vectorization Tests ---
+def _loop_fifo(lots, sells):
+    sold = np.zeros(len(lots))
+    for ticker, wanted in sells.items():
+        for i in sorted(np.flatnonzero(lots.tickers == ticker), key=lambda i: (lots.acquired[i], i)):
+            take = min(wanted, lots.quantities[i])
+            sold[i], wanted = take, wanted - take
+    return sold
+
+def test_allocate_matches_per_lot_loop():
+    rng = np.random.default_rng(1)
+    n = 2000
+    random_lots = TaxLots(
+        rng.choice(["A", "B", "C", "D"], n), rng.integers(1, 50, n), rng.uniform(10, 100, n),
+        pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, n), unit="D"),
+    )
+    sells = {"A": 5000, "B": 1, "C": 10**6}
+    assert np.array_equal(random_lots.allocate(sells, "FIFO"), _loop_fifo(random_lots, sells))
+
+def test_hundred_thousand_lots_under_a_second():
+    rng = np.random.default_rng(0)
+    n = 100_000
+    tickers = np.array([f"T{i}" for i in range(500)], dtype=object)[rng.integers(0, 500, n)]
+    big = TaxLots(tickers, rng.integers(1, 100, n), rng.uniform(10, 500, n),
+                  pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, n), unit="D"))
+    sells = {f"T{i}": 5000 for i in range(500)}
+    prices = {f"T{i}": 200.0 for i in range(500)}
+
+    start = time.perf_counter()
+    results = big.compare_methods(sells, prices, as_of=as_of)
+    assert time.perf_counter() - start < 1.0
+    assert results["HIFO"]["total_gain"] <= results["FIFO"]["total_gain"]
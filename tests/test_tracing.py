@@ -0,0 +1,148 @@
+import asyncio
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import pytest
+from unittest.mock import patch, MagicMock
+from tools import tracing
+from tools.llm_cache import get_llm_cache
+from tools.tracing import JsonLogSink, MemorySink, Tracer
+
+
+@pytest.fixture
+def sink():
+    sink = MemorySink()
+    previous = tracing.set_tracer(Tracer(sink))
+    yield sink
+    tracing.set_tracer(previous)
+
+
+# --- Span Tests ---
+def test_disabled_tracing_returns_shared_noop():
+    previous = tracing.set_tracer(None)
+    try:
+        with tracing.span("stage") as span:
+            span.set("key", "value")
+            tracing.count("network.yfinance")
+        assert tracing.span("other") is span
+        assert tracing.current_span() is None
+    finally:
+        tracing.set_tracer(previous)
+
+def test_nested_spans_roll_counters_up_to_root(sink):
+    with tracing.span("handle_query"):
+        with tracing.span("get_stock_prices", tickers=2):
+            tracing.count("network.yfinance", 2)
+        tracing.count("cache.quote.hits")
+
+    child, root = sink.spans
+    assert child["name"] == "get_stock_prices"
+    assert child["parent_id"] == root["span_id"]
+    assert child["trace_id"] == root["trace_id"]
+    assert child["attributes"] == {"tickers": 2}
+    assert root["counters"] == {"network.yfinance": 2, "cache.quote.hits": 1}
+    assert root["duration_ms"] >= child["duration_ms"]
+
+def test_span_records_raised_and_handled_errors(sink):
+    with pytest.raises(ValueError):
+        with tracing.span("raises"):
+            raise ValueError("bad data")
+    with tracing.span("handles"):
+        tracing.record_error(ConnectionError("timeout"))
+
+    assert sink.find("raises")[0]["error"] == "ValueError: bad data"
+    assert sink.find("handles")[0]["error"] == "ConnectionError: timeout"
+
+def test_bind_records_worker_threads_into_current_span(sink):
+    with tracing.span("fetch"):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(tracing.bind(lambda _: tracing.count("network.yfinance")), range(20)))
+
+    assert sink.find("fetch")[0]["counters"] == {"network.yfinance": 20}
+
+def test_traced_decorator_names_span():
+    sink = MemorySink()
+
+    @tracing.traced("score")
+    def score():
+        return 42
+
+    previous = tracing.set_tracer(Tracer(sink))
+    try:
+        assert score() == 42
+    finally:
+        tracing.set_tracer(previous)
+    assert [span["name"] for span in sink.spans] == ["score"]
+
+def test_json_log_sink_writes_one_line_per_span():
+    stream = io.StringIO()
+    previous = tracing.set_tracer(Tracer(JsonLogSink(stream)))
+    try:
+        with tracing.span("a"):
+            with tracing.span("b"):
+                pass
+    finally:
+        tracing.set_tracer(previous)
+
+    names = [json.loads(line)["name"] for line in stream.getvalue().splitlines()]
+    assert names == ["b", "a"]
+
+
+# --- Instrumentation Tests ---
+def test_llm_cache_records_hits_misses_and_tokens(sink):
+    llm = MagicMock(model_name="gpt-4")
+    llm.invoke.return_value = SimpleNamespace(
+        content="Hold", usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15}
+    )
+    messages = [SimpleNamespace(content="Should I sell AAPL?")]
+
+    get_llm_cache().invoke(llm, messages)
+    get_llm_cache().invoke(llm, messages)
+
+    first, second = sink.find("llm.invoke")
+    assert first["counters"] == {
+        "llm_cache.misses": 1, "network.llm": 1, "llm.prompt_tokens": 12, "llm.completion_tokens": 3,
+    }
+    assert second["counters"] == {"llm_cache.hits": 1}
+
+def test_llm_cache_stream_records_span(sink):
+    class StreamingLLM:
+        model_name = "gpt-4"
+
+        async def astream(self, messages):
+            yield SimpleNamespace(content="Hold", usage_metadata=None)
+            yield SimpleNamespace(content="", usage_metadata={"input_tokens": 7, "output_tokens": 1})
+
+    async def run():
+        return [chunk async for chunk in get_llm_cache().astream(StreamingLLM(), [SimpleNamespace(content="q")])]
+
+    assert asyncio.run(run()) == ["Hold"]
+    assert sink.find("llm.astream")[0]["counters"]["llm.prompt_tokens"] == 7
+
+@patch("tools.stock_fetcher.yf.download")
+def test_get_stock_prices_counts_network_calls_and_cache_hits(mock_download, sink):
+    import pandas as pd
+    from tools.stock_fetcher import get_stock_prices
+
+    mock_download.return_value = pd.DataFrame({("Close", "AAPL"): [150.0], ("Close", "MSFT"): [300.0]})
+    get_stock_prices(["AAPL", "MSFT"])
+    get_stock_prices(["AAPL", "MSFT"])
+
+    first, second = sink.find("get_stock_prices")
+    assert first["counters"] == {"cache.quote.misses": 2, "network.yfinance": 1}
+    assert second["counters"] == {"cache.quote.hits": 2}
+
+def test_handle_query_traces_each_stage(sink):
+    portfolio_data = {"stocks": {"AAPL": 1500.0}, "quantities": {"AAPL": 10}, "total_value": 1500.0}
+    with patch("workflow.StockAdvisor") as stock_advisor, patch("workflow.TaxAdvisor"), \
+            patch("workflow.calculate_portfolio_value", return_value=portfolio_data):
+        from workflow import PortfolioWorkflow
+        stock_advisor.return_value.ask_stock_question.return_value = "Hold AAPL"
+        PortfolioWorkflow("portfolio.xlsx", "test_api_key").handle_query("What is the price of AAPL?")
+
+    names = {span["name"] for span in sink.spans}
+    assert {"handle_query", "classify_query", "load_portfolio", "stock_agent"} <= names
+    root = sink.find("handle_query")[0]
+    assert root["counters"]["classifier.rules"] == 1
+    assert all(span["trace_id"] == root["trace_id"] for span in sink.spans)
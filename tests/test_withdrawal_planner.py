@@ -0,0 +1,76 @@
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+from agents.tax_advisor import TaxAdvisor
+from tools.withdrawal_planner import (
+    WithdrawalPlanner, bracket_tax, distribution_period, required_minimum_distribution, summarize_plan,
+)
+
+
+# --- RMD and Tax Helpers ---
+def test_required_minimum_distribution_uses_uniform_lifetime_table():
+    assert required_minimum_distribution(265_000, 73) == pytest.approx(10_000)
+    assert required_minimum_distribution(265_000, 72) == 0.0
+    assert distribution_period([73, 125]).tolist() == [26.5, 2.0]
+
+def test_bracket_tax_is_vectorized():
+    brackets = [(0, 0.10), (10_000, 0.20)]
+    assert bracket_tax(np.array([0, 5_000, 15_000]), brackets).tolist() == [0, 500, 2_000]
+    assert bracket_tax(np.array([15_000]), brackets, scale=1.5).tolist() == [1_500]
+
+
+# --- Simulation Tests ---
+def _loop_simulation(planner, returns):
+    balances = []
+    for path in returns:
+        balance = planner.balance
+        for year, age in enumerate(planner.ages):
+            rmd = required_minimum_distribution(balance, int(age), planner.rmd_start_age)
+            balance = (balance - min(max(rmd, planner._targets()[year]), balance)) * (1 + path[year])
+        balances.append(balance)
+    return np.array(balances)
+
+@pytest.mark.parametrize("strategy", ["rmd", "fill_bracket", "fixed"])
+def test_simulate_matches_scalar_loop(strategy):
+    planner = WithdrawalPlanner(500_000, 70, years=25, strategy=strategy, annual_withdrawal=40_000, other_income=20_000)
+    returns = np.random.default_rng(3).normal(0.05, 0.12, (50, 25))
+
+    result = planner.simulate(returns=returns)
+
+    assert np.allclose(result["end_balance"][:, -1], _loop_simulation(planner, returns))
+    assert (result["withdrawal"] >= np.minimum(result["rmd"], result["start_balance"]) - 1e-9).all()
+
+def test_fill_bracket_withdraws_to_top_of_bracket():
+    planner = WithdrawalPlanner(2_000_000, 65, years=1, strategy="fill_bracket", target_bracket=0.12, inflation=0.0)
+    result = planner.simulate(returns=np.zeros((1, 1)))
+    # Withdrawal fills taxable income up to the top of the 12% bracket, so no dollar is taxed at 22%
+    assert result["withdrawal"][0, 0] == pytest.approx(47_150 + 16_550)
+    assert result["tax"][0, 0] == pytest.approx(bracket_tax(np.array([47_150.0]), [(0, 0.10), (11_600, 0.12)])[0])
+
+def test_plan_reports_percentiles_and_depletion():
+    plan = WithdrawalPlanner(300_000, 72, strategy="fixed", annual_withdrawal=50_000).plan(2000, seed=7)
+
+    tax = plan["totals"]["tax"]
+    assert tax[10] <= tax[50] <= tax[90]
+    assert plan["depletion_probability"] > 0.5
+    assert plan["first_rmd"]["age"] == 73
+    assert len(plan["yearly"]["balance"][50]) == 30
+    assert "Probability the account is emptied" in summarize_plan(plan)
+
+def test_invalid_strategy_raises():
+    with pytest.raises(ValueError):
+        WithdrawalPlanner(100_000, 75, strategy="roth")
+
+
+# --- Tax Advisor Integration ---
+def test_tax_advisor_explains_simulated_plan():
+    advisor = TaxAdvisor("test_api_key")
+    advisor.llm = MagicMock()
+    advisor.llm.invoke.return_value = MagicMock(content="Your RMDs start at 73.")
+
+    answer = advisor.plan_withdrawals(800_000, 72, question="How much will I owe?", scenarios=500, seed=1)
+
+    assert answer == "Your RMDs start at 73."
+    prompt = advisor.llm.invoke.call_args[0][0][0].content
+    assert "First RMD at age 73" in prompt
+    assert "How much will I owe?" in prompt
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from workflow import PortfolioWorkflow, shared_classifier
+
+portfolio_data = {"stocks": {"AAPL": 1500.0}, "quantities": {"AAPL": 10}, "total_value": 1500.0}
+
+
+async def fake_stream(*tokens):
+    for token in tokens:
+        yield token
+
+
+@pytest.fixture
+def workflow():
+    with patch("workflow.StockAdvisor") as stock_advisor, patch("workflow.TaxAdvisor") as tax_advisor:
+        stock_advisor.return_value.astream_stock_question.side_effect = lambda q, data: fake_stream("Hold", " AAPL")
+        stock_advisor.return_value.ask_stock_question.return_value = "Hold AAPL"
+        tax_advisor.return_value.astream_tax_question.side_effect = lambda q: fake_stream("Sell", " losers")
+        tax_advisor.return_value.ask_tax_question.return_value = "Sell losers"
+        yield PortfolioWorkflow("portfolio.xlsx", "test_api_key", openai_client=MagicMock())
+
+
+def collect(workflow, question):
+    async def run():
+        return [token async for token in workflow.ahandle_query(question)]
+    return asyncio.run(run())
+
+# --- Async Streaming Tests ---
+@patch("workflow.calculate_portfolio_value", return_value=portfolio_data)
+def test_ahandle_query_streams_stock_answer(mock_calculate, workflow):
+    assert collect(workflow, "What is the price of AAPL?") == ["Hold", " AAPL"]
+    workflow.stock_agent.astream_stock_question.assert_called_once_with("What is the price of AAPL?", portfolio_data)
+
+@patch("workflow.calculate_portfolio_value", return_value=portfolio_data)
+def test_ahandle_query_streams_tax_answer(mock_calculate, workflow):
+    assert collect(workflow, "How do I withdraw from my IRA?") == ["Sell", " losers"]
+    assert not workflow.stock_agent.astream_stock_question.called
+    assert not mock_calculate.called
+
+@patch("workflow.calculate_portfolio_value", return_value=portfolio_data)
+def test_ahandle_query_mixed_question_reuses_portfolio(mock_calculate, workflow):
+    assert collect(workflow, "Should I sell AAPL and what is the tax hit?") == ["Portfolio:\nHold AAPL\n\nTax:\nSell losers"]
+    assert mock_calculate.call_count == 1
+
+def test_ahandle_query_fetches_prices_while_llm_classifies(workflow):
+    fetch_started = threading.Event()
+    overlapped = []
+
+    def calculate(file_path):
+        fetch_started.set()
+        return portfolio_data
+
+    def llm_classify(query):
+        overlapped.append(fetch_started.wait(timeout=5))
+        return "stock"
+
+    workflow.classifier.threshold = 1.01  # the model tier is never confident enough
+    workflow.classifier.llm_classify = llm_classify
+    with patch("workflow.calculate_portfolio_value", side_effect=calculate) as mock_calculate:
+        assert collect(workflow, "Tell me something interesting") == ["Hold", " AAPL"]
+
+    assert overlapped == [True]
+    assert mock_calculate.call_count == 1
+    workflow.stock_agent.astream_stock_question.assert_called_once_with("Tell me something interesting", portfolio_data)
+
+def test_ahandle_query_discards_prefetch_when_llm_says_tax(workflow):
+    workflow.classifier.threshold = 1.01
+    workflow.classifier.llm_classify = lambda query: "tax"
+    with patch("workflow.calculate_portfolio_value", side_effect=RuntimeError("offline")):
+        assert collect(workflow, "Tell me something interesting") == ["Sell", " losers"]
+
+    assert not workflow.stock_agent.astream_stock_question.called
+
+# --- Graph Routing Tests ---
+@patch("workflow.calculate_portfolio_value", return_value=portfolio_data)
+def test_handle_query_stock_only(mock_calculate, workflow):
+    assert workflow.handle_query("What is the price of AAPL?") == "Hold AAPL"
+    workflow.stock_agent.ask_stock_question.assert_called_once_with("What is the price of AAPL?", portfolio_data)
+    assert not workflow.tax_agent.ask_tax_question.called
+
+@patch("workflow.calculate_portfolio_value")
+def test_handle_query_uses_preloaded_portfolio_data(mock_calculate, workflow):
+    workflow.handle_query("What is the price of AAPL?", portfolio_data)
+
+    assert not mock_calculate.called
+    workflow.stock_agent.ask_stock_question.assert_called_once_with("What is the price of AAPL?", portfolio_data)
+
+@patch("workflow.calculate_portfolio_value", return_value=portfolio_data)
+def test_handle_query_tax_only_skips_portfolio(mock_calculate, workflow):
+    assert workflow.handle_query("How much is my RMD?") == "Sell losers"
+    assert not mock_calculate.called
+    assert not workflow.stock_agent.ask_stock_question.called
+
+@patch("workflow.calculate_portfolio_value", return_value=portfolio_data)
+def test_handle_query_mixed_fans_out_and_merges(mock_calculate, workflow):
+    answer = workflow.handle_query("Should I sell TSLA and what's the tax hit?")
+
+    assert answer == "Portfolio:\nHold AAPL\n\nTax:\nSell losers"
+    assert mock_calculate.call_count == 1
+    workflow.stock_agent.ask_stock_question.assert_called_once()
+    workflow.tax_agent.ask_tax_question.assert_called_once()
+
+def test_shared_classifier_falls_back_to_shared_openai_client():
+    with patch("tools.llm_clients.LLMClients.openai") as openai_client:
+        openai_client.return_value.chat.completions.create.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content="tax"))], usage=None
+        )
+        classifier = shared_classifier("test_api_key", threshold=1.01)
+
+        assert classifier.classify("Tell me something interesting") == "tax"
+    assert openai_client.return_value.chat.completions.create.call_count == 1
+
+def test_workflow_uses_given_classifier():
+    classifier = shared_classifier("test_api_key")
+    with patch("workflow.StockAdvisor"), patch("workflow.TaxAdvisor"), \
+            patch("workflow.QueryClassifier") as query_classifier:
+        workflow = PortfolioWorkflow("portfolio.xlsx", "test_api_key", classifier=classifier)
+
+    assert workflow.classifier is classifier
+    assert not query_classifier.called
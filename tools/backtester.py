@@ -0,0 +1,305 @@
+import numpy as np
+from tools import tracing
+from tools.lazy import lazy_import
+from tools.stock_recommender import DEFAULT_RECOMMENDATION, RECOMMENDATION_BANDS, score_metrics
+
+pd = lazy_import("pandas")
+
+# Point-in-time fundamentals the scoring rules use besides the price.
+FUNDAMENTAL_FIELDS = ("Target Mean Price", "Price-to-Book", "Return on Equity", "Debt-to-Equity")
+
+# Bars in the price trend, matching the six months of history the live recommender uses.
+TREND_WINDOW = 126
+
+# Forward-return horizons in trading days (about one, three and six months).
+DEFAULT_HORIZONS = (21, 63, 126)
+DEFAULT_REBALANCE_EVERY = 21
+TRADING_DAYS = 252
+
+# Signal labels in code order: one per RECOMMENDATION_BANDS entry, then the default.
+SIGNALS = tuple(label for _, label in RECOMMENDATION_BANDS) + (DEFAULT_RECOMMENDATION,)
+NO_SIGNAL = -1
+
+
+class Panel:
+    def __init__(self, dates, tickers, closes, fundamentals: dict = None):
+        """
+        Historical closes and fundamentals as dates × tickers arrays.
+
+        Args:
+            dates (array-like): Trading dates in ascending order.
+            tickers (Iterable[str]): Column labels.
+            closes (array-like): Close per date and ticker; NaN where not trading.
+            fundamentals (dict): Field in FUNDAMENTAL_FIELDS to a dates × tickers array
+                of the value known on each date. Missing fields are all NaN.
+        """
+        self.dates = np.asarray(pd.to_datetime(dates).values.astype("datetime64[D]"))
+        self.tickers = list(tickers)
+        self.closes = np.asarray(closes, dtype=float)
+        shape = (len(self.dates), len(self.tickers))
+        if self.closes.shape != shape:
+            raise ValueError(f"closes must have shape {shape}, got {self.closes.shape}")
+        self.fundamentals = {
+            field: np.asarray((fundamentals or {}).get(field, np.full(shape, np.nan)), dtype=float)
+            for field in FUNDAMENTAL_FIELDS
+        }
+
+    @property
+    def shape(self) -> tuple:
+        return self.closes.shape
+
+    @classmethod
+    def from_frames(cls, closes: "pd.DataFrame", fundamentals: "pd.DataFrame" = None) -> "Panel":
+        """
+        Builds a panel from a wide close table and a long table of fundamentals.
+
+        Args:
+            closes (pd.DataFrame): Indexed by date, one column per ticker.
+            fundamentals (pd.DataFrame): "Date" and "Ticker" columns plus any of
+                FUNDAMENTAL_FIELDS. Each value applies from its date until the next
+                report for that ticker, so there is no look-ahead.
+        """
+        closes = closes.sort_index()
+        return cls(closes.index, closes.columns, closes.to_numpy(dtype=float),
+                   align_fundamentals(fundamentals, closes.index, closes.columns))
+
+    @classmethod
+    def from_history_store(cls, store, tickers, fundamentals: "pd.DataFrame" = None, start=None, end=None) -> "Panel":
+        """
+        Builds a panel offline from the daily bars in a HistoryStore.
+
+        Args:
+            store (HistoryStore): Local store of daily bars.
+            tickers (Iterable[str]): Tickers to include.
+            fundamentals (pd.DataFrame): Long table of point-in-time fundamentals (see from_frames).
+            start: First date to include, or None.
+            end: Last date to include, or None.
+        """
+        tickers = list(tickers)
+        dates, closes = store.aligned_closes(tickers, start, end)
+        return cls(dates, tickers, closes, align_fundamentals(fundamentals, dates, tickers))
+
+
+def align_fundamentals(fundamentals: "pd.DataFrame", dates, tickers) -> dict:
+    """Pivots a long Date/Ticker table onto the panel grid, carrying each reported value forward (blanks keep the previous one)."""
+    if fundamentals is None or fundamentals.empty:
+        return {}
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    frame = fundamentals.assign(Date=pd.to_datetime(fundamentals["Date"])).sort_values("Date")
+    aligned = {}
+    for field in FUNDAMENTAL_FIELDS:
+        if field not in frame.columns:
+            continue
+        wide = frame.pivot_table(index="Date", columns="Ticker", values=field, aggfunc="last")
+        wide = wide.reindex(wide.index.union(dates)).ffill().reindex(dates)
+        aligned[field] = wide.reindex(columns=list(tickers)).to_numpy(dtype=float)
+    return aligned
+
+
+def price_trend_panel(closes: np.ndarray, window: int = TREND_WINDOW) -> np.ndarray:
+    """
+    Mean daily percentage change over the trailing ``window`` bars, for every date at once.
+
+    The panel version of history_store.price_trend. A date a ticker did not trade
+    is a missing bar, so the next change is measured from the last known close;
+    a date with no changes in its window gets NaN.
+    """
+    filled = pd.DataFrame(closes).ffill().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changes = closes[1:] / filled[:-1] - 1
+    valid = np.isfinite(changes)
+    # Row t of the cumulative arrays covers the changes into dates 1..t
+    sums = np.vstack([np.zeros((1, closes.shape[1])), np.cumsum(np.where(valid, changes, 0.0), axis=0)])
+    counts = np.vstack([np.zeros((1, closes.shape[1])), np.cumsum(valid, axis=0)])
+
+    end = np.arange(len(closes))
+    start = np.maximum(end - window + 1, 0)
+    total, count = sums[end] - sums[start], counts[end] - counts[start]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def score_panel(panel: Panel, trend_window: int = TREND_WINDOW):
+    """
+    Applies the live scoring rules to every date and ticker in one array pass.
+
+    Returns:
+        tuple: (scores, signals) dates × tickers arrays; signals index into SIGNALS,
+            with NO_SIGNAL where the ticker has no price on that date.
+    """
+    closes = panel.closes
+    scores = score_metrics(closes, panel.fundamentals["Target Mean Price"], {
+        "Price-to-Book": panel.fundamentals["Price-to-Book"],
+        "Return on Equity": panel.fundamentals["Return on Equity"],
+        "Debt-to-Equity": panel.fundamentals["Debt-to-Equity"],
+        "Price Trend": price_trend_panel(closes, trend_window),
+    })
+    invalid = ~(closes > 0)
+    scores = np.where(invalid, 0, scores)
+    signals = np.select(
+        [scores >= minimum for minimum, _ in RECOMMENDATION_BANDS],
+        list(range(len(RECOMMENDATION_BANDS))),
+        default=len(RECOMMENDATION_BANDS),
+    )
+    return scores, np.where(invalid, NO_SIGNAL, signals)
+
+
+def forward_returns(closes: np.ndarray, horizon: int) -> np.ndarray:
+    """Return from each date to ``horizon`` bars later (last known price if it stopped trading)."""
+    filled = pd.DataFrame(closes).ffill().to_numpy()
+    result = np.full(closes.shape, np.nan)
+    if horizon < len(closes):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[:-horizon] = filled[horizon:] / closes[:-horizon] - 1
+    return result
+
+
+def _signal_stats(signals: np.ndarray, returns: np.ndarray) -> dict:
+    """Mean return, positive rate and hit rate per signal; hits are judged against the equal-weight universe."""
+    valid = np.isfinite(returns) & (signals != NO_SIGNAL)
+    counts = valid.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        universe = np.where(valid, returns, 0.0).sum(axis=1) / counts
+    excess = returns - universe[:, None]
+
+    stats = {}
+    for code, label in enumerate(SIGNALS):
+        mask = valid & (signals == code)
+        n = int(mask.sum())
+        if not n:
+            stats[label] = {"count": 0, "mean_return": None, "positive_rate": None, "hit_rate": None}
+            continue
+        if code == 0:
+            hits = (excess[mask] > 0).mean()
+        elif code == len(SIGNALS) - 1:
+            hits = (excess[mask] < 0).mean()
+        else:
+            hits = None
+        stats[label] = {
+            "count": n,
+            "mean_return": round(float(returns[mask].mean()), 6),
+            "positive_rate": round(float((returns[mask] > 0).mean()), 4),
+            "hit_rate": None if hits is None else round(float(hits), 4),
+        }
+    return stats
+
+
+def _simulate(filled: np.ndarray, rebalances: np.ndarray, weights: np.ndarray, cost_bps: float):
+    """
+    Daily equity of holding ``weights`` from each rebalance date to the next.
+
+    Args:
+        filled (np.ndarray): Forward-filled closes, dates × tickers.
+        rebalances (np.ndarray): Row index of each rebalance date.
+        weights (np.ndarray): Rebalances × tickers target weights; the rest is cash.
+        cost_bps (float): Trading cost in basis points of the value traded.
+
+    Returns:
+        tuple: (equity per date, one-way turnover per rebalance).
+    """
+    n_dates = len(filled)
+    cash = 1.0 - weights.sum(axis=1)
+    base = np.nan_to_num(filled[rebalances], nan=1.0)
+
+    # Growth of each position from its period's rebalance date to the next one
+    ends = np.r_[rebalances[1:], n_dates - 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.nan_to_num(filled[ends] / base, nan=1.0)
+    period_value = (weights * growth).sum(axis=1) + cash
+
+    # Turnover: distance between the drifted holdings and the next targets (cash included)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drifted = np.hstack([weights * growth, cash[:, None]]) / period_value[:, None]
+    targets = np.hstack([weights, cash[:, None]])
+    previous = np.vstack([np.r_[np.zeros(weights.shape[1]), 1.0], drifted[:-1]])
+    turnover = np.abs(targets - previous).sum(axis=1) / 2
+
+    costs = 1 - cost_bps / 1e4 * 2 * turnover
+    start_equity = np.cumprod(np.r_[1.0, period_value[:-1]]) * np.cumprod(costs)
+
+    period = np.searchsorted(rebalances, np.arange(n_dates), side="right") - 1
+    active = period >= 0
+    equity = np.ones(n_dates)
+    rows = np.flatnonzero(active)
+    p = period[active]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        daily_growth = np.nan_to_num(filled[rows] / base[p], nan=1.0)
+    equity[rows] = start_equity[p] * ((weights[p] * daily_growth).sum(axis=1) + cash[p])
+    return equity, turnover
+
+
+def _performance(equity: np.ndarray) -> dict:
+    daily = equity[1:] / equity[:-1] - 1
+    years = max(len(equity) - 1, 1) / TRADING_DAYS
+    peak = np.maximum.accumulate(equity)
+    return {
+        "total_return": round(float(equity[-1] - 1), 6),
+        "annualized_return": round(float(equity[-1] ** (1 / years) - 1), 6),
+        "volatility": round(float(daily.std() * np.sqrt(TRADING_DAYS)), 6) if len(daily) else 0.0,
+        "max_drawdown": round(float((equity / peak - 1).min()), 6),
+    }
+
+
+@tracing.traced("backtest")
+def run_backtest(panel: Panel, horizons=DEFAULT_HORIZONS, rebalance_every: int = DEFAULT_REBALANCE_EVERY,
+                 trend_window: int = TREND_WINDOW, cost_bps: float = 0.0) -> dict:
+    """
+    Backtests the StockRecommender scoring rules over a historical panel.
+
+    Every date and ticker is scored in one vectorized pass. Forward returns of each
+    signal are measured over ``horizons``, and a long-only strategy that holds the
+    Buy-rated stocks in equal weight, rebalancing every ``rebalance_every`` bars, is
+    compared with an equal-weight portfolio of every priced stock.
+
+    Args:
+        panel (Panel): Historical closes and point-in-time fundamentals.
+        horizons (Iterable[int]): Forward-return horizons in bars.
+        rebalance_every (int): Bars between rebalances.
+        trend_window (int): Bars in the price trend.
+        cost_bps (float): Strategy trading cost in basis points of the value traded.
+
+    Returns:
+        dict: Panel "period", "signal_counts", "forward_returns" per horizon and
+            signal (count, mean return, positive rate and hit rate against the
+            universe average), "strategy" and "benchmark" performance, the
+            strategy's "average_turnover" and an "equity_curve" DataFrame.
+    """
+    n_dates, n_tickers = panel.shape
+    if n_dates < 2 or not n_tickers:
+        raise ValueError("The panel needs at least two dates and one ticker.")
+
+    _, signals = score_panel(panel, trend_window)
+
+    filled = pd.DataFrame(panel.closes).ffill().to_numpy()
+    rebalances = np.arange(0, n_dates - 1, rebalance_every)
+    buy = signals[rebalances] == 0
+    priced = signals[rebalances] != NO_SIGNAL
+    with np.errstate(divide="ignore", invalid="ignore"):
+        strategy_weights = np.nan_to_num(buy / buy.sum(axis=1, keepdims=True))
+        benchmark_weights = np.nan_to_num(priced / priced.sum(axis=1, keepdims=True))
+
+    strategy_equity, turnover = _simulate(filled, rebalances, strategy_weights, cost_bps)
+    benchmark_equity, _ = _simulate(filled, rebalances, benchmark_weights, 0.0)
+
+    signal_counts = np.bincount(signals[signals != NO_SIGNAL], minlength=len(SIGNALS))
+    return {
+        "period": {
+            "start": str(panel.dates[0]),
+            "end": str(panel.dates[-1]),
+            "dates": n_dates,
+            "tickers": n_tickers,
+            "rebalances": len(rebalances),
+        },
+        "signal_counts": dict(zip(SIGNALS, signal_counts.tolist())),
+        "forward_returns": {
+            horizon: _signal_stats(signals, forward_returns(panel.closes, horizon)) for horizon in horizons
+        },
+        "strategy": {
+            **_performance(strategy_equity),
+            "average_turnover": round(float(turnover[1:].mean()), 4) if len(turnover) > 1 else 0.0,
+        },
+        "benchmark": _performance(benchmark_equity),
+        "equity_curve": pd.DataFrame(
+            {"strategy": strategy_equity, "benchmark": benchmark_equity}, index=pd.DatetimeIndex(panel.dates)
+        ),
+    }
@@ -0,0 +1,191 @@
+import math
+import re
+from tools import tracing
+
+# Default prompt budget for the portfolio context, in estimated tokens.
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Rough characters per token for English text and numbers with GPT-4 tokenizers.
+CHARS_PER_TOKEN = 4
+
+# Number of largest positions listed in the portfolio summary.
+SUMMARY_POSITIONS = 5
+
+INTENT_PATTERNS = {
+    "price": r"\bprices?\b|\bquotes?\b|\btrading at\b|\bcosts?\b",
+    "value": r"\bworth\b|\bvalues?\b|\bholdings?\b|\bpositions?\b|\bhow much\b|\bhow many\b|\bshares?\b",
+    "recommendation": r"\brecommend\w*|\bbuy\b|\bsell\b|\bhold\b|\bshould i\b",
+    "total": r"\btotal\b|\bportfolio\b|\boverall\b|\ball my\b",
+    "ranking": r"\bbiggest\b|\blargest\b|\bsmallest\b|\bbest\b|\bworst\b|\btop\b|\bmost\b|\bleast\b",
+}
+_INTENT_RES = {intent: re.compile(pattern, re.IGNORECASE) for intent, pattern in INTENT_PATTERNS.items()}
+
+_WORD_RE = re.compile(r"\$?[A-Za-z][A-Za-z0-9.\-]{0,9}")
+
+# Lower-case words that are also ticker symbols; they only match when written in capitals.
+COMMON_WORDS = {
+    "a", "all", "am", "an", "any", "are", "at", "be", "best", "big", "buy", "by", "can", "cash", "cost", "did",
+    "do", "fast", "for", "fund", "gain", "get", "go", "good", "has", "he", "hold", "how", "i", "in", "ira", "is",
+    "it", "key", "less", "life", "loss", "love", "low", "many", "me", "more", "most", "much", "my", "new", "now",
+    "of", "ok", "on", "one", "or", "out", "own", "play", "price", "real", "rmd", "see", "sell", "so", "sure",
+    "tax", "to", "top", "two", "us", "value", "way", "we", "well", "what", "when", "who", "why", "you",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens in a text without loading a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def detect_intents(question: str) -> set:
+    """Returns the intents ("price", "value", "recommendation", "total", "ranking") a question mentions."""
+    return {intent for intent, pattern in _INTENT_RES.items() if pattern.search(question)}
+
+
+class SymbolIndex:
+    def __init__(self, tickers):
+        """
+        Prebuilt lookup of the portfolio's ticker symbols.
+
+        Args:
+            tickers (Iterable[str]): Every symbol that can appear in the context.
+        """
+        self.symbols = {str(ticker).upper(): ticker for ticker in tickers}
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, ticker) -> bool:
+        return str(ticker).upper() in self.symbols
+
+    def extract(self, question: str) -> list:
+        """
+        Finds the portfolio tickers a question mentions, in order of appearance.
+
+        Capitalised words and "$" prefixed words match any symbol; lower-case words
+        only match symbols of three or more letters that are not common English words.
+
+        Returns:
+            list: Matching tickers as spelled in the portfolio.
+        """
+        found = {}
+        for match in _WORD_RE.finditer(question):
+            word = match.group(0).lstrip("$").rstrip(".-")
+            ticker = self.symbols.get(word.upper())
+            if ticker is None:
+                continue
+            explicit = match.group(0).startswith("$") or word.isupper()
+            if explicit or (len(word) >= 3 and word.lower() not in COMMON_WORDS):
+                found.setdefault(ticker, None)
+        return list(found)
+
+
+def build_context(question: str, portfolio_data: dict, recommendations: dict, as_of: str = "unknown",
+                  index: SymbolIndex = None, token_budget: int = DEFAULT_TOKEN_BUDGET, sections=()) -> dict:
+    """
+    Builds the portfolio context for a question within a token budget.
+
+    Portfolio-level aggregates are always included. Rows for the tickers the
+    question mentions come first; questions that name no ticker get the largest
+    positions until the budget is spent, except pure total-value questions, which
+    only need the aggregates.
+
+    Args:
+        question (str): The user's question.
+        portfolio_data (dict): Result of calculate_portfolio_value.
+        recommendations (dict): Ticker to recommendation.
+        as_of (str): When the recommendations were computed, shown in the context.
+        index (SymbolIndex): Prebuilt symbol index; built from the data if omitted.
+        token_budget (int): Maximum estimated tokens of the context.
+        sections (Iterable[str]): Extra context blocks (e.g. a risk summary) that are
+            always included; they count against the budget before any rows.
+
+    Returns:
+        dict: "context" text, the mentioned "tickers", detected "intents", the
+            included "rows", how many were "omitted", and the estimated "tokens",
+            "full_tokens" (everything included) and "tokens_saved".
+    """
+    values = portfolio_data["stocks"]
+    quantities = portfolio_data["quantities"]
+    total_value = portfolio_data["total_value"]
+    index = index or SymbolIndex(list(values) + [t for t in recommendations if t not in values])
+
+    tickers = index.extract(question)
+    intents = detect_intents(question)
+    by_value = sorted(values, key=values.get, reverse=True)
+    every_ticker = by_value + [ticker for ticker in recommendations if ticker not in values]
+
+    counts = {}
+    for recommendation in recommendations.values():
+        counts[recommendation] = counts.get(recommendation, 0) + 1
+    largest = ", ".join(
+        f"{ticker} {values[ticker] / total_value:.1%}" for ticker in by_value[:SUMMARY_POSITIONS]
+    ) if total_value else "none"
+
+    header = (
+        f"Here is the stock data:\n\n"
+        f"Portfolio Summary:\n"
+        f"Total Portfolio Value: {round(total_value, 2)}\n"
+        f"Positions: {len(values)}\n"
+        f"Recommendations: {', '.join(f'{label} {n}' for label, n in sorted(counts.items())) or 'none'}\n"
+        f"Largest Positions: {largest}\n\n"
+    )
+    section_titles = f"Stock Prices:\n\nStock Values:\n\nStock Recommendations (as of {as_of}):\n\n"
+    footer = "".join(f"{section}\n\n" for section in sections) + "You can now ask questions about this portfolio."
+
+    def row_cost(ticker) -> int:
+        text = ""
+        if ticker in values:
+            text += f"{ticker}: {round(values[ticker] / quantities[ticker], 2)}\n{ticker}: {round(values[ticker], 2)}\n"
+        if ticker in recommendations:
+            text += f"{ticker}: {recommendations[ticker]}\n"
+        return estimate_tokens(text)
+
+    costs = {ticker: row_cost(ticker) for ticker in every_ticker}
+    omitted_note = "({} other positions are not shown.)\n\n"
+    fixed = estimate_tokens(header + section_titles + footer + omitted_note.format(len(every_ticker)))
+
+    if tickers:
+        candidates = tickers
+    elif intents and intents <= {"total", "value"}:
+        candidates = []
+    else:
+        candidates = every_ticker
+
+    rows, used = [], fixed
+    for ticker in candidates:
+        if used + costs[ticker] > token_budget:
+            break
+        rows.append(ticker)
+        used += costs[ticker]
+
+    priced = [ticker for ticker in rows if ticker in values]
+    prices_str = "\n".join(f"{ticker}: {round(values[ticker] / quantities[ticker], 2)}" for ticker in priced)
+    values_str = "\n".join(f"{ticker}: {round(values[ticker], 2)}" for ticker in priced)
+    recommendation_str = "\n".join(f"{ticker}: {recommendations[ticker]}" for ticker in rows if ticker in recommendations)
+    omitted = len(every_ticker) - len(rows)
+
+    context = (
+        f"{header}"
+        f"Stock Prices:\n{prices_str}\n\n"
+        f"Stock Values:\n{values_str}\n\n"
+        f"Stock Recommendations (as of {as_of}):\n{recommendation_str}\n\n"
+        + (omitted_note.format(omitted) if omitted else "")
+        + footer
+    )
+
+    tokens = estimate_tokens(context)
+    included = set(rows)
+    saved = sum(cost for ticker, cost in costs.items() if ticker not in included)
+    tracing.count("context.tokens", tokens)
+    tracing.count("context.tokens_saved", saved)
+    return {
+        "context": context,
+        "tickers": tickers,
+        "intents": intents,
+        "rows": rows,
+        "omitted": omitted,
+        "tokens": tokens,
+        "full_tokens": tokens + saved,
+        "tokens_saved": saved,
+    }
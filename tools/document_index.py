@@ -0,0 +1,513 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+import numpy as np
+from tools import tracing
+from tools.llm_clients import SharedClient
+from tools.storage import file_signature
+
+DOCUMENT_EXTENSIONS = (".txt", ".md")
+DEFAULT_CHUNK_CHARS = 1000
+DEFAULT_CHUNK_OVERLAP = 150
+DEFAULT_TOP_K = 3
+# Chunks embedded per embedder call while building.
+EMBED_BATCH_SIZE = 512
+# The vector file is rewritten without deleted rows once they make up this share of it.
+COMPACT_THRESHOLD = 0.5
+# Below this many rows an exact scan is already fast, so no clusters are trained.
+IVF_MIN_ROWS = 20_000
+# Clusters scored per search.
+IVF_PROBES = 16
+IVF_TRAIN_SAMPLE = 20_000
+KMEANS_ITERATIONS = 8
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOP_WORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it its my of on or "
+    "that the their there this to was what when which who will with you your".split()
+)
+
+
+def chunk_text(text: str, chunk_chars: int = DEFAULT_CHUNK_CHARS, overlap: int = DEFAULT_CHUNK_OVERLAP) -> list:
+    """
+    Splits a document into passages of about ``chunk_chars`` characters.
+
+    Paragraphs are packed together until the next one would not fit; a paragraph
+    longer than a chunk is cut at word boundaries, each piece repeating the last
+    ``overlap`` characters of the previous one so no sentence is lost at a cut.
+
+    Args:
+        text (str): Document text.
+        chunk_chars (int): Target passage length.
+        overlap (int): Characters carried over between pieces of a long paragraph.
+
+    Returns:
+        list: The passages, in document order.
+    """
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 1 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        while len(paragraph) > chunk_chars:
+            cut = paragraph.rfind(" ", 0, chunk_chars)
+            if cut <= overlap:
+                cut = chunk_chars
+            chunks.append(paragraph[:cut])
+            # The next piece starts at a word boundary about ``overlap`` characters before the cut
+            restart = paragraph.find(" ", cut - overlap, cut)
+            paragraph = paragraph[restart + 1 if restart != -1 else cut:].strip()
+        current = f"{current} {paragraph}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class Embedder:
+    """Turns texts into unit-length float32 vectors; ``name`` and ``dim`` identify the vector space."""
+
+    name = "embedder"
+    dim = 0
+
+    def embed(self, texts: list) -> np.ndarray:
+        """Returns a (len(texts), dim) float32 matrix of L2-normalized embeddings."""
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    def __init__(self, dim: int = 256):
+        """
+        Deterministic local embedder: signed feature hashing of words and word pairs.
+
+        Needs no network or model download, so tests and offline runs can build
+        and query an index. It matches on shared vocabulary only, without any
+        notion of synonyms.
+
+        Args:
+            dim (int): Vector length.
+        """
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOP_WORDS]
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in features), dtype=np.uint32,
+                                 count=len(features))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dim, signs)
+        return _normalize(matrix)
+
+
+class OpenAIEmbedder(Embedder):
+    client = SharedClient("openai")
+
+    def __init__(self, client=None, model: str = "text-embedding-3-small", dim: int = 512, batch_size: int = 256,
+                 api_key: str = None):
+        """
+        Embeds with the OpenAI embeddings API.
+
+        Args:
+            client (OpenAI): OpenAI client. Defaults to the shared client for
+                ``api_key``, created on the first embedding call.
+            model (str): Embedding model.
+            dim (int): Requested vector length; shorter vectors keep searches fast.
+            batch_size (int): Texts sent per request.
+            api_key (str): OpenAI API key, used when no client is given.
+        """
+        self.api_key = api_key
+        if client is not None:
+            self.client = client
+        self.model = model
+        self.dim = dim
+        self.batch_size = batch_size
+        self.name = f"openai:{model}:{dim}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            tracing.count("network.openai")
+            response = self.client.embeddings.create(
+                model=self.model, input=texts[start:start + self.batch_size], dimensions=self.dim
+            )
+            rows.extend(item.embedding for item in response.data)
+        return _normalize(np.asarray(rows, dtype=np.float32).reshape(len(texts), self.dim))
+
+
+def document_paths(source) -> list:
+    """Every .txt/.md file under a directory (recursively), or the given file paths."""
+    if isinstance(source, str) and os.path.isdir(source):
+        return sorted(
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(source)
+            for name in names if name.lower().endswith(DOCUMENT_EXTENSIONS)
+        )
+    return sorted([source] if isinstance(source, str) else source)
+
+
+def train_centroids(vectors: np.ndarray, lists: int, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means over a sample of unit vectors.
+
+    Args:
+        vectors (np.ndarray): (n, dim) unit-length rows, possibly memory-mapped.
+        lists (int): Number of centroids.
+        seed (int): Random seed for the sample and the starting centroids.
+
+    Returns:
+        np.ndarray: (lists, dim) float32 unit-length centroids.
+    """
+    rng = np.random.default_rng(seed)
+    picked = np.sort(rng.choice(len(vectors), min(len(vectors), IVF_TRAIN_SAMPLE), replace=False))
+    sample = np.asarray(vectors[picked], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        members = np.zeros((lists, len(sample)), dtype=np.float32)
+        members[assignment, np.arange(len(sample))] = 1
+        sums = _normalize(members @ sample)
+        # A centroid that lost all its members keeps its position
+        centroids = np.where(members.any(axis=1, keepdims=True), sums, centroids).astype(np.float32)
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid of every row, computed a block at a time."""
+    lists = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), 16_384):
+        lists[start:start + 16_384] = np.argmax(vectors[start:start + 16_384] @ centroids.T, axis=1)
+    return lists
+
+
+class DocumentIndex:
+    def __init__(self, root: str, embedder: Embedder, chunk_chars: int = DEFAULT_CHUNK_CHARS,
+                 overlap: int = DEFAULT_CHUNK_OVERLAP, probes: int = IVF_PROBES):
+        """
+        On-disk vector index of document passages for retrieval.
+
+        Embeddings are rows of one float32 file that is memory-mapped for search;
+        passages and per-document signatures live in SQLite next to it. Builds
+        only embed documents whose content changed: their old rows are marked
+        deleted and new rows appended, and the file is compacted once deleted rows
+        dominate.
+
+        Small indexes are searched exactly with one matrix-vector product. From
+        IVF_MIN_ROWS rows on, the rows are clustered around about sqrt(n) k-means
+        centroids (an inverted file index), and a search only scores the rows of
+        the ``probes`` clusters closest to the query, so a query reads a few
+        thousand rows instead of all of them.
+
+        Args:
+            root (str): Directory holding the index (created if missing).
+            embedder (Embedder): Embedder for passages and queries. Changing it
+                discards the stored vectors.
+            chunk_chars (int): Target passage length.
+            overlap (int): Overlap between pieces of a long paragraph.
+            probes (int): Clusters scored per search; more is slower but misses fewer passages.
+        """
+        self.root = root
+        self.embedder = embedder
+        self.chunk_chars = chunk_chars
+        self.overlap = overlap
+        self.probes = probes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(root, "chunks.sqlite"), check_same_thread=False)
+        # Searches read passages on their own connection so they are not held up by a build
+        self._reader = sqlite3.connect(os.path.join(root, "chunks.sqlite"), check_same_thread=False)
+        self._reader_lock = threading.Lock()
+        self._renumbered = 0
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            "CREATE TABLE IF NOT EXISTS documents (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, digest TEXT);"
+            "CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, path TEXT, position INTEGER, text TEXT);"
+            "CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path);"
+        )
+        if self._meta("embedder") != embedder.name:
+            self._reset()
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    @property
+    def vectors_path(self) -> str:
+        return self._path("vectors.f32")
+
+    def __len__(self) -> int:
+        return self._state[2]
+
+    def _meta(self, key: str):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _reset(self):
+        """Drops every stored vector and passage, e.g. after the embedder changed."""
+        with self._db:
+            self._db.execute("DELETE FROM chunks")
+            self._db.execute("DELETE FROM documents")
+            self._db.execute("DELETE FROM meta")
+            self._db.execute("INSERT INTO meta VALUES ('embedder', ?)", (self.embedder.name,))
+        for name in ("vectors.f32", "lists.i32", "centroids.f32"):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+
+    def _row_count(self) -> int:
+        if not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.embedder.dim * 4)
+
+    def _centroids(self):
+        if not os.path.exists(self._path("centroids.f32")):
+            return None
+        return np.fromfile(self._path("centroids.f32"), dtype=np.float32).reshape(-1, self.embedder.dim)
+
+    def _load(self):
+        """Maps the vector file, marks which rows belong to current passages and groups them by cluster."""
+        rows = self._row_count()
+        live = np.zeros(rows, dtype=bool)
+        live_rows = np.fromiter((row for (row,) in self._db.execute("SELECT row FROM chunks")), dtype=np.int64)
+        live[live_rows[live_rows < rows]] = True
+        vectors = (np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.embedder.dim))
+                   if rows else np.empty((0, self.embedder.dim), dtype=np.float32))
+
+        clusters = None
+        centroids = self._centroids()
+        if centroids is not None:
+            lists = np.fromfile(self._path("lists.i32"), dtype=np.int32)
+            if len(lists) < rows:
+                # Rows appended without their cluster, e.g. by an interrupted build
+                tail = assign_lists(vectors[len(lists):], centroids)
+                with open(self._path("lists.i32"), "ab") as f:
+                    f.write(tail.tobytes())
+                lists = np.concatenate([lists, tail])
+            members = np.flatnonzero(live)
+            members = members[np.argsort(lists[members], kind="stable")]
+            offsets = np.searchsorted(lists[members], np.arange(len(centroids) + 1))
+            clusters = (centroids, members, offsets)
+
+        # Replaced in one assignment so a search running during a build sees a consistent snapshot
+        self._state = (vectors, live, int(live.sum()), clusters)
+
+    def _append(self, path: str, chunks: list):
+        """Embeds a document's passages and appends them as new rows."""
+        centroids = self._centroids()
+        for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+            batch = chunks[start:start + EMBED_BATCH_SIZE]
+            vectors = self.embedder.embed(batch).astype(np.float32, copy=False)
+            first = self._row_count()
+            # Vectors are written before their rows are committed, so an interrupted
+            # build leaves only unreferenced rows behind.
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            if centroids is not None:
+                with open(self._path("lists.i32"), "ab") as f:
+                    f.write(assign_lists(vectors, centroids).tobytes())
+            self._db.executemany(
+                "INSERT INTO chunks (row, path, position, text) VALUES (?, ?, ?, ?)",
+                [(first + i, path, start + i, text) for i, text in enumerate(batch)],
+            )
+
+    def _compact(self):
+        """Rewrites the vector file with only the current rows and renumbers them."""
+        vectors, live, _, clusters = self._state
+        live_rows = np.flatnonzero(live)
+        with open(self.vectors_path + ".tmp", "wb") as f:
+            for start in range(0, len(live_rows), 65_536):
+                f.write(np.ascontiguousarray(vectors[live_rows[start:start + 65_536]]).tobytes())
+        if clusters is not None:
+            lists = np.fromfile(self._path("lists.i32"), dtype=np.int32)
+            lists[live_rows].tofile(self._path("lists.i32.tmp"))
+
+        # Searches look passages up by row under the reader lock and retry after a
+        # renumbering, so none pairs the old vectors with the new row numbers.
+        with self._reader_lock:
+            with self._db:
+                # Ascending order never moves a row onto one that is still in use
+                self._db.executemany("UPDATE chunks SET row = ? WHERE row = ?",
+                                     ((new, int(old)) for new, old in enumerate(live_rows) if new != old))
+            os.replace(self.vectors_path + ".tmp", self.vectors_path)
+            if clusters is not None:
+                os.replace(self._path("lists.i32.tmp"), self._path("lists.i32"))
+            self._load()
+            self._renumbered += 1
+        tracing.count("documents.compactions")
+
+    def _train(self):
+        """Clusters every row around about sqrt(n) centroids and records each row's cluster."""
+        vectors, _, live_count, _ = self._state
+        centroids = train_centroids(vectors, max(int(np.sqrt(live_count)), self.probes))
+        assign_lists(vectors, centroids).tofile(self._path("lists.i32"))
+        centroids.tofile(self._path("centroids.f32"))
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('trained_rows', ?)", (str(live_count),))
+        self._load()
+        tracing.count("documents.trainings")
+
+    def build(self, source) -> dict:
+        """
+        Brings the index up to date with a directory (or list) of documents.
+
+        Unchanged files are skipped by modification time and size, then by content
+        hash; changed files are re-chunked and re-embedded; files no longer present
+        are removed. Each document is committed on its own, so an interrupted build
+        keeps the documents it finished. The clusters are trained once the index
+        reaches IVF_MIN_ROWS rows and retrained whenever it has doubled since.
+
+        Args:
+            source (str | Iterable[str]): Directory searched for .txt/.md files, or file paths.
+
+        Returns:
+            dict: Counts of documents added, updated, removed and unchanged, and chunks embedded.
+        """
+        stats = dict.fromkeys(("added", "updated", "removed", "unchanged", "chunks"), 0)
+        with self._lock, tracing.span("documents.build") as span:
+            known = {path: (mtime_ns, size, digest) for path, mtime_ns, size, digest
+                     in self._db.execute("SELECT path, mtime_ns, size, digest FROM documents")}
+
+            for path in document_paths(source):
+                signature = file_signature(path)
+                previous = known.pop(path, None)
+                if previous is not None and previous[:2] == signature:
+                    stats["unchanged"] += 1
+                    continue
+
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+                digest = hashlib.sha1(text.encode()).hexdigest()
+                with self._db:
+                    if previous is not None and previous[2] == digest:
+                        stats["unchanged"] += 1
+                    else:
+                        stats["updated" if previous is not None else "added"] += 1
+                        self._db.execute("DELETE FROM chunks WHERE path = ?", (path,))
+                        chunks = chunk_text(text, self.chunk_chars, self.overlap)
+                        self._append(path, chunks)
+                        stats["chunks"] += len(chunks)
+                    self._db.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)", (path, *signature, digest))
+
+            with self._db:
+                for path in known:
+                    self._db.execute("DELETE FROM chunks WHERE path = ?", (path,))
+                    self._db.execute("DELETE FROM documents WHERE path = ?", (path,))
+                    stats["removed"] += 1
+
+            self._load()
+            _, live, live_count, _ = self._state
+            if len(live) and 1 - live_count / len(live) >= COMPACT_THRESHOLD:
+                self._compact()
+            if live_count >= IVF_MIN_ROWS and live_count >= 2 * int(self._meta("trained_rows") or 0):
+                self._train()
+            span.set("chunks", live_count)
+            tracing.count("documents.embedded", stats["chunks"])
+        return stats
+
+    def _nearest(self, query: str, k: int, min_score: float) -> list:
+        """(row, score) of the best ``k`` current rows scoring above ``min_score``, best first."""
+        vectors, live, live_count, clusters = self._state
+        if not live_count or k <= 0:
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        if clusters is None:
+            rows = None
+            scores = vectors @ query_vector
+            if live_count < len(live):
+                scores[~live] = -np.inf
+        else:
+            centroids, members, offsets = clusters
+            probes = min(self.probes, len(centroids))
+            nearest = np.argpartition(-(centroids @ query_vector), probes - 1)[:probes]
+            rows = np.sort(np.concatenate([members[offsets[c]:offsets[c + 1]] for c in nearest]))
+            scores = vectors[rows] @ query_vector
+
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row if rows is None else rows[row]), float(scores[row])) for row in top if scores[row] > min_score]
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K, min_score: float = 0.0) -> list:
+        """
+        Finds the passages most similar to ``query``.
+
+        Args:
+            query (str): Text to search for.
+            k (int): Maximum number of passages.
+            min_score (float): Passages with a cosine similarity at or below this are left out.
+
+        Returns:
+            list: Dicts with "path", "position", "text" and "score", best first.
+        """
+        with tracing.span("documents.search") as span:
+            while True:
+                renumbered = self._renumbered
+                nearest = self._nearest(query, k, min_score)
+                if not nearest:
+                    return []
+                with self._reader_lock:
+                    if renumbered != self._renumbered:
+                        continue  # rows were renumbered while scoring
+                    placeholders = ",".join("?" * len(nearest))
+                    rows = {row: (path, position, text) for row, path, position, text in self._reader.execute(
+                        f"SELECT row, path, position, text FROM chunks WHERE row IN ({placeholders})",
+                        [row for row, _ in nearest],
+                    )}
+                break
+
+            span.set("hits", len(rows))
+            return [
+                {"path": rows[row][0], "position": rows[row][1], "text": rows[row][2], "score": score}
+                for row, score in nearest if row in rows
+            ]
+
+
+def format_passages(passages: list) -> str:
+    """Formats search results as a numbered reference block for a prompt; empty when there are none."""
+    if not passages:
+        return ""
+    lines = ["Relevant passages from the user's tax documents (cite the source when you rely on one):"]
+    lines += [f"[{i}] {os.path.basename(p['path'])}: {p['text']}" for i, p in enumerate(passages, 1)]
+    return "\n".join(lines)
+
+
+def default_tax_index(api_key: str):
+    """
+    The tax document index configured by the environment, brought up to date.
+
+    TAX_DOCUMENTS_DIR names the folder of .txt/.md tax documents (IRS publications,
+    state rules, the user's own notes); without it there is no index. Vectors are
+    kept in TAX_INDEX_DIR.
+
+    Returns:
+        DocumentIndex: The index, or None when no documents are configured or the build failed.
+    """
+    documents_dir = os.getenv("TAX_DOCUMENTS_DIR")
+    if not documents_dir:
+        return None
+    try:
+        index = DocumentIndex(os.getenv("TAX_INDEX_DIR", os.path.join(".market_data", "tax_index")),
+                              OpenAIEmbedder(api_key=api_key))
+        index.build(documents_dir)
+        return index
+    except Exception as e:
+        print(f"Error building the tax document index: {e}")
+        tracing.record_error(e)
+        return None
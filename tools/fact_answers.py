@@ -0,0 +1,138 @@
+import re
+from tools.context_builder import _WORD_RE, SymbolIndex
+
+# Wording that asks for judgement rather than a number; these always go to the LLM.
+OPEN_ENDED_PATTERN = re.compile(
+    r"\b(why|should|explain|compare|advi[cs]e|analy[sz]\w*|think|opinion|risk\w*|diversif\w*|better|worse|"
+    r"predict\w*|forecast|outlook|expect\w*|strategy|tax\w*|what if|could|would|suggest\w*|rebalanc\w*|"
+    r"volatil\w*|beta|drawdowns?|correlat\w*)\b",
+    re.IGNORECASE,
+)
+
+# Stands in for the ticker symbols of a question while it is matched against the templates.
+TICKERS = "§"
+
+_NOUN = r"(?:share |stock )?(?:prices?|quotes?|values?|recommendations?|ratings?)"
+_NOUNS = rf"(?P<nouns>{_NOUN}(?:(?:,| and|, and) {_NOUN})*)"
+_ASK = r"(?:(?:what|how much) (?:is|are) |tell me |show me |give me )?(?:the |my )?(?:current |latest )?"
+_HOLDING = r"(?: position| shares| stock| holdings?)?"
+_PORTFOLIO = r"my (?:whole |entire |total )?portfolio"
+
+# Whole-question templates of the factual questions answered without the LLM. A
+# question only matches if nothing else is asked, so qualifiers such as a time
+# ("last month"), a change ("gain"), a share ("relative to") or a subset ("tech
+# holdings") send it to the LLM. Templates with a "nouns" group take their
+# intents from it.
+FACT_TEMPLATES = [
+    (rf"{_ASK}{_NOUNS} (?:of|for|on) (?:my )?{TICKERS}{_HOLDING}", None),
+    (rf"{_ASK}{TICKERS}(?:'s)?{_HOLDING} {_NOUNS}", None),
+    (rf"(?:what|where) (?:is|are) {TICKERS} trading(?: at)?", {"price"}),
+    (rf"is {TICKERS} (?:a )?buy, hold or sell", {"recommendation"}),
+    (rf"(?:how much|what) (?:is|are) my {TICKERS}{_HOLDING} worth", {"value"}),
+    (rf"(?:how much|what) is {_PORTFOLIO} worth(?: in total| altogether)?", {"value", "total"}),
+    (rf"{_ASK}(?:total )?value of {_PORTFOLIO}", {"value", "total"}),
+    (rf"(?:what is )?{_PORTFOLIO}(?:'s)? (?:current |total )?value", {"value", "total"}),
+]
+_TEMPLATE_RES = [(re.compile(pattern), intents) for pattern, intents in FACT_TEMPLATES]
+
+_NOUN_INTENTS = {"price": "price", "quote": "price", "value": "value", "recommendation": "recommendation",
+                 "rating": "recommendation"}
+_TICKER_LIST_RE = re.compile(rf"{TICKERS}(?:(?:,|,? and| &) {TICKERS})*")
+
+
+def _money(amount: float) -> str:
+    return f"${amount:,.2f}"
+
+
+def _shares(quantity) -> str:
+    quantity = float(quantity)
+    return f"{quantity:,.0f}" if quantity.is_integer() else f"{quantity:,}"
+
+
+def _normalize(question: str, tickers: list) -> str:
+    """Lower-cases the question and replaces each run of the given tickers with TICKERS."""
+    symbols = {ticker.upper() for ticker in tickers}
+
+    def mark(match):
+        word = match.group(0).lstrip("$").rstrip(".-")
+        return TICKERS if word.upper() in symbols else match.group(0)
+
+    text = _WORD_RE.sub(mark, question.replace("\u2019", "'"))
+    text = re.sub(r"\s+", " ", text).strip().rstrip("?.!").strip().lower()
+    text = re.sub(r"\bwhat'?s\b", "what is", text)
+    return _TICKER_LIST_RE.sub(TICKERS, text)
+
+
+def fact_intents(question: str, tickers: list = ()) -> set:
+    """
+    Returns the factual intents ("price", "value", "recommendation", "total") of a question.
+
+    Args:
+        question (str): The user's question.
+        tickers (list): Tickers the question mentions, as found by SymbolIndex.extract.
+
+    Returns:
+        set: The intents, or an empty set unless the whole question matches a factual template.
+    """
+    text = _normalize(question, tickers)
+    for pattern, intents in _TEMPLATE_RES:
+        match = pattern.fullmatch(text)
+        if match is None:
+            continue
+        if intents is None:
+            intents = {intent for noun, intent in _NOUN_INTENTS.items() if noun in match.group("nouns")}
+        return set(intents)
+    return set()
+
+
+def answer_factual_question(question: str, portfolio_data: dict, recommendations: dict, as_of: str = "unknown",
+                            index: SymbolIndex = None):
+    """
+    Answers a factual portfolio question from computed data, without the LLM.
+
+    Handles price lookups, position values and current recommendations for the
+    tickers a question names, and the total portfolio value, when the question
+    matches one of FACT_TEMPLATES. Anything else, including questions asking for
+    judgement, naming an unknown ticker, or needing data that is missing, returns
+    None so the caller can fall back to the LLM.
+
+    Args:
+        question (str): The user's question.
+        portfolio_data (dict): Result of calculate_portfolio_value.
+        recommendations (dict): Ticker to recommendation.
+        as_of (str): When the recommendations were computed.
+        index (SymbolIndex): Prebuilt symbol index; built from the data if omitted.
+
+    Returns:
+        str: The templated answer, or None if the question is not purely factual.
+    """
+    if OPEN_ENDED_PATTERN.search(question):
+        return None
+
+    values = portfolio_data["stocks"]
+    quantities = portfolio_data["quantities"]
+    index = index or SymbolIndex(list(values) + [t for t in recommendations if t not in values])
+    tickers = index.extract(question)
+    intents = fact_intents(question, tickers)
+    if not intents:
+        return None
+
+    if "total" in intents:
+        return (
+            f"Your portfolio is worth {_money(portfolio_data['total_value'])} "
+            f"across {len(values)} position{'' if len(values) == 1 else 's'}."
+        )
+
+    lines = []
+    for ticker in tickers:
+        if intents & {"price", "value"} and ticker not in values:
+            return None
+        if "price" in intents:
+            lines.append(f"{ticker} is trading at {_money(values[ticker] / quantities[ticker])} per share.")
+        if "value" in intents:
+            lines.append(f"Your {_shares(quantities[ticker])} shares of {ticker} are worth {_money(values[ticker])}.")
+        if "recommendation" in intents:
+            if ticker not in recommendations:
+                return None
+            lines.append(f"The current recommendation for {ticker} is {recommendations[ticker]} (as of {as_of}).")
+    return "\n".join(lines) or None
@@ -0,0 +1,282 @@
+import os
+import threading
+import time
+import numpy as np
+from tools import tracing
+from tools.lazy import lazy_import
+
+pd = lazy_import("pandas")
+yf = lazy_import("yfinance")
+
+# One fixed-size record per daily bar; dates are days since the Unix epoch.
+HISTORY_DTYPE = np.dtype([
+    ("date", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+
+DEFAULT_INITIAL_PERIOD = "1y"
+DEFAULT_MIN_UPDATE_INTERVAL = 60 * 60
+
+
+def _to_days(index) -> np.ndarray:
+    """Converts a (possibly tz-aware) DatetimeIndex to int64 days since the epoch."""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize().values.astype("datetime64[D]").astype(np.int64)
+
+
+def _today(tz=None) -> int:
+    """Today as days since the epoch, in ``tz`` (e.g. the exchange's timezone) or local time."""
+    return int(np.datetime64(pd.Timestamp.now(tz=tz).date(), "D").astype(np.int64))
+
+
+def _closed_sessions(history: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Drops the bars of sessions that may not have closed yet.
+
+    During market hours yfinance includes today's unfinished bar, whose close is
+    only the latest trade. Bars dated today or later in the exchange's timezone
+    are dropped so the store only ever holds final closes.
+    """
+    if history is None or history.empty:
+        return history
+    return history[_to_days(history.index) < _today(pd.DatetimeIndex(history.index).tz)]
+
+
+class HistoryStore:
+    def __init__(self, root: str, initial_period: str = DEFAULT_INITIAL_PERIOD,
+                 min_update_interval: float = DEFAULT_MIN_UPDATE_INTERVAL):
+        """
+        Initializes an append-only, memory-mapped store of daily OHLCV bars.
+
+        Each ticker is a flat binary file of HISTORY_DTYPE records in date order.
+        Updates download only the bars from the last stored date on and append the
+        new ones; a split, or a refetched bar whose adjusted close changed, makes
+        the whole file be rewritten from a full download instead. Reads memory-map
+        the file and return views without copying.
+
+        Args:
+            root (str): Directory holding one file per ticker (created on first write).
+            initial_period (str): yfinance period downloaded for a ticker with no history.
+            min_update_interval (float): Seconds during which a ticker that was just
+                updated is not checked for new bars again.
+        """
+        self.root = root
+        self.initial_period = initial_period
+        self.min_update_interval = min_update_interval
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def path(self, ticker: str) -> str:
+        return os.path.join(self.root, f"{ticker.replace('/', '_')}.bin")
+
+    def _lock(self, ticker: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def load(self, ticker: str) -> np.ndarray:
+        """
+        Memory-maps every stored bar of a ticker.
+
+        Returns:
+            np.ndarray: A read-only HISTORY_DTYPE array (empty if nothing is stored).
+        """
+        path = self.path(ticker)
+        if not os.path.exists(path) or os.path.getsize(path) < HISTORY_DTYPE.itemsize:
+            return np.empty(0, dtype=HISTORY_DTYPE)
+        count = os.path.getsize(path) // HISTORY_DTYPE.itemsize
+        return np.memmap(path, dtype=HISTORY_DTYPE, mode="r", shape=(count,))
+
+    def last_date(self, ticker: str):
+        """Returns the last stored date as days since the epoch, or None."""
+        bars = self.load(ticker)
+        return int(bars["date"][-1]) if len(bars) else None
+
+    @staticmethod
+    def _records(history: "pd.DataFrame") -> np.ndarray:
+        """Converts a yfinance-style frame to HISTORY_DTYPE records in date order."""
+        records = np.empty(len(history), dtype=HISTORY_DTYPE)
+        records["date"] = _to_days(history.index)
+        for field in ("open", "high", "low", "close", "volume"):
+            column = field.capitalize()
+            records[field] = history[column].to_numpy(dtype=float) if column in history.columns else np.nan
+        return records[np.argsort(records["date"], kind="stable")]
+
+    def append(self, ticker: str, history: "pd.DataFrame") -> int:
+        """
+        Appends the bars of ``history`` that are newer than the last stored bar.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            history (pd.DataFrame): yfinance-style frame indexed by date with
+                Open/High/Low/Close/Volume columns.
+
+        Returns:
+            int: Number of bars appended.
+        """
+        if history is None or history.empty:
+            return 0
+
+        records = self._records(history)
+        last = self.last_date(ticker)
+        if last is not None:
+            records = records[records["date"] > last]
+        if not len(records):
+            return 0
+
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.path(ticker), "ab") as f:
+            f.write(records.tobytes())
+        return len(records)
+
+    def rewrite(self, ticker: str, history: "pd.DataFrame") -> int:
+        """
+        Replaces every stored bar of a ticker with those of ``history``.
+
+        The new file is written next to the old one and swapped in, so readers
+        holding a memory map keep seeing the old bars.
+
+        Returns:
+            int: Number of bars written.
+        """
+        records = self._records(history) if history is not None else np.empty(0, dtype=HISTORY_DTYPE)
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(ticker)
+        with open(path + ".tmp", "wb") as f:
+            f.write(records.tobytes())
+        os.replace(path + ".tmp", path)
+        tracing.count("history.rewrites")
+        return len(records)
+
+    def _revised(self, ticker: str, history: "pd.DataFrame") -> bool:
+        """
+        Whether a download shows the stored bars are out of date.
+
+        yfinance back-adjusts earlier prices for splits (and dividends), so a new
+        bar with a non-zero "Stock Splits" entry, or a refetched bar whose close no
+        longer matches the stored one, means the stored prices are stale.
+        """
+        if history is None or history.empty:
+            return False
+        bars = self.load(ticker)
+        days = _to_days(history.index)
+        # A split on a stored bar was already seen when that bar arrived
+        if "Stock Splits" in history.columns and (history["Stock Splits"].fillna(0)[days > bars["date"][-1]] != 0).any():
+            return True
+        overlap = days == bars["date"][-1]
+        if not overlap.any():
+            return False
+        close = history["Close"].to_numpy(dtype=float)[overlap][0]
+        return not np.isclose(close, bars["close"][-1], rtol=1e-9, equal_nan=True)
+
+    def update(self, ticker: str, throttle=None) -> int:
+        """
+        Downloads and appends only the bars missing since the last stored date.
+
+        The last stored bar is downloaded again alongside the new ones. When it
+        has been revised, or the download includes a split, the ticker's file is
+        rewritten from a download of its whole stored range. Only closed sessions
+        are stored, so today's bar is added on the first update after today.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            throttle (callable): Optional function called before the network request.
+
+        Returns:
+            int: Number of bars appended, or written by a rewrite.
+        """
+        with self._lock(ticker):
+            path = self.path(ticker)
+            if os.path.exists(path) and time.time() - os.path.getmtime(path) < self.min_update_interval:
+                return 0
+
+            last = self.last_date(ticker)
+            if last is not None and last >= _today() - 1:
+                return 0  # Only today's unfinished session could be missing
+
+            def download(**kwargs):
+                if throttle is not None:
+                    throttle()
+                tracing.count("network.yfinance")
+                return _closed_sessions(stock.history(**kwargs))
+
+            stock = yf.Ticker(ticker)
+            if last is None:
+                history = download(period=self.initial_period)
+            else:
+                history = download(start=np.datetime64(last, "D").astype(str))
+
+            if last is not None and self._revised(ticker, history):
+                first = int(self.load(ticker)["date"][0])
+                return self.rewrite(ticker, download(start=np.datetime64(first, "D").astype(str)))
+
+            appended = self.append(ticker, history)
+            if os.path.exists(path):
+                os.utime(path)  # Record the check even when no new bars arrived
+            return appended
+
+    def window(self, ticker: str, start=None, end=None) -> np.ndarray:
+        """
+        Returns the stored bars between two dates as a view of the memory map.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            start: First date to include (anything pd.Timestamp accepts), or None.
+            end: Last date to include, or None.
+
+        Returns:
+            np.ndarray: HISTORY_DTYPE records, without copying.
+        """
+        bars = self.load(ticker)
+        dates = bars["date"]
+        low = 0 if start is None else np.searchsorted(dates, _to_days([pd.Timestamp(start)])[0], side="left")
+        high = len(bars) if end is None else np.searchsorted(dates, _to_days([pd.Timestamp(end)])[0], side="right")
+        return bars[low:high]
+
+    def aligned_closes(self, tickers, start=None, end=None):
+        """
+        Stored closes of many tickers on one shared date axis.
+
+        Args:
+            tickers (Iterable[str]): Tickers to include, one column each.
+            start: First date to include, or None.
+            end: Last date to include, or None.
+
+        Returns:
+            tuple: (pd.DatetimeIndex of every date any ticker traded, dates × tickers
+                float array with NaN where a ticker has no bar).
+        """
+        windows = [self.window(ticker, start, end) for ticker in tickers]
+        days = np.unique(np.concatenate([bars["date"] for bars in windows])) if windows else np.empty(0, np.int64)
+
+        closes = np.full((len(days), len(windows)), np.nan)
+        for column, bars in enumerate(windows):
+            closes[np.searchsorted(days, bars["date"]), column] = bars["close"]
+        return pd.DatetimeIndex(days.astype("datetime64[D]")), closes
+
+    def closes(self, ticker: str, months: int = 6) -> np.ndarray:
+        """Closing prices for the last ``months`` calendar months, as a view of the store."""
+        start = pd.Timestamp.today().normalize() - pd.DateOffset(months=months)
+        return self.window(ticker, start=start)["close"]
+
+
+def price_trend(closes: np.ndarray) -> float:
+    """
+    Mean daily percentage change of a close series.
+
+    Matches ``pd.Series(closes).pct_change().mean()``: NaN for fewer than two
+    prices and 0 for an empty series, as StockRecommender expects.
+    """
+    if len(closes) == 0:
+        return 0
+    if len(closes) < 2:
+        return float("nan")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changes = np.diff(closes) / closes[:-1]
+    changes = changes[~np.isnan(changes)]
+    return float(changes.mean()) if len(changes) else float("nan")
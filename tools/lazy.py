@@ -0,0 +1,52 @@
+import importlib
+import sys
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        """
+        Stands in for a module that is only imported when one of its attributes is used.
+
+        Attribute assignment and deletion are forwarded to the real module, so
+        patching e.g. ``tools.portfolio.pd.read_excel`` in tests works as it does
+        on the module itself.
+
+        Args:
+            name (str): Fully qualified module name.
+        """
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_loaded", None)
+
+    def _module(self):
+        module = self._loaded
+        if module is None:
+            module = importlib.import_module(self._name)
+            object.__setattr__(self, "_loaded", module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._module(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._module(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._module(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._loaded is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str):
+    """
+    Binds a heavy dependency without importing it yet.
+
+    pandas, yfinance, the OpenAI SDK and LangChain together take seconds to
+    import; binding them lazily keeps start-up fast and loads each one only on
+    the code paths that use it.
+
+    Returns:
+        The module itself if it is already imported, otherwise a LazyModule.
+    """
+    return sys.modules.get(name) or LazyModule(name)
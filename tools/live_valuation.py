@@ -0,0 +1,239 @@
+import csv
+import json
+import queue
+import threading
+import time
+from typing import NamedTuple
+import numpy as np
+from tools import tracing
+from tools.portfolio import get_portfolio
+
+# The running total is recomputed from the position values after this many ticks,
+# so floating-point error from incremental updates cannot build up.
+RESYNC_EVERY = 100_000
+
+
+class Tick(NamedTuple):
+    ticker: str
+    price: float
+    timestamp: float = None
+
+
+class TickSource:
+    """Iterable of Tick objects; subclasses decide where ticks come from."""
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def close(self):
+        """Stops the source; iteration ends after any ticks already delivered."""
+
+
+class ReplayTickSource(TickSource):
+    def __init__(self, path: str, speed: float = None):
+        """
+        Replays recorded ticks from a CSV (timestamp,ticker,price) or JSON-lines file.
+
+        Args:
+            path (str): Recording to replay; rows are streamed, not loaded at once.
+            speed (float): Replay speed relative to the recorded timestamps (1.0 is
+                real time, 10.0 ten times faster). None replays as fast as possible.
+        """
+        self.path = path
+        self.speed = speed
+        self._closed = False
+
+    def _rows(self, f):
+        if self.path.endswith((".jsonl", ".ndjson")):
+            return (json.loads(line) for line in f if line.strip())
+        return csv.DictReader(f)
+
+    def __iter__(self):
+        started, first = time.monotonic(), None
+        with open(self.path, newline="") as f:
+            for row in self._rows(f):
+                if self._closed:
+                    return
+                timestamp = float(row["timestamp"]) if row.get("timestamp") not in (None, "") else None
+                if self.speed and timestamp is not None:
+                    first = timestamp if first is None else first
+                    delay = (timestamp - first) / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                yield Tick(row["ticker"], float(row["price"]), timestamp)
+
+    def close(self):
+        self._closed = True
+
+    @staticmethod
+    def record(path: str, ticks):
+        """Writes ticks to a CSV file that ReplayTickSource can replay."""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestamp", "ticker", "price"])
+            writer.writerows((tick.timestamp, tick.ticker, tick.price) for tick in ticks)
+
+
+class QueueTickSource(TickSource):
+    def __init__(self, maxsize: int = 0):
+        """
+        Push-based source for live feeds: a feed thread calls put(), the engine iterates.
+
+        Args:
+            maxsize (int): Queue bound; put() blocks when full. 0 means unbounded.
+        """
+        self._queue = queue.Queue(maxsize)
+        self._done = object()
+
+    def put(self, ticker: str, price: float, timestamp: float = None):
+        self._queue.put(Tick(ticker, price, timestamp if timestamp is not None else time.time()))
+
+    def __iter__(self):
+        while (tick := self._queue.get()) is not self._done:
+            yield tick
+
+    def close(self):
+        self._queue.put(self._done)
+
+
+class LiveValuation:
+    def __init__(self, tickers, quantities, prices: dict = None):
+        """
+        Keeps a portfolio's value up to date as price ticks arrive.
+
+        Quantities, last prices and position values live in NumPy arrays with one
+        slot per ticker. A tick updates its slot and the running total in O(1)
+        and publishes a change event to every subscriber.
+
+        Args:
+            tickers (Iterable[str]): Distinct tickers held.
+            quantities (Iterable[float]): Shares held of each ticker.
+            prices (dict): Starting price per ticker; unpriced positions count as 0
+                until their first tick.
+        """
+        self.tickers = list(tickers)
+        self._slots = {ticker: slot for slot, ticker in enumerate(self.tickers)}
+        self.quantities = np.asarray(quantities, dtype=float)
+        self.prices = np.array([(prices or {}).get(t, np.nan) for t in self.tickers], dtype=float)
+        self.values = np.nan_to_num(self.prices * self.quantities)
+        self.total = float(self.values.sum())
+        self.ticks = 0
+        self.ignored = 0
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_portfolio(cls, file_path: str, prices: dict = None) -> "LiveValuation":
+        """
+        Builds the engine from a portfolio file.
+
+        Args:
+            file_path (str): Holdings file.
+            prices (dict): Starting prices; defaults to the last prices stored by the
+                recommendation refresh, so no network request is made.
+        """
+        portfolio = get_portfolio(file_path)
+        if prices is None:
+            prices = portfolio.derived_values("Last Price")
+        return cls(portfolio.unique_tickers, portfolio.position_quantities(), prices)
+
+    def subscribe(self, callback):
+        """
+        Calls ``callback(event)`` for every applied tick.
+
+        Events are dicts with "ticker", "price", "previous_price", "value",
+        "change" (in position value), "total" and "timestamp".
+
+        Returns:
+            callable: Removes the subscription when called.
+        """
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def apply(self, ticker: str, price: float, timestamp: float = None):
+        """
+        Applies one price tick.
+
+        Args:
+            ticker (str): Ticker the price is for; ticks for tickers not held are ignored.
+            price (float): New price.
+            timestamp (float): When the price was observed.
+
+        Returns:
+            dict: The published change event, or None if the tick was ignored.
+        """
+        slot = self._slots.get(ticker)
+        if slot is None or not price == price:  # NaN prices are dropped too
+            self.ignored += 1
+            return None
+
+        with self._lock:
+            previous_price = self.prices[slot]
+            value = price * self.quantities[slot]
+            change = value - self.values[slot]
+            self.prices[slot] = price
+            self.values[slot] = value
+            self.total += change
+            self.ticks += 1
+            if self.ticks % RESYNC_EVERY == 0:
+                self.total = float(self.values.sum())
+            event = {
+                "ticker": ticker,
+                "price": price,
+                "previous_price": None if previous_price != previous_price else float(previous_price),
+                "value": float(value),
+                "change": float(change),
+                "total": float(self.total),
+                "timestamp": timestamp,
+            }
+
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error in valuation subscriber: {e}")
+                tracing.record_error(e)
+        return event
+
+    def run(self, source: TickSource, max_ticks: int = None) -> int:
+        """
+        Applies ticks from a source until it ends or ``max_ticks`` have been read.
+
+        Args:
+            source (TickSource): Any iterable of Tick.
+            max_ticks (int): Stop after this many ticks.
+
+        Returns:
+            int: Number of ticks read.
+        """
+        read = 0
+        with tracing.span("live.run", source=type(source).__name__) as span:
+            for tick in source:
+                self.apply(*tick)
+                read += 1
+                if max_ticks is not None and read >= max_ticks:
+                    break
+            span.set("ticks", read)
+            tracing.count("live.ticks", read)
+        return read
+
+    def start(self, source: TickSource) -> threading.Thread:
+        """Runs ``source`` in a daemon thread; call source.close() to stop it."""
+        thread = threading.Thread(target=self.run, args=(source,), daemon=True)
+        thread.start()
+        return thread
+
+    def snapshot(self) -> dict:
+        """
+        Current valuation in the calculate_portfolio_value format, for the agents.
+
+        Tickers that have never been priced are left out.
+        """
+        with self._lock:
+            priced = ~np.isnan(self.prices)
+            tickers = [ticker for ticker, ok in zip(self.tickers, priced) if ok]
+            return {
+                "stocks": dict(zip(tickers, self.values[priced].tolist())),
+                "quantities": dict(zip(tickers, self.quantities[priced].tolist())),
+                "total_value": round(self.total, 2),
+            }
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from tools import tracing
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapses whitespace so prompts that differ only in indentation share a cache entry."""
+    return " ".join(prompt.split())
+
+
+def snapshot_hash(*parts) -> str:
+    """
+    Hashes the data a response depends on (portfolio, prices, recommendations...).
+
+    Args:
+        *parts: JSON-serialisable values; anything else is hashed by its string form.
+
+    Returns:
+        str: A hex digest that changes whenever any part changes.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _messages_to_prompt(messages) -> str:
+    return "\n".join(getattr(message, "content", str(message)) for message in messages)
+
+
+def _record_usage(message):
+    """Adds the token counts LangChain reports on a message (if any) to the current span."""
+    usage = getattr(message, "usage_metadata", None)
+    if isinstance(usage, dict):
+        tracing.count("llm.prompt_tokens", usage.get("input_tokens", 0))
+        tracing.count("llm.completion_tokens", usage.get("output_tokens", 0))
+
+
+def _model_name(llm) -> str:
+    for attribute in ("model_name", "model"):
+        name = getattr(llm, attribute, None)
+        if isinstance(name, str) and name:
+            return name
+    return type(llm).__name__
+
+
+class LLMResponseCache:
+    def __init__(self, path: str = ":memory:", ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 enabled: bool = True):
+        """
+        Initializes an SQLite-backed cache of LLM responses.
+
+        Entries are keyed on the normalized prompt, the model name and a hash of
+        the portfolio snapshot the prompt was built from. Storing a response for a
+        new snapshot drops every entry cached for an older snapshot in the same scope.
+
+        Args:
+            path (str): SQLite database file, or ":memory:" for a process-local cache.
+            ttl (float): Seconds before an entry expires.
+            max_entries (int): Maximum number of entries; least recently used are evicted.
+            enabled (bool): When False every lookup is bypassed.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.counters = {"hits": 0, "misses": 0, "bypassed": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, scope TEXT, snapshot TEXT, model TEXT, response TEXT, "
+            "created_at REAL, last_used_at REAL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(prompt: str, model: str, snapshot: str = "") -> str:
+        return hashlib.sha256("\0".join((model, snapshot, normalize_prompt(prompt))).encode()).hexdigest()
+
+    def get(self, prompt: str, model: str, snapshot: str = "", bypass: bool = False):
+        """
+        Returns the cached response for a prompt, or None on a miss.
+
+        Args:
+            prompt (str): The full prompt text.
+            model (str): Name of the model that produced the response.
+            snapshot (str): Hash of the data the prompt was built from.
+            bypass (bool): Skip the cache for this lookup.
+
+        Returns:
+            str: The cached response, or None.
+        """
+        with self._lock:
+            if bypass or not self.enabled:
+                self.counters["bypassed"] += 1
+                tracing.count("llm_cache.bypassed")
+                return None
+
+            now = time.time()
+            key = self.make_key(prompt, model, snapshot)
+            row = self._db.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                self.counters["misses"] += 1
+                tracing.count("llm_cache.misses")
+                return None
+
+            self._db.execute("UPDATE llm_cache SET last_used_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.counters["hits"] += 1
+            tracing.count("llm_cache.hits")
+            return row[0]
+
+    def set(self, prompt: str, model: str, response: str, snapshot: str = "", scope: str = "default"):
+        """
+        Stores a response and enforces invalidation, expiry and the size bound.
+
+        Args:
+            prompt (str): The full prompt text.
+            model (str): Name of the model that produced the response.
+            response (str): The response text.
+            snapshot (str): Hash of the data the prompt was built from.
+            scope (str): Group of entries sharing a snapshot, e.g. one agent and portfolio file.
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache WHERE scope = ? AND snapshot != ?", (scope, snapshot))
+            self._db.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, scope, snapshot, model, response, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(prompt, model, snapshot), scope, snapshot, model, response, now, now),
+            )
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE key NOT IN "
+                "(SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def invoke(self, llm, messages, snapshot: str = "", scope: str = "default", bypass: bool = False) -> str:
+        """
+        Returns the cached response for ``messages`` or calls ``llm.invoke`` and caches it.
+
+        Args:
+            llm: A LangChain chat model (or anything with ``invoke`` and a model name).
+            messages (list): The messages to send.
+            snapshot (str): Hash of the data the prompt was built from.
+            scope (str): Group of entries invalidated together when the snapshot changes.
+            bypass (bool): Always call the LLM and do not store the result.
+
+        Returns:
+            str: The response text.
+        """
+        prompt = _messages_to_prompt(messages)
+        model = _model_name(llm)
+
+        with tracing.span("llm.invoke", model=model, scope=scope, prompt_chars=len(prompt)):
+            cached = self.get(prompt, model, snapshot, bypass=bypass)
+            if cached is not None:
+                return cached
+
+            tracing.count("network.llm")
+            response = llm.invoke(messages)
+            _record_usage(response)
+            if not hasattr(response, "content"):
+                return str(response)
+
+            if not bypass:
+                self.set(prompt, model, response.content, snapshot, scope)
+            return response.content
+
+    async def astream(self, llm, messages, snapshot: str = "", scope: str = "default", bypass: bool = False):
+        """
+        Streams the response for ``messages``, caching the full text once the stream ends.
+
+        A cached response is yielded as a single chunk. Arguments match ``invoke``.
+
+        Yields:
+            str: Chunks of the response text.
+        """
+        prompt = _messages_to_prompt(messages)
+        model = _model_name(llm)
+
+        with tracing.span("llm.astream", model=model, scope=scope, prompt_chars=len(prompt)):
+            cached = self.get(prompt, model, snapshot, bypass=bypass)
+            if cached is not None:
+                yield cached
+                return
+
+            tracing.count("network.llm")
+            parts = []
+            async for chunk in llm.astream(messages):
+                _record_usage(chunk)
+                text = getattr(chunk, "content", str(chunk))
+                if text:
+                    parts.append(text)
+                    yield text
+
+            if parts and not bypass:
+                self.set(prompt, model, "".join(parts), snapshot, scope)
+
+    def invalidate(self, scope: str = None):
+        """Drops every entry, or only the entries of one scope."""
+        with self._lock:
+            if scope is None:
+                self._db.execute("DELETE FROM llm_cache")
+            else:
+                self._db.execute("DELETE FROM llm_cache WHERE scope = ?", (scope,))
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """Returns hit/miss/bypass counters and the number of stored entries."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return {**self.counters, "entries": entries}
+
+
+_llm_cache = LLMResponseCache(
+    path=os.getenv("LLM_CACHE_PATH", ":memory:"),
+    enabled=os.getenv("LLM_CACHE_DISABLED", "").lower() not in {"1", "true", "yes"},
+)
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Returns the process-wide LLM response cache shared by the agents."""
+    return _llm_cache
+
+
+def set_llm_cache(cache: LLMResponseCache) -> LLMResponseCache:
+    """Replaces the process-wide LLM response cache and returns the previous one."""
+    global _llm_cache
+    previous, _llm_cache = _llm_cache, cache
+    return previous
@@ -0,0 +1,115 @@
+import os
+import threading
+from tools.lazy import lazy_import
+
+langchain_openai = lazy_import("langchain_openai")
+langchain_messages = lazy_import("langchain_core.messages")
+openai = lazy_import("openai")
+
+DEFAULT_CHAT_MODEL = "gpt-4"
+
+
+class LLMClients:
+    def __init__(self, api_key: str):
+        """
+        Creates the LLM clients for one API key on first use and hands out the same ones afterwards.
+
+        Every agent asking for the same chat model and options shares one
+        ChatOpenAI, and every workflow shares one OpenAI client, so their
+        connection pools are reused and nothing is built until a prompt needs it.
+
+        Args:
+            api_key (str): OpenAI API key.
+        """
+        self.api_key = api_key
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: tuple, create):
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = create()
+            return self._clients[key]
+
+    def chat(self, model: str = DEFAULT_CHAT_MODEL, **options):
+        """
+        Shared ChatOpenAI for ``model``.
+
+        Args:
+            model (str): Chat model name.
+            **options: Further ChatOpenAI arguments (e.g. stream_usage=True); each
+                distinct set gets its own instance.
+        """
+        return self._get(
+            ("chat", model, tuple(sorted(options.items()))),
+            lambda: langchain_openai.ChatOpenAI(model=model, openai_api_key=self.api_key, **options),
+        )
+
+    def openai(self):
+        """Shared openai.OpenAI client."""
+        return self._get(("openai",), lambda: openai.OpenAI(api_key=self.api_key))
+
+
+class SharedClient:
+    def __init__(self, kind: str = "chat", **options):
+        """
+        Attribute that fetches a shared client from get_llm_clients on first access.
+
+        The owning object must have an ``api_key`` attribute. Assigning to the
+        attribute replaces the client for that object only, e.g. with a test double.
+
+        Args:
+            kind (str): "chat" for a ChatOpenAI, "openai" for an openai.OpenAI client.
+            **options: Passed to LLMClients.chat.
+        """
+        self.kind = kind
+        self.options = options
+
+    def __set_name__(self, owner, name):
+        self.attribute = f"_{name}"
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        client = obj.__dict__.get(self.attribute)
+        if client is None:
+            clients = get_llm_clients(obj.api_key)
+            client = clients.chat(**self.options) if self.kind == "chat" else clients.openai()
+            obj.__dict__[self.attribute] = client
+        return client
+
+    def __set__(self, obj, client):
+        obj.__dict__[self.attribute] = client
+
+
+def human_message(content: str):
+    """A LangChain HumanMessage; LangChain is imported on the first call."""
+    return langchain_messages.HumanMessage(content=content)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_clients(api_key: str) -> LLMClients:
+    """Returns the process-wide client factory for ``api_key``."""
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = LLMClients(api_key)
+        return _clients[api_key]
+
+
+def clear_llm_clients():
+    """Forgets every shared client, e.g. between tests."""
+    with _clients_lock:
+        _clients.clear()
+
+
+def _reset_after_fork():
+    # A forked worker must not reuse the parent's connection pools, and the lock
+    # may have been held by another thread at the moment of the fork.
+    global _clients, _clients_lock
+    _clients, _clients_lock = {}, threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,257 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from tools import tracing
+
+# Time-to-live in seconds for each kind of market data.
+DEFAULT_TTLS = {
+    "quote": 30,
+    "fundamentals": 6 * 60 * 60,
+    "history": 24 * 60 * 60,
+}
+
+DEFAULT_MAX_ENTRIES = 4096
+
+# Seconds between deletions of expired rows from the on-disk store.
+PRUNE_INTERVAL = 60 * 60
+
+
+def _is_empty(value) -> bool:
+    """Returns True for values that should never be cached (None or empty containers/frames)."""
+    if value is None:
+        return True
+    try:
+        return len(value) == 0
+    except TypeError:
+        return False
+
+
+class MarketDataCache:
+    def __init__(self, ttls: dict = None, max_entries: int = DEFAULT_MAX_ENTRIES, path: str = None):
+        """
+        Initializes an in-memory TTL + LRU cache for market data.
+
+        Args:
+            ttls (dict): Time-to-live in seconds per data kind, merged over DEFAULT_TTLS.
+            max_entries (int): Maximum number of in-memory entries before the least
+                recently used one is evicted.
+            path (str): Optional SQLite file used as a persistent backing store.
+                Expired rows are deleted when it is opened and then at most every
+                PRUNE_INTERVAL seconds while values are stored.
+        """
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._in_flight = {}
+        self._db = None
+        self._pruned_at = 0.0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS market_cache ("
+                "kind TEXT, key TEXT, stored_at REAL, value BLOB, PRIMARY KEY (kind, key))"
+            )
+            self._db.commit()
+            self.prune()
+
+    def _record(self, kind: str, outcome: str):
+        counters = self._stats.setdefault(kind, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+        tracing.count(f"cache.{kind}.{outcome}")
+
+    def _is_fresh(self, kind: str, stored_at: float) -> bool:
+        return time.time() - stored_at < self.ttls.get(kind, 0)
+
+    def _load_from_disk(self, kind: str, key: str):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT stored_at, value FROM market_cache WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        if row is None or not self._is_fresh(kind, row[0]):
+            return None
+        return row[0], pickle.loads(row[1])
+
+    def _store(self, cache_key: tuple, stored_at: float, value):
+        self._entries[cache_key] = (stored_at, value)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, kind: str, key):
+        """
+        Returns a fresh cached value, or None on a miss or expired entry.
+
+        Args:
+            kind (str): The data kind, e.g. "quote", "fundamentals" or "history".
+            key: Hashable identifier of the value, usually the ticker.
+
+        Returns:
+            The cached value, or None.
+        """
+        cache_key = (kind, str(key))
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and not self._is_fresh(kind, entry[0]):
+                del self._entries[cache_key]
+                entry = None
+
+            if entry is None:
+                entry = self._load_from_disk(*cache_key)
+                if entry is not None:
+                    self._store(cache_key, *entry)
+            else:
+                self._entries.move_to_end(cache_key)
+
+            self._record(kind, "misses" if entry is None else "hits")
+            return None if entry is None else entry[1]
+
+    def get_many(self, kind: str, keys) -> dict:
+        """
+        Looks up several keys of the same kind.
+
+        Returns:
+            dict: Only the keys that were found fresh in the cache.
+        """
+        found = {}
+        for key in keys:
+            value = self.get(kind, key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, kind: str, key, value):
+        """Stores a value; None and empty values are ignored so failures are not cached."""
+        self.set_many(kind, {key: value})
+
+    def set_many(self, kind: str, values: dict):
+        """
+        Stores several values of the same kind, writing them to disk in one transaction.
+
+        Args:
+            kind (str): The data kind, e.g. "quote".
+            values (dict): Key to value; None and empty values are ignored.
+        """
+        rows = [(str(key), value) for key, value in values.items() if not _is_empty(value)]
+        if not rows:
+            return
+
+        stored_at = time.time()
+        with self._lock:
+            for key, value in rows:
+                self._store((kind, key), stored_at, value)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO market_cache (kind, key, stored_at, value) VALUES (?, ?, ?, ?)",
+                    [(kind, key, stored_at, pickle.dumps(value)) for key, value in rows],
+                )
+                self._db.commit()
+                if stored_at - self._pruned_at >= PRUNE_INTERVAL:
+                    self._prune(stored_at)
+
+    def _prune(self, now: float) -> int:
+        kinds = list(self.ttls)
+        deleted = self._db.execute(
+            f"DELETE FROM market_cache WHERE kind NOT IN ({', '.join('?' * len(kinds))})", kinds
+        ).rowcount
+        for kind, ttl in self.ttls.items():
+            deleted += self._db.execute(
+                "DELETE FROM market_cache WHERE kind = ? AND stored_at <= ?", (kind, now - ttl)
+            ).rowcount
+        self._db.commit()
+        self._pruned_at = now
+        return deleted
+
+    def prune(self) -> int:
+        """
+        Deletes the rows of the on-disk store that are past their kind's TTL.
+
+        Returns:
+            int: Number of rows deleted (0 without a backing store).
+        """
+        if self._db is None:
+            return 0
+        with self._lock:
+            return self._prune(time.time())
+
+    def get_or_fetch(self, kind: str, key, fetch):
+        """
+        Returns the cached value for ``key`` or calls ``fetch()`` and caches its result.
+
+        Concurrent misses for the same key are coalesced: the first caller fetches
+        and the others wait for its result instead of repeating the request.
+
+        Args:
+            kind (str): The data kind.
+            key: Identifier of the value.
+            fetch (callable): Zero-argument function returning the value on a miss.
+
+        Returns:
+            The cached or freshly fetched value.
+        """
+        value = self.get(kind, key)
+        if value is not None:
+            return value
+
+        cache_key = (kind, str(key))
+        with self._lock:
+            flight = self._in_flight.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[cache_key] = (threading.Event(), [])
+
+        done, result = flight
+        if not leader:
+            done.wait()
+            tracing.count(f"cache.{kind}.coalesced")
+            # The leader's fetch raised: fetch independently rather than fail too.
+            return result[0] if result else fetch()
+
+        try:
+            value = fetch()
+            result.append(value)
+            self.set(kind, key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._in_flight[cache_key]
+            done.set()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters per data kind and the current in-memory size."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "kinds": {kind: dict(counters) for kind, counters in self._stats.items()},
+            }
+
+    def clear(self):
+        """Drops every entry (including the on-disk store) and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM market_cache")
+                self._db.commit()
+
+
+_market_cache = MarketDataCache(path=os.getenv("MARKET_CACHE_PATH"))
+
+
+def get_market_cache() -> MarketDataCache:
+    """Returns the process-wide market data cache shared by the fetchers."""
+    return _market_cache
+
+
+def set_market_cache(cache: MarketDataCache) -> MarketDataCache:
+    """Replaces the process-wide market data cache and returns the previous one."""
+    global _market_cache
+    previous, _market_cache = _market_cache, cache
+    return previous
@@ -0,0 +1,235 @@
+import os
+import threading
+from datetime import datetime
+import numpy as np
+from tools import tracing
+from tools.lazy import lazy_import
+from tools.storage import DerivedStore, backend_for, derived_store_path, file_signature
+
+pd = lazy_import("pandas")
+
+
+def _build_state(columns: dict) -> tuple:
+    """Normalizes freshly read columns and factorizes the tickers into a (columns, codes, unique) state."""
+    columns = dict(columns)
+    columns["Ticker"] = columns["Ticker"].astype(object)
+    columns["Quantity"] = columns["Quantity"].astype(float)
+    # Integer code per row and the distinct tickers in order of first appearance
+    codes, unique = pd.factorize(columns["Ticker"], use_na_sentinel=False)
+    return columns, codes, unique
+
+
+def _with_recommendations(state: tuple, by_ticker: dict) -> tuple:
+    """
+    A copy of ``state`` with sidecar recommendations overlaid on the per-row
+    column, keeping file values for other tickers.
+    """
+    if not by_ticker:
+        return state
+    columns, codes, unique = state
+    current = columns.get("Recommendation")
+    recommendations = np.array(
+        [by_ticker.get(ticker, current[i] if current is not None else None) for i, ticker in enumerate(columns["Ticker"])],
+        dtype=object,
+    )
+    return {**columns, "Recommendation": recommendations}, codes, unique
+
+
+def _price_array(state: tuple, prices: dict) -> np.ndarray:
+    return np.array([np.nan if prices.get(ticker) is None else prices[ticker] for ticker in state[2]], dtype=float)
+
+
+def _position_quantities(state: tuple) -> np.ndarray:
+    columns, codes, unique = state
+    return np.bincount(codes, weights=columns["Quantity"], minlength=len(unique))
+
+
+class Portfolio:
+    def __init__(self, file_path: str, backend=None, derived: DerivedStore = None):
+        """
+        Loads portfolio holdings into NumPy columns.
+
+        The file is parsed once and only re-read when its modification time or
+        size changes, so repeated queries do not pay for Excel parsing. Derived
+        values (recommendations, scores, last prices) live in a sidecar store and
+        are never written back to the holdings file.
+
+        Args:
+            file_path (str): Holdings file with 'Ticker' and 'Quantity' columns
+                (.xlsx, .csv, .parquet or .db/.sqlite).
+            backend (StorageBackend): Reader for the file; chosen from its extension by default.
+            derived (DerivedStore): Sidecar store; defaults to derived_store_path(file_path).
+        """
+        self.file_path = file_path
+        self.backend = backend or backend_for(file_path)
+        self.derived = derived or DerivedStore(derived_store_path(file_path))
+        # (columns, row codes, distinct tickers), replaced in one assignment so
+        # readers never pair the columns of one load with the codes of another
+        self._state = ({}, np.empty(0, dtype=np.intp), np.empty(0, dtype=object))
+        self.modified_at = None
+        self._signature = None
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def _file_signature(self) -> tuple:
+        return file_signature(self.file_path)
+
+    def refresh(self) -> bool:
+        """
+        Reloads the holdings if the file changed since it was last read.
+
+        Returns:
+            bool: True if the file was (re)loaded.
+        """
+        with self._lock:
+            signature = self._file_signature()
+            if signature == self._signature:
+                return False
+
+            with tracing.span("portfolio.read", file=self.file_path, backend=type(self.backend).__name__) as span:
+                columns = self.backend.read_columns()
+                span.set("rows", len(columns.get("Ticker", ())))
+            if "Ticker" not in columns or "Quantity" not in columns:
+                raise ValueError(f"{self.file_path} must contain 'Ticker' and 'Quantity' columns.")
+
+            self._state = _with_recommendations(_build_state(columns), self.derived.read("Recommendation"))
+            self._signature = signature
+            self.modified_at = datetime.fromtimestamp(signature[0] / 1e9)
+            return True
+
+    @property
+    def columns(self) -> dict:
+        return self._state[0]
+
+    @property
+    def tickers(self) -> np.ndarray:
+        return self.columns["Ticker"]
+
+    @property
+    def quantities(self) -> np.ndarray:
+        return self.columns["Quantity"]
+
+    @property
+    def recommendations(self):
+        """Recommendation per row, or None if the file has no 'Recommendation' column."""
+        return self.columns.get("Recommendation")
+
+    @property
+    def unique_tickers(self) -> list:
+        return list(self._state[2])
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def recommendation_map(self) -> dict:
+        """Returns a ticker to recommendation mapping, or an empty dict if there are none."""
+        columns = self.columns
+        if columns.get("Recommendation") is None:
+            return {}
+        return dict(zip(columns["Ticker"], columns["Recommendation"]))
+
+    def price_array(self, prices: dict) -> np.ndarray:
+        """Looks up a price for every distinct ticker; unknown or failed prices are NaN."""
+        return _price_array(self._state, prices)
+
+    def position_quantities(self) -> np.ndarray:
+        """Total quantity per distinct ticker, aggregating duplicate rows."""
+        return _position_quantities(self._state)
+
+    def position_values(self, prices: dict) -> np.ndarray:
+        """Price × total quantity per distinct ticker (NaN where no price is known)."""
+        state = self._state
+        return _price_array(state, prices) * _position_quantities(state)
+
+    def total_value(self, prices: dict) -> float:
+        """Total value of all positions that have a known price."""
+        return float(np.nansum(self.position_values(prices)))
+
+    def to_frame(self, derived: bool = False) -> "pd.DataFrame":
+        """
+        Returns the holdings as a DataFrame.
+
+        Args:
+            derived (bool): Also add one column per field in the sidecar store.
+        """
+        columns = self.columns
+        df = pd.DataFrame(columns)
+        if derived:
+            for field in self.derived.fields():
+                values = self.derived.read(field)
+                df[field] = [values.get(ticker) for ticker in columns["Ticker"]]
+        return df
+
+    def update_derived(self, field: str, values: dict) -> int:
+        """
+        Writes the changed values of a derived field to the sidecar store.
+
+        Args:
+            field (str): Derived column, e.g. "Recommendation", "Score" or "Last Price".
+            values (dict): Ticker to value.
+
+        Returns:
+            int: Number of tickers whose stored value changed.
+        """
+        with self._lock:
+            changed = self.derived.update(field, values)
+            if field == "Recommendation":
+                self._state = _with_recommendations(self._state, values)
+            return changed
+
+    def derived_values(self, field: str) -> dict:
+        return self.derived.read(field)
+
+    def write_recommendations(self, recommendations) -> int:
+        """
+        Stores one recommendation per row in the sidecar store.
+
+        Args:
+            recommendations (array-like): Recommendation per row, in file order.
+
+        Returns:
+            int: Number of tickers whose recommendation changed.
+        """
+        return self.update_derived("Recommendation", dict(zip(self.tickers, recommendations)))
+
+    def export(self, path: str):
+        """
+        Writes the holdings and every derived column to a file in any supported format.
+
+        Args:
+            path (str): Destination; the format follows the extension (e.g. .xlsx to
+                refresh the user's workbook on request).
+        """
+        with self._lock:
+            backend_for(path).write(self.to_frame(derived=True))
+
+
+_portfolios = {}
+_registry_lock = threading.Lock()
+
+
+def get_portfolio(file_path: str) -> Portfolio:
+    """
+    Returns the shared Portfolio for a file, reloading it if the file changed.
+
+    Args:
+        file_path (str): Path to the Excel file containing stock data.
+
+    Returns:
+        Portfolio: The up-to-date portfolio.
+    """
+    key = os.path.abspath(file_path)
+    with _registry_lock:
+        portfolio = _portfolios.get(key)
+        if portfolio is None:
+            portfolio = _portfolios[key] = Portfolio(file_path)
+            return portfolio
+
+    portfolio.refresh()
+    return portfolio
+
+
+def clear_portfolios():
+    """Forgets every loaded portfolio so the next access re-reads its file."""
+    with _registry_lock:
+        _portfolios.clear()
@@ -1,39 +1,48 @@
-import pandas as pd
-from tools.stock_fetcher import get_stock_price
+import numpy as np
+from tools import tracing
+from tools.portfolio import get_portfolio
+from tools.stock_fetcher import get_stock_prices
 
-def calculate_portfolio_value(file_path: str) -> dict:
+@tracing.traced("calculate_portfolio_value")
+def calculate_portfolio_value(file_path: str, prices: dict = None) -> dict:
     """
     Reads stock tickers and quantities from an Excel file and calculates total portfolio value.
 
+    The holdings come from the shared in-memory Portfolio (the file is only re-read
+    when it changes), prices for every ticker are fetched in one batched request and
+    the position values are computed column-wise as price × quantity. Tickers that
+    could not be priced are left out of the result.
+
     Args:
         file_path (str): Path to the Excel file containing stock data.
+        prices (dict): Prices already fetched for many portfolios at once; only
+            tickers missing from it are requested.
 
     Returns:
         dict: A dictionary with individual stock values, quantities, and total portfolio value.
     """
     try:
-        df = pd.read_excel(file_path)
-        total_value = 0
-        stock_values = {}
-        quantities = {}  # Store quantities
-
-        for _, row in df.iterrows():
-            ticker = row["Ticker"]
-            quantity = row["Quantity"]
-            price = get_stock_price(ticker)
-
-            if price is not None:
-                stock_total = price * quantity
-                stock_values[ticker] = stock_total
-                quantities[ticker] = quantity  # Store quantity
-                total_value += stock_total
+        portfolio = get_portfolio(file_path)
+        tickers = portfolio.unique_tickers
+
+        if prices is None:
+            prices = get_stock_prices(tickers)
+        else:
+            missing = [ticker for ticker in tickers if ticker not in prices]
+            prices = {**prices, **(get_stock_prices(missing) if missing else {})}
+        quantities = portfolio.position_quantities()
+        values = portfolio.position_values(prices)
+
+        priced = ~np.isnan(values)
+        priced_tickers = np.asarray(tickers, dtype=object)[priced]
 
         return {
-            "stocks": stock_values,
-            "quantities": quantities,  # Return quantities
-            "total_value": round(total_value, 2)
+            "stocks": dict(zip(priced_tickers, values[priced].tolist())),
+            "quantities": dict(zip(priced_tickers, quantities[priced].tolist())),
+            "total_value": round(float(values[priced].sum()), 2)
         }
 
     except Exception as e:
         print(f"Error calculating portfolio value: {e}")
-        return None
\ No newline at end of file
+        tracing.record_error(e)
+        return None
@@ -0,0 +1,267 @@
+import re
+import threading
+import zlib
+from collections import OrderedDict
+import numpy as np
+from tools import tracing
+
+# Keyword rules: a query matching only one side is classified without the model or LLM.
+STOCK_PATTERNS = [
+    r"\bprice\b", r"\bquote\b", r"\bworth\b", r"\bvalue\b", r"\bportfolio\b", r"\bbuy\b",
+    r"\bhold\b", r"\brecommend", r"\bshares?\b", r"\bstocks?\b", r"\bticker\b", r"\bmarket\b",
+    r"\bdividend", r"\bperformance\b",
+]
+TAX_PATTERNS = [
+    r"\btax", r"\bira\b", r"\brmds?\b", r"\brequired minimum distribution", r"\bcapital gains?\b",
+    r"\bwithdraw", r"\bdeduct", r"\birs\b", r"\bharvest", r"\bfifo\b", r"\blifo\b", r"\bliabilit",
+    r"\bbracket\b", r"\broth\b", r"\b401\(?k\)?",
+]
+
+_STOCK_RE = re.compile("|".join(STOCK_PATTERNS), re.IGNORECASE)
+_TAX_RE = re.compile("|".join(TAX_PATTERNS), re.IGNORECASE)
+
+# Upper-case words that look like ticker symbols but are tax vocabulary.
+NON_TICKER_WORDS = {"I", "A", "IRA", "IRAS", "IRS", "RMD", "RMDS", "FIFO", "LIFO", "HIFO", "ROTH", "US", "USA", "OK"}
+
+_TICKER_RE = re.compile(r"\b[A-Z]{1,5}(?:\.[A-Z]{1,2})?\b")
+_CLAUSE_RE = re.compile(r"\band\b|\balso\b|[;?]", re.IGNORECASE)
+
+# Small labelled corpus used to train the default n-gram model.
+SEED_EXAMPLES = [
+    ("What is the current value of my portfolio?", "stock"),
+    ("Should I sell TSLA?", "stock"),
+    ("What is the price of INFY?", "stock"),
+    ("How much is AAPL trading at?", "stock"),
+    ("Which of my stocks should I buy more of?", "stock"),
+    ("Give me a recommendation for MSFT", "stock"),
+    ("How are my holdings doing today?", "stock"),
+    ("Is GOOGL a hold or a sell?", "stock"),
+    ("What is my biggest position?", "stock"),
+    ("How many shares of NVDA do I own?", "stock"),
+    ("Is the market going up?", "stock"),
+    ("Show me my best performing stock", "stock"),
+    ("How can I sell stocks with minimum tax impact?", "tax"),
+    ("What is my capital gains liability if I sell today?", "tax"),
+    ("How should I withdraw funds from my IRA efficiently?", "tax"),
+    ("When do I have to take required minimum distributions?", "tax"),
+    ("How much is my RMD this year?", "tax"),
+    ("Should I convert my traditional IRA to a Roth?", "tax"),
+    ("Can I harvest losses to offset gains?", "tax"),
+    ("What are the long-term capital gains rates?", "tax"),
+    ("Is FIFO or LIFO better for selling shares?", "tax"),
+    ("What tax bracket will my withdrawals put me in?", "tax"),
+    ("Do I owe the IRS on dividends?", "tax"),
+    ("How are short-term gains taxed?", "tax"),
+]
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cases a query and collapses whitespace so equivalent questions share a memo entry."""
+    return " ".join(query.lower().split())
+
+
+def _clause_label(clause: str):
+    """Labels a clause by keyword rules alone (ticker symbols count as stock), or None if unclear."""
+    tax_hit = bool(_TAX_RE.search(clause))
+    stock_hit = bool(_STOCK_RE.search(clause)) or any(
+        symbol not in NON_TICKER_WORDS for symbol in _TICKER_RE.findall(clause)
+    )
+    if tax_hit == stock_hit:
+        return None
+    return "tax" if tax_hit else "stock"
+
+
+def _is_mixed(query: str) -> bool:
+    """Whether the keyword rules put at least one clause of the query on each side."""
+    clauses = [clause for clause in _CLAUSE_RE.split(query) if clause.strip()]
+    return len(clauses) > 1 and {_clause_label(clause) for clause in clauses} >= {"stock", "tax"}
+
+
+class NgramModel:
+    def __init__(self, n_features: int = 2 ** 14, ngram_range: tuple = (3, 5)):
+        """
+        Initializes a logistic-regression classifier over hashed character n-grams.
+
+        Args:
+            n_features (int): Size of the hashed feature space.
+            ngram_range (tuple): Smallest and largest n-gram length.
+        """
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.weights = np.zeros(n_features)
+        self.bias = 0.0
+
+    def _features(self, text: str) -> tuple:
+        """Returns the L2-normalised hashed n-gram counts of a text as (indices, values)."""
+        padded = f" {normalize_query(text)} "
+        low, high = self.ngram_range
+        grams = [padded[i:i + n] for n in range(low, high + 1) for i in range(len(padded) - n + 1)]
+        if not grams:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        indices, counts = np.unique(
+            np.fromiter((zlib.crc32(gram.encode()) % self.n_features for gram in grams), dtype=np.int64),
+            return_counts=True,
+        )
+        values = counts / np.sqrt((counts ** 2).sum())
+        return indices, values
+
+    def predict_proba(self, text: str) -> float:
+        """Returns the probability that a text is a tax question."""
+        indices, values = self._features(text)
+        return float(1 / (1 + np.exp(-(self.weights[indices] @ values + self.bias))))
+
+    def fit(self, texts, labels, epochs: int = 200, learning_rate: float = 1.0, l2: float = 1e-4):
+        """
+        Trains the model with full-batch gradient descent.
+
+        Args:
+            texts (list[str]): Training queries.
+            labels (list[str]): "stock" or "tax" for each query.
+            epochs (int): Number of passes over the data.
+            learning_rate (float): Gradient descent step size.
+            l2 (float): L2 regularisation strength.
+
+        Returns:
+            NgramModel: self, for chaining.
+        """
+        X = np.zeros((len(texts), self.n_features))
+        for row, text in enumerate(texts):
+            indices, values = self._features(text)
+            X[row, indices] = values
+        y = np.array([1.0 if label == "tax" else 0.0 for label in labels])
+
+        for _ in range(epochs):
+            error = 1 / (1 + np.exp(-(X @ self.weights + self.bias))) - y
+            self.weights -= learning_rate * (X.T @ error / len(y) + l2 * self.weights)
+            self.bias -= learning_rate * error.mean()
+        return self
+
+    def save(self, path: str):
+        np.savez(path, weights=self.weights, bias=self.bias, ngram_range=self.ngram_range)
+
+    @classmethod
+    def load(cls, path: str) -> "NgramModel":
+        data = np.load(path)
+        model = cls(n_features=len(data["weights"]), ngram_range=tuple(int(n) for n in data["ngram_range"]))
+        model.weights = data["weights"]
+        model.bias = float(data["bias"])
+        return model
+
+
+class QueryClassifier:
+    def __init__(self, llm_classify=None, threshold: float = 0.8, model: NgramModel = None, memo_size: int = 1024):
+        """
+        Initializes a tiered stock/tax query classifier.
+
+        Queries are answered by the first confident tier: memoized result, keyword
+        rules, the n-gram model, then ``llm_classify`` as the slow fallback.
+
+        Args:
+            llm_classify (callable): Function mapping a query to "stock" or "tax",
+                used when the local tiers are not confident. Without it the model's
+                best guess is used.
+            threshold (float): Minimum model confidence to answer locally.
+            model (NgramModel): Trained model; defaults to one trained on SEED_EXAMPLES.
+            memo_size (int): Maximum number of memoized classifications.
+        """
+        self.llm_classify = llm_classify
+        self.threshold = threshold
+        self.model = model or NgramModel().fit(*zip(*SEED_EXAMPLES))
+        self.memo_size = memo_size
+        self.counters = {"memo": 0, "rules": 0, "model": 0, "llm": 0}
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def classify_local(self, query: str) -> tuple:
+        """
+        Classifies a query with the keyword rules and the n-gram model only.
+
+        Returns:
+            tuple: (label, confidence, tier) where tier is "rules" or "model".
+        """
+        stock_hit = bool(_STOCK_RE.search(query))
+        tax_hit = bool(_TAX_RE.search(query))
+        if tax_hit != stock_hit:
+            return ("tax" if tax_hit else "stock"), 1.0, "rules"
+
+        probability = self.model.predict_proba(query)
+        label = "tax" if probability >= 0.5 else "stock"
+        return label, max(probability, 1 - probability), "model"
+
+    def classify(self, query: str) -> str:
+        """
+        Classifies a query as "stock" or "tax" using the cheapest confident tier.
+
+        Args:
+            query (str): The user's question.
+
+        Returns:
+            str: "stock" or "tax".
+        """
+        key = normalize_query(query)
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.counters["memo"] += 1
+                tracing.count("classifier.memo")
+                return self._memo[key]
+
+        label, confidence, tier = self.classify_local(query)
+        if tier == "model" and confidence < self.threshold and self.llm_classify is not None:
+            label, tier = self.llm_classify(query), "llm"
+
+        with self._lock:
+            self.counters[tier] += 1
+            self._memo[key] = label
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        tracing.count(f"classifier.{tier}")
+        return label
+
+    def needs_llm(self, query: str) -> bool:
+        """
+        Reports whether routing this query would fall back to ``llm_classify``.
+
+        Lets callers start work that does not depend on the route (such as fetching
+        prices) before paying for the LLM round trip.
+
+        Args:
+            query (str): The user's question.
+
+        Returns:
+            bool: True when neither the memo, the keyword rules nor the model is confident.
+        """
+        if self.llm_classify is None or _is_mixed(query):
+            return False
+        with self._lock:
+            if normalize_query(query) in self._memo:
+                return False
+        _, confidence, tier = self.classify_local(query)
+        return tier == "model" and confidence < self.threshold
+
+    def route(self, query: str) -> str:
+        """
+        Like classify, but recognises questions that need both agents.
+
+        A query is "both" when it splits into clauses (on "and", "also", "?" or ";")
+        and the keyword rules put at least one clause on each side, e.g.
+        "Should I sell TSLA and what's the tax hit?".
+
+        Args:
+            query (str): The user's question.
+
+        Returns:
+            str: "stock", "tax" or "both".
+        """
+        if _is_mixed(query):
+            with self._lock:
+                self.counters["rules"] += 1
+            tracing.count("classifier.rules")
+            return "both"
+        return self.classify(query)
+
+    def stats(self) -> dict:
+        """Returns how many queries each tier answered."""
+        with self._lock:
+            return dict(self.counters)
@@ -0,0 +1,152 @@
+import random
+import sys
+import threading
+import time
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """Returns True if the exception looks like the upstream is rate limiting us."""
+    # Only yfinance itself can have raised its exception, so it need not be imported here
+    exceptions = sys.modules.get("yfinance.exceptions")
+    rate_limit_error = getattr(exceptions, "YFRateLimitError", None)
+    if rate_limit_error is not None and isinstance(error, rate_limit_error):
+        return True
+    message = str(error).lower()
+    return "429" in message or "too many requests" in message or "rate limit" in message
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Initializes a thread-safe token bucket.
+
+        Args:
+            rate (float): Tokens added per second, i.e. the sustained request rate.
+            capacity (float): Maximum burst size. Defaults to one second's worth of tokens.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        """
+        Initializes an AIMD concurrency limiter.
+
+        The limit is halved whenever a request is throttled and grows back by
+        one slot after each ``limit`` consecutive successes.
+
+        Args:
+            max_limit (int): Upper bound on concurrent requests.
+            min_limit (int): Lower bound on concurrent requests.
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self._active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Blocks until the number of in-flight requests is below the current limit."""
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self, throttled: bool = False):
+        """Frees a slot and adjusts the limit based on whether the request was throttled."""
+        with self._condition:
+            self._active -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+def retry_with_backoff(func, retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0, retry_on=None):
+    """
+    Calls ``func`` and retries it with full-jitter exponential backoff on failure.
+
+    Args:
+        func (callable): Zero-argument function to call.
+        retries (int): Number of retries after the first attempt.
+        base_delay (float): Delay scale in seconds for the first retry.
+        max_delay (float): Upper bound on any single delay.
+        retry_on (callable): Optional predicate deciding whether an exception is
+            worth retrying. By default every exception is retried.
+
+    Returns:
+        The return value of ``func``.
+
+    Raises:
+        Exception: The last exception raised by ``func`` once retries are exhausted,
+            or the first one ``retry_on`` rejects.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries or (retry_on is not None and not retry_on(e)):
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+class PerClientLimiter:
+    def __init__(self, max_concurrent: int):
+        """
+        Caps the number of requests each client may have in flight at once.
+
+        Args:
+            max_concurrent (int): In-flight requests allowed per client.
+        """
+        self.max_concurrent = max_concurrent
+        self._active = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def try_acquire(self, client: str) -> bool:
+        """Takes a slot for ``client`` without waiting; returns False if it is at its limit."""
+        with self._lock:
+            active = self._active.get(client, 0)
+            if active >= self.max_concurrent:
+                self.rejected += 1
+                return False
+            self._active[client] = active + 1
+            return True
+
+    def release(self, client: str):
+        """Frees a slot taken by try_acquire."""
+        with self._lock:
+            active = self._active.get(client, 0) - 1
+            if active > 0:
+                self._active[client] = active
+            else:
+                self._active.pop(client, None)
+
+    def active(self, client: str) -> int:
+        with self._lock:
+            return self._active.get(client, 0)
@@ -0,0 +1,350 @@
+import re
+from statistics import NormalDist
+import numpy as np
+from tools import tracing
+from tools.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+TRADING_DAYS = 252
+
+# Benchmark that betas are measured against.
+DEFAULT_BENCHMARK = "SPY"
+
+# Trailing window of daily history used for the risk figures.
+DEFAULT_LOOKBACK_DAYS = 365
+
+DEFAULT_CONFIDENCE_LEVELS = (0.95, 0.99)
+
+# Positions with fewer daily returns than this in the window are flagged in the summary.
+MIN_HISTORY_DAYS = 60
+
+# Questions matching this get the risk summary in their prompt.
+RISK_PATTERN = re.compile(
+    r"\brisk\w*|\bvolatil\w*|\bbeta\b|\bvar\b|value at risk|\bdrawdowns?\b|\bcorrelat\w*|\bdiversif\w*|"
+    r"\bconcentrat\w*|\bhedg\w*|\bcrash\w*|\bdownside\b|\bsafe\b",
+    re.IGNORECASE,
+)
+
+
+def returns_matrix(closes: np.ndarray) -> np.ndarray:
+    """
+    Daily simple returns of a dates × tickers close array.
+
+    A ticker that did not trade on a date (NaN close) gets a 0 return that day
+    and its next return is measured from its last known close. Returns before a
+    ticker's first close are NaN, as there is nothing to measure them from.
+    """
+    filled = pd.DataFrame(closes).ffill().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = filled[1:] / filled[:-1] - 1
+    started = np.isfinite(filled[:-1])
+    return np.where(started, np.where(np.isfinite(returns), returns, 0.0), np.nan)
+
+
+def max_drawdowns(returns: np.ndarray) -> tuple:
+    """
+    Maximum and current drawdown of each column of a returns array.
+
+    Returns:
+        tuple: (max drawdown, current drawdown) arrays, as negative fractions.
+    """
+    equity = np.cumprod(1 + returns, axis=0)
+    drawdown = equity / np.maximum.accumulate(np.maximum(equity, 1.0), axis=0) - 1
+    return drawdown.min(axis=0), drawdown[-1]
+
+
+class PortfolioRisk:
+    def __init__(self, tickers, values, closes, benchmark_closes=None, dates=None):
+        """
+        Risk analytics for a portfolio from aligned daily closes.
+
+        Everything is computed with whole-matrix NumPy operations on the
+        dates × positions returns matrix; nothing loops over tickers, and no
+        positions × positions matrix is built unless correlation() is asked for.
+
+        Positions whose history starts inside the window are measured over their
+        own observations only: per-position figures ignore the days before their
+        first bar, and on those days the portfolio return is that of the positions
+        already trading, reweighted.
+
+        Args:
+            tickers (Iterable[str]): Positions, one column of ``closes`` each.
+            values (Iterable[float]): Current value of each position.
+            closes (np.ndarray): Dates × positions closes, NaN where no bar exists.
+            benchmark_closes (np.ndarray): Benchmark closes on the same dates, for beta.
+            dates (pd.DatetimeIndex): Dates of the rows, reported in the summary.
+        """
+        self.tickers = list(tickers)
+        self.values = np.asarray(values, dtype=float)
+        self.total_value = float(self.values.sum())
+        if not self.total_value or len(closes) < 3:
+            raise ValueError("Risk analytics need a priced portfolio and at least three days of history.")
+        self.weights = self.values / self.total_value
+        returns = returns_matrix(np.asarray(closes, dtype=float))
+        benchmark = (
+            returns_matrix(np.asarray(benchmark_closes, dtype=float).reshape(-1, 1))[:, 0]
+            if benchmark_closes is not None and np.isfinite(benchmark_closes).sum() > 2 else None
+        )
+
+        # Start at the first day any position has a return
+        first = int(np.argmax(np.isfinite(returns).any(axis=1)))
+        if len(returns) - first < 2:
+            raise ValueError("Risk analytics need a priced portfolio and at least three days of history.")
+        self.dates = dates if dates is None else dates[first:]
+        self.observed = np.isfinite(returns[first:])
+        self.counts = self.observed.sum(axis=0)
+        self.returns = np.where(self.observed, returns[first:], 0.0)
+
+        invested = self.observed @ self.weights
+        self.portfolio_returns = self.returns @ self.weights / np.where(invested > 0, invested, 1.0)
+        self.benchmark_returns = None if benchmark is None else benchmark[first:]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = self.returns.sum(axis=0) / self.counts
+            self._centered = np.where(self.observed, self.returns - mean, 0.0)
+            self._std = np.sqrt(np.square(self._centered).sum(axis=0) / (self.counts - 1))
+
+    def volatility(self) -> tuple:
+        """Annualized volatility of (each position, the portfolio)."""
+        scale = np.sqrt(TRADING_DAYS)
+        return self._std * scale, float(self.portfolio_returns.std(ddof=1) * scale)
+
+    def risk_contributions(self) -> np.ndarray:
+        """Share of portfolio variance each position contributes (sums to 1)."""
+        portfolio = self.portfolio_returns - self.portfolio_returns.mean()
+        contributions = self.weights * (self._centered.T @ portfolio)
+        total = contributions.sum()
+        if not total:
+            return np.zeros(len(self.tickers))
+        return contributions / total
+
+    def betas(self) -> tuple:
+        """
+        Beta of (each position, the portfolio) against the benchmark, or (None, None) without one.
+
+        Each position's beta is measured over the days both it and the benchmark have returns.
+        """
+        if self.benchmark_returns is None:
+            return None, None
+        both = self.observed & np.isfinite(self.benchmark_returns)[:, None]
+        counts = both.sum(axis=0)
+        x = np.where(both, self.returns, 0.0)
+        y = np.where(both, np.nan_to_num(self.benchmark_returns)[:, None], 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_mean, y_mean = x.sum(axis=0) / counts, y.sum(axis=0) / counts
+            y_centered = np.where(both, y - y_mean, 0.0)
+            variance = np.square(y_centered).sum(axis=0)
+            betas = np.where(variance > 0, (np.where(both, x - x_mean, 0.0) * y_centered).sum(axis=0) / variance, np.nan)
+
+        days = np.isfinite(self.benchmark_returns)
+        benchmark = self.benchmark_returns[days] - self.benchmark_returns[days].mean()
+        variance = benchmark @ benchmark
+        if not variance:
+            return None, None
+        portfolio = self.portfolio_returns[days] - self.portfolio_returns[days].mean()
+        return betas, float(portfolio @ benchmark / variance)
+
+    def value_at_risk(self, confidence: float = 0.95) -> dict:
+        """
+        One-day historical and parametric (normal) VaR and CVaR of the portfolio.
+
+        Returns:
+            dict: Losses as positive fractions of the portfolio value:
+                "historical_var", "historical_cvar", "parametric_var", "parametric_cvar".
+        """
+        returns = self.portfolio_returns
+        cutoff = np.quantile(returns, 1 - confidence)
+        tail = returns[returns <= cutoff]
+
+        mean, std = returns.mean(), returns.std(ddof=1)
+        z = NormalDist().inv_cdf(1 - confidence)
+        return {
+            "historical_var": float(-cutoff),
+            "historical_cvar": float(-tail.mean()) if len(tail) else float(-cutoff),
+            "parametric_var": float(-(mean + z * std)),
+            "parametric_cvar": float(-(mean - std * NormalDist().pdf(z) / (1 - confidence))),
+        }
+
+    def average_correlation(self) -> float:
+        """
+        Weight-free average pairwise correlation between positions.
+
+        Uses the identity sum_ij corr_ij = |sum_i u_i|^2 on returns standardized
+        to unit length, so it needs no positions × positions matrix. Positions
+        with a shorter history are standardized over their own observations.
+        """
+        n = len(self.tickers)
+        if n < 2:
+            return None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            norms = np.sqrt(np.square(self._centered).sum(axis=0))
+            u = np.where(norms > 0, self._centered / norms, 0.0)
+        live = u.any(axis=0)
+        k = int(live.sum())
+        if k < 2:
+            return None
+        total = np.square(u.sum(axis=1)).sum()
+        return float((total - k) / (k * (k - 1)))
+
+    def correlation(self, tickers=None) -> "pd.DataFrame":
+        """
+        Correlation matrix of some or all positions, from a few matrix products.
+
+        Each pair is correlated over the days both positions have returns.
+
+        Args:
+            tickers (Iterable[str]): Positions to include; all of them by default.
+        """
+        columns = list(range(len(self.tickers))) if tickers is None else [self.tickers.index(t) for t in tickers]
+        x = self.returns[:, columns]
+        seen = self.observed[:, columns].astype(float)
+        counts = seen.T @ seen
+        sums = x.T @ seen  # sums[i, j]: returns of i on the days j also has one
+        squares = np.square(x).T @ seen
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = x.T @ x - sums * sums.T / counts
+            variance = squares - np.square(sums) / counts
+            matrix = covariance / np.sqrt(variance * variance.T)
+        matrix = np.where(np.isfinite(matrix), matrix, 0.0)
+        np.fill_diagonal(matrix, 1.0)
+        labels = [self.tickers[i] for i in columns]
+        return pd.DataFrame(matrix, index=labels, columns=labels)
+
+    def summary(self, top: int = 5, confidence_levels=DEFAULT_CONFIDENCE_LEVELS) -> dict:
+        """
+        Compact risk figures for the stock agent.
+
+        Args:
+            top (int): Number of largest positions and risk contributors listed.
+            confidence_levels (Iterable[float]): VaR/CVaR confidence levels.
+
+        Returns:
+            dict: Portfolio "volatility", "beta", "var" per confidence level (as
+                fractions and in currency), "max_drawdown", "current_drawdown",
+                "average_correlation", "top_risk_contributors", "positions" with
+                per-position weight, volatility, beta, max drawdown and days of
+                history for the largest holdings, "top_correlations" among them,
+                and "short_history": up to ``top`` positions with fewer than
+                MIN_HISTORY_DAYS returns, with their number of returns.
+        """
+        with tracing.span("risk.summary", positions=len(self.tickers)):
+            position_vol, portfolio_vol = self.volatility()
+            position_beta, portfolio_beta = self.betas()
+            contributions = self.risk_contributions()
+            position_dd, _ = max_drawdowns(self.returns)
+            (portfolio_dd,), (current_dd,) = max_drawdowns(self.portfolio_returns[:, None])
+
+            largest = np.argsort(-self.weights)[:top]
+            contributors = np.argsort(-contributions)[:top]
+            largest_tickers = [self.tickers[i] for i in largest]
+
+            pairs = []
+            if len(largest) > 1:
+                matrix = self.correlation(largest_tickers).to_numpy()
+                upper = np.triu_indices(len(largest), k=1)
+                order = np.argsort(-matrix[upper])[:top]
+                pairs = [(largest_tickers[upper[0][i]], largest_tickers[upper[1][i]], round(float(matrix[upper][i]), 2))
+                         for i in order]
+
+            var = {}
+            for level in confidence_levels:
+                figures = self.value_at_risk(level)
+                var[level] = {
+                    **{name: round(value, 4) for name, value in figures.items()},
+                    "historical_var_amount": round(figures["historical_var"] * self.total_value, 2),
+                    "historical_cvar_amount": round(figures["historical_cvar"] * self.total_value, 2),
+                }
+
+            average = self.average_correlation()
+            return {
+                "period": None if self.dates is None else f"{self.dates[0].date()} to {self.dates[-1].date()}",
+                "days": len(self.returns),
+                "positions_count": len(self.tickers),
+                "total_value": round(self.total_value, 2),
+                "volatility": round(portfolio_vol, 4),
+                "beta": None if portfolio_beta is None else round(portfolio_beta, 2),
+                "var": var,
+                "max_drawdown": round(float(portfolio_dd), 4),
+                "current_drawdown": round(float(current_dd), 4),
+                "average_correlation": None if average is None else round(average, 2),
+                "top_risk_contributors": [(self.tickers[i], round(float(contributions[i]), 3)) for i in contributors],
+                "positions": [
+                    {
+                        "ticker": self.tickers[i],
+                        "weight": round(float(self.weights[i]), 4),
+                        "volatility": _rounded(position_vol[i], 4),
+                        "beta": None if position_beta is None else _rounded(position_beta[i], 2),
+                        "max_drawdown": round(float(position_dd[i]), 4),
+                        "days": int(self.counts[i]),
+                    }
+                    for i in largest
+                ],
+                "top_correlations": pairs,
+                "short_history": [
+                    (self.tickers[i], int(self.counts[i])) for i in np.flatnonzero(self.counts < MIN_HISTORY_DAYS)
+                ][:top],
+            }
+
+
+def _rounded(value, digits: int):
+    """Rounds a figure, or returns None when there was too little history to compute it."""
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def portfolio_risk(history_store, portfolio_data: dict, benchmark: str = DEFAULT_BENCHMARK,
+                   lookback_days: int = DEFAULT_LOOKBACK_DAYS) -> PortfolioRisk:
+    """
+    Builds PortfolioRisk from locally stored history; no network requests are made.
+
+    Args:
+        history_store (HistoryStore): Local store of daily bars.
+        portfolio_data (dict): Result of calculate_portfolio_value.
+        benchmark (str): Ticker betas are measured against, if its history is stored.
+        lookback_days (int): Calendar days of history to use.
+
+    Returns:
+        PortfolioRisk: Analytics for the held positions that have stored history.
+    """
+    tickers = list(portfolio_data["stocks"])
+    start = pd.Timestamp.today().normalize() - pd.Timedelta(days=lookback_days)
+    dates, closes = history_store.aligned_closes(tickers + [benchmark], start=start)
+    has_history = np.isfinite(closes[:, :-1]).any(axis=0)
+
+    held = [ticker for ticker, ok in zip(tickers, has_history) if ok]
+    values = [portfolio_data["stocks"][ticker] for ticker in held]
+    return PortfolioRisk(held, values, closes[:, :-1][:, has_history], closes[:, -1], dates)
+
+
+def format_risk_summary(summary: dict) -> str:
+    """Renders a PortfolioRisk summary as a few lines of prompt context."""
+    def pct(value):
+        return "n/a" if value is None else f"{value:.1%}"
+
+    lines = [
+        f"Risk Summary ({summary['days']} trading days, {summary['period']}):",
+        f"Annualized Volatility: {pct(summary['volatility'])}",
+        f"Beta vs Benchmark: {'n/a' if summary['beta'] is None else summary['beta']}",
+    ]
+    for level, figures in summary["var"].items():
+        lines.append(
+            f"1-Day VaR {level:.0%}: {pct(figures['historical_var'])} (${figures['historical_var_amount']:,.2f}), "
+            f"CVaR {pct(figures['historical_cvar'])} (${figures['historical_cvar_amount']:,.2f}); "
+            f"parametric VaR {pct(figures['parametric_var'])}"
+        )
+    lines.append(f"Max Drawdown: {pct(summary['max_drawdown'])}, Current Drawdown: {pct(summary['current_drawdown'])}")
+    lines.append(f"Average Pairwise Correlation: {'n/a' if summary['average_correlation'] is None else summary['average_correlation']}")
+    lines.append("Largest Risk Contributors: " + ", ".join(f"{t} {share:.0%}" for t, share in summary["top_risk_contributors"]))
+    lines.append("Largest Positions: " + "; ".join(
+        f"{p['ticker']} weight {pct(p['weight'])}, vol {pct(p['volatility'])}"
+        + ("" if p["beta"] is None else f", beta {p['beta']}")
+        + f", max drawdown {pct(p['max_drawdown'])}"
+        for p in summary["positions"]
+    ))
+    if summary["top_correlations"]:
+        lines.append("Most Correlated Pairs: " + ", ".join(f"{a}/{b} {c}" for a, b, c in summary["top_correlations"]))
+    if summary["short_history"]:
+        lines.append("Short History (figures less reliable): " + ", ".join(
+            f"{ticker} {days} days" for ticker, days in summary["short_history"]
+        ))
+    return "\n".join(lines)
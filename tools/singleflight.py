@@ -0,0 +1,108 @@
+import asyncio
+from tools import tracing
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Coalesces concurrent calls that share a key into one execution.
+
+        While a call for a key is running, later callers with the same key wait
+        for its result instead of starting their own. Nothing is cached: once
+        the call finishes, the next caller starts a fresh one.
+        """
+        self._calls = {}
+        self.started = 0
+        self.shared = 0
+
+    async def do(self, key, func, *args):
+        """
+        Runs ``func(*args)`` unless a call for ``key`` is already in flight.
+
+        Args:
+            key: Hashable identity of the work (e.g. ("price", "AAPL")).
+            func (callable): Returns an awaitable, e.g. a coroutine function or
+                asyncio.to_thread with a blocking function as the first argument.
+            *args: Arguments for ``func``.
+
+        Returns:
+            The result of the (possibly shared) call. Exceptions are raised to every waiter.
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            tracing.count("singleflight.shared")
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(func(*args))
+        self._calls[key] = future
+        self.started += 1
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(future)
+
+    async def do_many(self, keys, func):
+        """
+        Like do for many keys, running one batched call for the keys not already in flight.
+
+        Keys another caller is already fetching are awaited; the rest are passed
+        together to a single ``func(missing)`` call, and each of them counts as
+        in flight until it returns, so later callers can share it.
+
+        Args:
+            keys (Iterable): Hashable identities of the work.
+            func (callable): Coroutine function taking the list of missing keys and
+                returning a dict of key to result; keys it leaves out get None.
+
+        Returns:
+            dict: Key to result. Exceptions are raised to every waiter.
+        """
+        waiting, missing = {}, []
+        for key in dict.fromkeys(keys):
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                tracing.count("singleflight.shared")
+                waiting[key] = future
+            else:
+                missing.append(key)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            for key, future in futures.items():
+                self._calls[key] = future
+                future.add_done_callback(lambda done, key=key: self._finish(key, done))
+            self.started += 1
+            batch = asyncio.ensure_future(func(missing))
+            batch.add_done_callback(lambda done: self._resolve(done, futures))
+            waiting.update(futures)
+
+        results = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()))
+        return dict(zip(waiting, results))
+
+    @staticmethod
+    def _resolve(batch, futures: dict):
+        """Hands the result of a do_many batch to the future of each of its keys."""
+        if batch.cancelled():
+            for future in futures.values():
+                future.cancel()
+        elif batch.exception() is not None:
+            for future in futures.values():
+                future.set_exception(batch.exception())
+        else:
+            results = batch.result() or {}
+            for key, future in futures.items():
+                future.set_result(results.get(key))
+
+    def _finish(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            future.exception()  # Marks the exception as retrieved when every waiter gave up
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {"started": self.started, "shared": self.shared, "in_flight": self.in_flight}
@@ -1,4 +1,12 @@
-import yfinance as yf
+from tools import tracing
+from tools.lazy import lazy_import
+from tools.market_cache import get_market_cache
+
+pd = lazy_import("pandas")
+yf = lazy_import("yfinance")
+
+# Maximum number of symbols sent to Yahoo Finance in a single download request.
+BATCH_SIZE = 100
 
 def get_stock_price(ticker: str) -> float:
     """
@@ -10,10 +18,69 @@ def get_stock_price(ticker: str) -> float:
     Returns:
         float: The current stock price.
     """
+    cache = get_market_cache()
+    cached = cache.get("quote", ticker)
+    if cached is not None:
+        return cached
+
     try:
+        tracing.count("network.yfinance")
         stock = yf.Ticker(ticker)
-        price = stock.history(period="1d")["Close"].iloc[-1]
-        return round(price, 2)
+        price = round(stock.history(period="1d")["Close"].iloc[-1], 2)
+        cache.set("quote", ticker, price)
+        return price
     except Exception as e:
         print(f"Error fetching price for {ticker}: {e}")
+        tracing.record_error(e)
         return None
+
+def get_stock_prices(tickers, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Fetches current prices for many ticker symbols using batched downloads.
+
+    Symbols are de-duplicated, served from the market data cache where
+    possible, and the rest downloaded in chunks of ``batch_size``. A symbol
+    that cannot be priced (or a chunk that fails entirely) maps to None
+    instead of aborting the whole batch.
+
+    Args:
+        tickers (Iterable[str]): The stock ticker symbols.
+        batch_size (int): Maximum number of symbols per download request.
+
+    Returns:
+        dict: A mapping of ticker to its current price, or None if it failed.
+    """
+    with tracing.span("get_stock_prices") as span:
+        cache = get_market_cache()
+        requested = list(dict.fromkeys(tickers))
+        cached = cache.get_many("quote", requested)
+        symbols = [ticker for ticker in requested if ticker not in cached]
+        span.set("tickers", len(requested))
+        prices = {}
+
+        for start in range(0, len(symbols), batch_size):
+            chunk = symbols[start:start + batch_size]
+            try:
+                tracing.count("network.yfinance")
+                data = yf.download(chunk, period="1d", auto_adjust=True, progress=False, threads=True)
+                closes = data["Close"]
+                if isinstance(closes, pd.Series):
+                    closes = closes.to_frame(name=chunk[0])
+                last = closes.ffill().iloc[-1] if not closes.empty else pd.Series(dtype=float)
+            except Exception as e:
+                print(f"Error fetching prices for {', '.join(chunk)}: {e}")
+                tracing.record_error(e)
+                last = pd.Series(dtype=float)
+
+            for ticker in chunk:
+                price = last.get(ticker)
+                prices[ticker] = round(float(price), 2) if price is not None and pd.notna(price) else None
+            cache.set_many("quote", {ticker: prices[ticker] for ticker in chunk})
+
+        failed = [ticker for ticker, price in prices.items() if price is None]
+        if failed:
+            print(f"Error fetching prices for: {', '.join(failed)}")
+            span.set("failed", len(failed))
+
+        prices.update(cached)
+        return {ticker: prices[ticker] for ticker in requested}
@@ -1,93 +1,293 @@
-import yfinance as yf
-import pandas as pd
+import operator
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from tools import tracing
+from tools.history_store import price_trend
+from tools.lazy import lazy_import
+from tools.market_cache import get_market_cache
+from tools.portfolio import get_portfolio
+from tools.rate_limiter import AdaptiveConcurrency, TokenBucket, is_throttle_error, retry_with_backoff
+
+pd = lazy_import("pandas")
+yf = lazy_import("yfinance")
+
+# Scoring rules per metric. Bands are checked in order and the first threshold the
+# value passes (using "op") awards its points; otherwise "default" is awarded.
+# "when" restricts the rule to positive or non-zero values; other values score 0.
+SCORING_RULES = {
+    "Upside": {"op": ">", "bands": [(0.3, 6), (0.2, 5), (0.1, 3), (0.05, 2)], "default": 0, "when": None},
+    "Price-to-Book": {"op": "<", "bands": [(1, 5), (2, 4), (3, 2)], "default": -1, "when": "positive"},
+    "Return on Equity": {"op": ">", "bands": [(0.2, 5), (0.15, 4), (0.1, 3)], "default": -1, "when": "positive"},
+    "Debt-to-Equity": {"op": "<", "bands": [(1, 3), (1.5, 2), (2.5, 1)], "default": -2, "when": None},
+    "Price Trend": {"op": ">", "bands": [(0.03, 4), (-0.01, 2)], "default": -2, "when": "nonzero"},
+}
+
+# Minimum score for each recommendation, checked in order; anything lower is "Sell".
+RECOMMENDATION_BANDS = [(8, "Buy"), (5, "Hold")]
+DEFAULT_RECOMMENDATION = "Sell"
+
+_OPERATORS = {">": operator.gt, "<": operator.lt}
+
+
+# Fetched fields that determine a stock's score; used to detect changed inputs.
+SCORE_INPUTS = (
+    "Current Price", "Target Mean Price", "Price-to-Book", "Return on Equity",
+    "Debt-to-Equity", "Price Trend", "error",
+)
+
+
+def _input_key(data: dict) -> tuple:
+    """Hashable snapshot of the scoring inputs of one stock, with NaN normalised to None."""
+    return tuple(None if pd.isna(data.get(field)) else data.get(field) for field in SCORE_INPUTS)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Network failures and throttling are worth retrying; bad data is not."""
+    return is_throttle_error(error) or isinstance(error, OSError)
+
+
+def score_metrics(current: np.ndarray, target: np.ndarray, metrics: dict) -> np.ndarray:
+    """
+    Applies SCORING_RULES element-wise to arrays of any shape.
+
+    Used by StockRecommender.score_frame for one row per stock and by the
+    backtester for a whole dates × tickers panel at once.
+
+    Args:
+        current (np.ndarray): Current prices.
+        target (np.ndarray): Target mean prices, same shape.
+        metrics (dict): "Price-to-Book", "Return on Equity", "Debt-to-Equity" and
+            "Price Trend" arrays, same shape.
+
+    Returns:
+        np.ndarray: Integer scores (not yet zeroed for missing prices).
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        upside = np.where((target > 0) & (current > 0), (target - current) / current, 0.0)
+    metrics = {"Upside": upside, **metrics}
+
+    scores = np.zeros(np.shape(current), dtype=int)
+    with np.errstate(invalid="ignore"):
+        for metric, rule in SCORING_RULES.items():
+            values = metrics[metric]
+            compare = _OPERATORS[rule["op"]]
+            points = np.select(
+                [compare(values, threshold) for threshold, _ in rule["bands"]],
+                [points for _, points in rule["bands"]],
+                default=rule["default"],
+            )
+
+            if rule["when"] == "positive":
+                points = np.where(values > 0, points, 0)
+            elif rule["when"] == "nonzero":
+                points = np.where(values != 0, points, 0)
+
+            scores += points
+    return scores
+
+
+def label_scores(scores: np.ndarray) -> np.ndarray:
+    """Maps an array of scores to Buy/Hold/Sell labels using RECOMMENDATION_BANDS."""
+    return np.select(
+        [scores >= minimum for minimum, _ in RECOMMENDATION_BANDS],
+        [label for _, label in RECOMMENDATION_BANDS],
+        default=DEFAULT_RECOMMENDATION,
+    ).astype(object)
 
 class StockRecommender:
-    def fetch_stock_data(self, ticker: str):
-        """Fetches stock data using Yahoo Finance."""
-        stock = yf.Ticker(ticker)
+    def __init__(self, cache=None, max_workers: int = 8, requests_per_second: float = 10.0, retries: int = 3,
+                 history_store=None):
+        """
+        Initializes the StockRecommender.
 
+        Args:
+            cache (MarketDataCache): Cache for fundamentals and price history.
+                Defaults to the process-wide market data cache.
+            max_workers (int): Maximum number of tickers fetched concurrently.
+            requests_per_second (float): Sustained rate of Yahoo Finance requests.
+            retries (int): Retries per ticker for network errors and throttling.
+            history_store (HistoryStore): Local OHLCV store used for the price trend.
+                When set, only bars missing since the last stored date are downloaded;
+                otherwise six months of history are fetched through the cache.
+        """
+        self._cache = cache
+        self.max_workers = max_workers
+        self.requests_per_second = requests_per_second
+        self.retries = retries
+        self.history_store = history_store
+        self.last_rescored = []
+        self.last_prices = {}
+        self._scored = {}  # Ticker -> (input key, score, recommendation) from incremental runs
+
+    @property
+    def cache(self):
+        return self._cache if self._cache is not None else get_market_cache()
+
+    def fetch_stock_data(self, ticker: str):
+        """Fetches stock data using Yahoo Finance, reading through the market data cache."""
         try:
-            info = stock.info
-            history = stock.history(period="6mo")
-
-            total_debt = info.get("totalDebt", 0) or 0
-            total_equity = info.get("totalStockholderEquity", 1) or 1  # Avoid division by zero
-            debt_to_equity = total_debt / total_equity if total_equity else 0
-
-            return {
-                "Ticker": ticker,
-                "Current Price": info.get("currentPrice", 0),
-                "Target Mean Price": info.get("targetMeanPrice", 0),
-                "Price-to-Book": info.get("priceToBook", 0),
-                "Return on Equity": info.get("returnOnEquity", 0),
-                "Debt-to-Equity": debt_to_equity,
-                "Price Trend": history["Close"].pct_change().mean() if not history.empty else 0
-            }
+            return self._fetch_stock_data(ticker)
         except Exception as e:
             return {"Ticker": ticker, "error": f"Failed to fetch data: {str(e)}"}
 
+    def _fetch_stock_data(self, ticker: str, throttle=None):
+        """Like fetch_stock_data but raises on failure; ``throttle`` is called before each network request."""
+        stock = yf.Ticker(ticker)
+
+        def request(fetch):
+            if throttle is not None:
+                throttle()
+            tracing.count("network.yfinance")
+            return fetch()
+
+        info = self.cache.get_or_fetch("fundamentals", ticker, lambda: request(lambda: stock.info))
+
+        if self.history_store is not None:
+            self.history_store.update(ticker, throttle=throttle)
+            trend = price_trend(self.history_store.closes(ticker, months=6))
+        else:
+            history = self.cache.get_or_fetch(
+                "history", (ticker, "6mo"), lambda: request(lambda: stock.history(period="6mo"))
+            )
+            trend = history["Close"].pct_change().mean() if not history.empty else 0
+
+        total_debt = info.get("totalDebt", 0) or 0
+        total_equity = info.get("totalStockholderEquity", 1) or 1  # Avoid division by zero
+        debt_to_equity = total_debt / total_equity if total_equity else 0
+
+        return {
+            "Ticker": ticker,
+            "Current Price": info.get("currentPrice", 0),
+            "Target Mean Price": info.get("targetMeanPrice", 0),
+            "Price-to-Book": info.get("priceToBook", 0),
+            "Return on Equity": info.get("returnOnEquity", 0),
+            "Debt-to-Equity": debt_to_equity,
+            "Price Trend": trend
+        }
+
+    def fetch_many(self, tickers):
+        """
+        Fetches stock data for many tickers concurrently.
+
+        Requests go through a bounded worker pool and a shared token bucket.
+        Network errors and throttling are retried with jittered backoff, and
+        the number of in-flight tickers is halved whenever Yahoo Finance starts
+        throttling. A ticker that still fails yields an error dict, exactly like
+        fetch_stock_data, without aborting the others.
+
+        Args:
+            tickers (Iterable[str]): The stock ticker symbols.
+
+        Returns:
+            list: One stock data dict per ticker, in input order.
+        """
+        tickers = list(tickers)
+        bucket = TokenBucket(self.requests_per_second)
+        concurrency = AdaptiveConcurrency(self.max_workers)
+
+        def attempt(ticker):
+            concurrency.acquire()
+            throttled = False
+            try:
+                return self._fetch_stock_data(ticker, throttle=bucket.acquire)
+            except Exception as e:
+                throttled = is_throttle_error(e)
+                raise
+            finally:
+                concurrency.release(throttled)
+
+        def fetch(ticker):
+            try:
+                return retry_with_backoff(lambda: attempt(ticker), retries=self.retries, retry_on=_is_retryable)
+            except Exception as e:
+                tracing.count("recommender.fetch_errors")
+                return {"Ticker": ticker, "error": f"Failed to fetch data: {str(e)}"}
+
+        with tracing.span("recommender.fetch", tickers=len(tickers)):
+            if self.max_workers <= 1 or len(tickers) <= 1:
+                return [fetch(ticker) for ticker in tickers]
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                return list(pool.map(tracing.bind(fetch), tickers))
+
     def score_stock(self, data):
         """Assigns a score based on financial metrics."""
         if "error" in data or not data.get("Current Price"):
             return 0  # No score if data is missing
 
+        metrics = {
+            "Upside": self._upside(data["Current Price"], data["Target Mean Price"]),
+            "Price-to-Book": data["Price-to-Book"],
+            "Return on Equity": data["Return on Equity"],
+            "Debt-to-Equity": data["Debt-to-Equity"],
+            "Price Trend": data["Price Trend"],
+        }
+
         score = 0
+        for metric, rule in SCORING_RULES.items():
+            value = metrics[metric]
+            if rule["when"] == "positive" and not value > 0:
+                continue
+            if rule["when"] == "nonzero" and not value:
+                continue
 
-        # ✅ Price vs Target Price (Upside Potential)
-        if data["Target Mean Price"] > 0 and data["Current Price"] > 0:
-            upside = (data["Target Mean Price"] - data["Current Price"]) / data["Current Price"]
-            if upside > 0.3:
-                score += 6
-            elif upside > 0.2:
-                score += 5
-            elif upside > 0.1:
-                score += 3
-            elif upside > 0.05:
-                score += 2
-
-        # ✅ Price-to-Book Ratio (P/B)
-        if data["Price-to-Book"] > 0:
-            if data["Price-to-Book"] < 1:
-                score += 5
-            elif data["Price-to-Book"] < 2:
-                score += 4
-            elif data["Price-to-Book"] < 3:
-                score += 2
-            else:
-                score -= 1
-
-        # ✅ Return on Equity (ROE)
-        if data["Return on Equity"] > 0:
-            if data["Return on Equity"] > 0.2:
-                score += 5
-            elif data["Return on Equity"] > 0.15:
-                score += 4
-            elif data["Return on Equity"] > 0.1:
-                score += 3
-            else:
-                score -= 1
-
-        # ✅ Debt-to-Equity Ratio
-        if data["Debt-to-Equity"] < 1:
-            score += 3
-        elif data["Debt-to-Equity"] < 1.5:
-            score += 2
-        elif data["Debt-to-Equity"] < 2.5:
-            score += 1
-        else:
-            score -= 2
-
-        # ✅ Historical Price Trend
-        if data["Price Trend"]:
-            if data["Price Trend"] > 0.03:
-                score += 4
-            elif data["Price Trend"] > -0.01:
-                score += 2
-            else:
-                score -= 2
+            compare = _OPERATORS[rule["op"]]
+            score += next((points for threshold, points in rule["bands"] if compare(value, threshold)), rule["default"])
 
         return score
 
+    @staticmethod
+    def _upside(current_price, target_price):
+        """Upside potential to the target price, or 0 when either price is missing."""
+        if target_price > 0 and current_price > 0:
+            return (target_price - current_price) / current_price
+        return 0
+
+    @staticmethod
+    def recommendation_for_score(score):
+        """Maps a score to Buy/Hold/Sell using RECOMMENDATION_BANDS."""
+        return next((label for minimum, label in RECOMMENDATION_BANDS if score >= minimum), DEFAULT_RECOMMENDATION)
+
+    @tracing.traced("recommender.score")
+    def score_frame(self, df):
+        """
+        Scores many stocks at once from a columnar table of fundamentals.
+
+        Produces the same scores and labels as score_stock/recommend_stock, but
+        evaluates SCORING_RULES over whole columns with NumPy instead of per row.
+
+        Args:
+            df (pd.DataFrame): One row per stock with the columns returned by
+                fetch_stock_data ("Current Price", "Target Mean Price",
+                "Price-to-Book", "Return on Equity", "Debt-to-Equity",
+                "Price Trend") and optionally "error".
+
+        Returns:
+            pd.DataFrame: "Score" and "Recommendation" columns aligned with df's index.
+        """
+        def column(name):
+            if name not in df.columns:
+                return np.full(len(df), np.nan)
+            return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)
+
+        current = column("Current Price")
+        scores = score_metrics(current, column("Target Mean Price"), {
+            "Price-to-Book": column("Price-to-Book"),
+            "Return on Equity": column("Return on Equity"),
+            "Debt-to-Equity": column("Debt-to-Equity"),
+            "Price Trend": column("Price Trend"),
+        })
+
+        errors = df["error"] if "error" in df.columns else pd.Series(np.nan, index=df.index)
+        invalid = errors.notna().to_numpy() | (current == 0) | np.isnan(current)
+        scores = np.where(invalid, 0, scores)
+
+        labels = label_scores(scores)
+        has_error = errors.notna().to_numpy()
+        labels[has_error] = ("Error: " + errors[has_error].astype(str)).to_numpy()
+
+        return pd.DataFrame({"Score": scores, "Recommendation": labels}, index=df.index)
+
     def recommend_stock(self, ticker):
         """Fetches stock data and provides a Buy/Hold/Sell recommendation."""
         stock_data = self.fetch_stock_data(ticker)
@@ -97,29 +297,80 @@ class StockRecommender:
 
         score = self.score_stock(stock_data)
 
-        if score >= 12:
-            recommendation = "Buy"
-        elif score >= 8:
-            recommendation = "Buy"
-        elif score >= 5:
-            recommendation = "Hold"
-        else:
-            recommendation = "Sell"
+        return {"Ticker": ticker, "Recommendation": self.recommendation_for_score(score)}
+
+    def recommend_stocks(self, tickers, incremental: bool = False):
+        """
+        Fetches stock data for many tickers and scores them in one vectorized pass.
+
+        Args:
+            tickers (Iterable[str]): The stock ticker symbols.
+            incremental (bool): Re-score only the tickers whose fetched inputs differ
+                from the previous incremental run and reuse earlier results for the rest.
+                The tickers that were re-scored are left in ``last_rescored``.
+                The current prices fetched on the way are left in ``last_prices``.
+
+        Returns:
+            pd.DataFrame: "Ticker", "Score" and "Recommendation" columns, one row per ticker.
+        """
+        tickers = list(tickers)
+        data = pd.DataFrame(self.fetch_many(tickers), index=range(len(tickers)))
+        current = pd.to_numeric(data["Current Price"], errors="coerce") if "Current Price" in data.columns else None
+        self.last_prices = {} if current is None else {
+            ticker: float(price) for ticker, price in zip(tickers, current) if price > 0
+        }
 
-        return {"Ticker": ticker, "Recommendation": recommendation}
+        if not incremental:
+            result = self.score_frame(data)
+            result.insert(0, "Ticker", tickers)
+            self.last_rescored = tickers
+            return result
 
+        keys = [_input_key(row) for row in data.to_dict("records")]
+        changed = [i for i, ticker in enumerate(tickers) if self._scored.get(ticker, (None,))[0] != keys[i]]
+
+        scored = self.score_frame(data.loc[changed])
+        for i, score, recommendation in zip(changed, scored["Score"], scored["Recommendation"]):
+            self._scored[tickers[i]] = (keys[i], int(score), recommendation)
+
+        self.last_rescored = [tickers[i] for i in changed]
+        return pd.DataFrame(
+            [(ticker, *self._scored[ticker][1:]) for ticker in tickers],
+            columns=["Ticker", "Score", "Recommendation"],
+        )
+
+    @tracing.traced("update_recommendations")
     def update_excel_with_recommendations(self, file_path):
-        """Reads stock tickers from the Excel file, fetches recommendations, and updates the sheet."""
+        """
+        Reads stock tickers from the portfolio file, fetches recommendations, and stores them.
+
+        Holdings come from the shared in-memory Portfolio. Only tickers whose inputs
+        changed since the previous call are re-scored, and only changed recommendations,
+        scores and last prices are written, to the portfolio's sidecar store; the holdings
+        file itself is never rewritten (use Portfolio.export for an updated workbook).
+
+        Returns:
+            dict: Ticker to recommendation, or None if the update failed.
+        """
         try:
-            df = pd.read_excel(file_path)
-            if "Ticker" not in df.columns or "Quantity" not in df.columns:
-                raise ValueError("Excel file must contain 'Ticker' and 'Quantity' columns.")
+            portfolio = get_portfolio(file_path)
+
+            # Get recommendations for every stock in one scoring pass
+            scored = self.recommend_stocks(portfolio.unique_tickers, incremental=True)
+            by_ticker = dict(zip(scored["Ticker"], scored["Recommendation"]))
 
-            # Get recommendations for each stock
-            df["Recommendation"] = df["Ticker"].apply(lambda ticker: self.recommend_stock(ticker)["Recommendation"])
+            previous = portfolio.recommendation_map()
+            portfolio.update_derived("Recommendation", by_ticker)
+            portfolio.update_derived("Score", dict(zip(scored["Ticker"], scored["Score"])))
+            portfolio.update_derived("Last Price", self.last_prices)
+
+            if previous == by_ticker:
+                print(f"\n Stock recommendations in {file_path} are up to date")
+            else:
+                print(f"\n Stock recommendations updated for {file_path}")
 
-            # Save back to Excel
-            df.to_excel(file_path, index=False)
-            print(f"\n Stock recommendations updated in {file_path}")
+            return by_ticker
         except Exception as e:
             print(f"\n Error updating Excel: {e}")
+            tracing.record_error(e)
+            return None
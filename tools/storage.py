@@ -0,0 +1,254 @@
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from tools.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pq = None
+
+# Rows read per chunk from formats that support incremental reads.
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def file_signature(path: str) -> tuple:
+    """Modification time and size of a file; changes whenever the file is rewritten."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class StorageBackend:
+    """Base class for holdings stores. Subclasses implement ``read_chunks`` and ``write``."""
+
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+
+    def read_chunks(self):
+        """Yields the stored rows as DataFrames of at most ``chunk_size`` rows."""
+        raise NotImplementedError
+
+    def write(self, df: "pd.DataFrame"):
+        """Replaces the stored rows with ``df``."""
+        raise NotImplementedError
+
+    def read(self) -> "pd.DataFrame":
+        chunks = list(self.read_chunks())
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+    def read_columns(self) -> dict:
+        """
+        Reads every row into one NumPy array per column, a chunk at a time.
+
+        Only the column arrays are kept between chunks, so peak memory stays close
+        to the size of the final columns rather than a whole parsed DataFrame.
+
+        Returns:
+            dict: Column name to NumPy array.
+        """
+        parts = {}
+        for chunk in self.read_chunks():
+            for name in chunk.columns:
+                parts.setdefault(name, []).append(chunk[name].to_numpy())
+        return {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+
+class ExcelBackend(StorageBackend):
+    """The user's workbook. Excel cannot be read incrementally, so it is parsed in one go."""
+
+    def read_chunks(self):
+        yield pd.read_excel(self.path)
+
+    def write(self, df: "pd.DataFrame"):
+        df.to_excel(self.path, index=False)
+
+
+class CsvBackend(StorageBackend):
+    def read_chunks(self):
+        yield from pd.read_csv(self.path, chunksize=self.chunk_size)
+
+    def write(self, df: "pd.DataFrame"):
+        df.to_csv(self.path, index=False)
+
+
+class ParquetBackend(StorageBackend):
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if pq is None:
+            raise ImportError("Parquet support requires pyarrow (pip install pyarrow).")
+        super().__init__(path, chunk_size)
+
+    def read_chunks(self):
+        for batch in pq.ParquetFile(self.path).iter_batches(batch_size=self.chunk_size):
+            yield batch.to_pandas()
+
+    def write(self, df: "pd.DataFrame"):
+        df.to_parquet(self.path, index=False)
+
+
+class SqliteBackend(StorageBackend):
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, table: str = "holdings"):
+        super().__init__(path, chunk_size)
+        self.table = table
+
+    def read_chunks(self):
+        with contextlib.closing(sqlite3.connect(self.path)) as db:
+            yield from pd.read_sql_query(f'SELECT * FROM "{self.table}"', db, chunksize=self.chunk_size)
+
+    def write(self, df: "pd.DataFrame"):
+        with contextlib.closing(sqlite3.connect(self.path)) as db:
+            df.to_sql(self.table, db, if_exists="replace", index=False)
+
+
+BACKENDS = {
+    ".xlsx": ExcelBackend,
+    ".xlsm": ExcelBackend,
+    ".xls": ExcelBackend,
+    ".csv": CsvBackend,
+    ".parquet": ParquetBackend,
+    ".pq": ParquetBackend,
+    ".db": SqliteBackend,
+    ".sqlite": SqliteBackend,
+    ".sqlite3": SqliteBackend,
+}
+
+
+def backend_for(path: str, **kwargs) -> StorageBackend:
+    """
+    Picks the storage backend for a holdings file from its extension.
+
+    Args:
+        path (str): Holdings file (.xlsx, .csv, .parquet or .db/.sqlite).
+        **kwargs: Passed to the backend, e.g. ``chunk_size``.
+
+    Returns:
+        StorageBackend: The backend for the file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in BACKENDS:
+        raise ValueError(f"Unsupported portfolio file type '{extension}'; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[extension](path, **kwargs)
+
+
+def derived_store_path(file_path: str) -> str:
+    """
+    Location of the sidecar store for a holdings file.
+
+    The sidecar sits next to the file (``portfolio.xlsx`` -> ``portfolio.derived.sqlite``)
+    unless DERIVED_STORE_DIR is set, in which case it goes there under a name that
+    also encodes the file's full path.
+    """
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    directory = os.getenv("DERIVED_STORE_DIR")
+    if not directory:
+        return os.path.join(os.path.dirname(file_path), f"{stem}.derived.sqlite")
+    digest = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:8]
+    return os.path.join(directory, f"{stem}-{digest}.derived.sqlite")
+
+
+def _plain(value):
+    """Converts NumPy scalars to Python values and NaN to None so SQLite can store them."""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class DerivedStore:
+    def __init__(self, path: str):
+        """
+        Initializes an SQLite sidecar for values computed from the holdings.
+
+        Recommendations, scores and last prices are stored per ticker and field, so
+        a refresh only writes the values that changed and never touches the user's
+        holdings file. The database is created on the first write.
+
+        Args:
+            path (str): SQLite file of the sidecar.
+        """
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self, create: bool):
+        if self._db is None:
+            if not create and not os.path.exists(self.path):
+                return None
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS derived ("
+                "ticker TEXT, field TEXT, value, updated_at REAL, PRIMARY KEY (ticker, field))"
+            )
+            self._db.commit()
+        return self._db
+
+    def read(self, field: str) -> dict:
+        """Returns ticker to value for one field, or an empty dict if nothing is stored."""
+        with self._lock:
+            db = self._connect(create=False)
+            if db is None:
+                return {}
+            return dict(db.execute("SELECT ticker, value FROM derived WHERE field = ?", (field,)).fetchall())
+
+    def update(self, field: str, values: dict) -> int:
+        """
+        Stores the values of one field that differ from what is already stored.
+
+        Args:
+            field (str): Derived column, e.g. "Recommendation".
+            values (dict): Ticker to value.
+
+        Returns:
+            int: Number of tickers whose value changed.
+        """
+        existing = self.read(field)
+        now = time.time()
+        changed = []
+        for ticker, value in values.items():
+            ticker, value = str(ticker), _plain(value)
+            if ticker not in existing or existing[ticker] != value:
+                changed.append((ticker, field, value, now))
+        if not changed:
+            return 0
+
+        with self._lock:
+            db = self._connect(create=True)
+            db.executemany("INSERT OR REPLACE INTO derived (ticker, field, value, updated_at) VALUES (?, ?, ?, ?)", changed)
+            db.commit()
+        return len(changed)
+
+    def fields(self) -> list:
+        with self._lock:
+            db = self._connect(create=False)
+            if db is None:
+                return []
+            return [row[0] for row in db.execute("SELECT DISTINCT field FROM derived ORDER BY field")]
+
+    def updated_at(self, field: str):
+        """Time of the last change to a field, or None if it has never been written."""
+        with self._lock:
+            db = self._connect(create=False)
+            if db is None:
+                return None
+            row = db.execute("SELECT MAX(updated_at) FROM derived WHERE field = ?", (field,)).fetchone()
+            return datetime.fromtimestamp(row[0]) if row[0] is not None else None
+
+    def clear(self):
+        with self._lock:
+            db = self._connect(create=False)
+            if db is not None:
+                db.execute("DELETE FROM derived")
+                db.commit()
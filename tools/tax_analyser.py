@@ -1,7 +1,58 @@
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage
+from tools.llm_cache import get_llm_cache, snapshot_hash
+from tools.llm_clients import SharedClient, human_message
+from tools.tax_lots import TaxLots, is_long_term_holding
+
+
+def _term(holding_period, as_of=None) -> str:
+    """Long- or short-term label for a holding period in months, by the lot engine's rule."""
+    try:
+        return "long-term" if is_long_term_holding(holding_period, as_of) else "short-term"
+    except (TypeError, ValueError):
+        return "holding period unknown"
+
+
+def format_lot_figures(comparison: dict, unrealized: dict) -> str:
+    """
+    Renders lot-engine results as the plain-text block handed to the LLM.
+
+    Args:
+        comparison (dict): Method name to TaxLots.realize result.
+        unrealized (dict): TaxLots.unrealized result.
+
+    Returns:
+        str: One line per relief method, or a single line when every method sells
+            the same lots (e.g. whole positions), followed by open losses available to harvest.
+    """
+    def figures(r):
+        return (f"proceeds {r['proceeds']:.2f} | short-term gain {r['short_term_gain']:.2f} | "
+                f"long-term gain {r['long_term_gain']:.2f} | estimated tax {r['estimated_tax']:.2f}")
+
+    lines = {method: figures(r) for method, r in comparison.items()}
+    if len(set(lines.values())) == 1:
+        lines = [f"Every relief method sells the same lots: {next(iter(lines.values()))}"]
+    else:
+        best = min(comparison, key=lambda method: comparison[method]["estimated_tax"])
+        lines = [f"{method}: {line}" for method, line in lines.items()] + [f"Lowest estimated tax: {best}"]
+
+    losses = [
+        f"{ticker}: short-term {r['short_term_gain']:.2f}, long-term {r['long_term_gain']:.2f}"
+        for ticker, r in unrealized.items()
+        if r["short_term_gain"] < 0 or r["long_term_gain"] < 0
+    ]
+    lines.append("Unrealized losses available to harvest:\n" + ("\n".join(losses) if losses else "none"))
+    return "\n".join(lines)
+
+def _unpriced_note(tickers: list) -> str:
+    """Prompt line naming positions left out of the figures because their share count is unknown."""
+    if not tickers:
+        return ""
+    return f"\n            No figures for {', '.join(tickers)}: the number of shares held is unknown.\n"
+
 
 class TaxAnalyser:
+    # Same options as the agents' model, so all three share one ChatOpenAI
+    llm = SharedClient("chat", stream_usage=True)
+
     def __init__(self, api_key: str):
         """
         Initializes the TaxAnalyser tool.
@@ -9,15 +60,27 @@ class TaxAnalyser:
         Args:
             api_key (str): OpenAI API key for tax analysis.
         """
-        self.llm = ChatOpenAI(model="gpt-4", openai_api_key=api_key)
+        self.api_key = api_key
 
-    def analyse_selling_strategy(self, recommendations: dict, stock_data: dict) -> str:
+    def analyse_selling_strategy(self, recommendations: dict, stock_data: dict, lots: TaxLots = None,
+                                 prices: dict = None, as_of=None, sells: dict = None, quantities: dict = None) -> str:
         """
         Analyzes the most tax-efficient way to sell stocks.
 
+        Realized gains, their term and the estimated tax under FIFO, LIFO and HIFO
+        relief are computed locally by the tax-lot engine whenever sale prices are
+        known; the LLM only explains those figures.
+
         Args:
             recommendations (dict): Stock recommendations with buy/hold/sell statuses.
-            stock_data (dict): Contains stock tickers, purchase prices, and holding periods.
+            stock_data (dict): Contains stock tickers, purchase prices, and holding periods,
+                and optionally "quantity" and "current_price" per ticker.
+            lots (TaxLots): Every lot of the portfolio; built from ``stock_data`` if omitted.
+            prices (dict): Sale price per ticker; defaults to "current_price" in ``stock_data``.
+            as_of: Sale date for the holding-period split; defaults to today.
+            sells (dict): Shares to sell per ticker; tickers not listed are sold in full.
+            quantities (dict): Shares held per ticker, used to build lots when ``lots``
+                is omitted; tickers without a known quantity get no figures.
 
         Returns:
             str: Suggested tax-efficient strategy.
@@ -36,15 +99,17 @@ class TaxAnalyser:
         if sell_stocks:
             stock_details = "\n".join(
                 f"{ticker}: Bought at {details.get('buy_price', 'N/A')} | Held for {details.get('holding_period', 'N/A')} months"
+                f" ({_term(details.get('holding_period'), as_of)})"
                 for ticker, details in sell_stocks.items()
             )
+            figures = self._lot_figures(list(sell_stocks), stock_data, lots, prices, as_of, sells, quantities)
 
             prompt = f"""
             You are a tax consultant specializing in capital gains tax strategies.
             The user has the following stocks recommended for selling:
 
             {stock_details}
-
+            {figures}
             Suggest the most tax-efficient way to sell these stocks, considering:
             - Long-term vs short-term capital gains taxes
             - FIFO vs LIFO strategies
@@ -64,15 +129,17 @@ class TaxAnalyser:
 
             stock_details = "\n".join(
                 f"{ticker}: Bought at {details.get('buy_price', 'N/A')} | Held for {details.get('holding_period', 'N/A')} months"
+                f" ({_term(details.get('holding_period'), as_of)})"
                 for ticker, details in fallback_stocks.items()
             )
+            figures = self._lot_figures(list(fallback_stocks), stock_data, lots, prices, as_of, sells, quantities)
 
             prompt = f"""
             No stocks are explicitly marked for selling, but the user may need to liquidate assets.
 
             The following stocks are marked as Hold/Buy:
             {stock_details}
-
+            {figures}
             Recommend which, if any, could be sold in a tax-efficient manner, considering:
             - Harvesting losses to offset gains
             - Optimizing for long-term capital gains
@@ -81,7 +148,49 @@ class TaxAnalyser:
             Provide a detailed recommendation.
             """
 
-        messages = [HumanMessage(content=prompt)]
-        response = self.llm.invoke(messages)
+        messages = [human_message(prompt)]
+        snapshot = snapshot_hash(recommendations, stock_data, figures)
+        return get_llm_cache().invoke(self.llm, messages, snapshot=snapshot, scope="tax_analysis")
 
-        return response.content if hasattr(response, "content") else str(response)
+    def _lot_figures(self, tickers: list, stock_data: dict, lots: TaxLots = None, prices: dict = None,
+                     as_of=None, sells: dict = None, quantities: dict = None) -> str:
+        """
+        Computes lot-level figures for selling ``sells`` shares of ``tickers``, or every share.
+
+        Returns:
+            str: A prompt section with the computed figures, or an empty string when
+                no sale prices are known or the engine cannot price the sale. Tickers
+                whose share count is unknown are named instead of being priced.
+        """
+        if prices is None:
+            prices = {
+                ticker: details["current_price"]
+                for ticker, details in stock_data.items() if details.get("current_price") is not None
+            }
+        tickers = [ticker for ticker in tickers if prices.get(ticker) is not None]
+        if not tickers:
+            return ""
+
+        unknown = []
+        try:
+            if lots is None:
+                lots = TaxLots.from_stock_data({t: stock_data[t] for t in tickers if t in stock_data}, quantities,
+                                               as_of=as_of)
+                unknown = [t for t in tickers
+                           if stock_data.get(t, {}).get("quantity", (quantities or {}).get(t)) is None]
+            held = lots.unrealized({ticker: prices[ticker] for ticker in tickers}, as_of)
+            if not held:
+                return _unpriced_note(unknown)
+            wanted = sells or {}
+            quantities = {ticker: min(wanted.get(ticker, r["quantity"]), r["quantity"]) for ticker, r in held.items()}
+            comparison = lots.compare_methods(quantities, prices, as_of)
+        except (KeyError, ValueError) as e:
+            print(f"Error computing tax lots: {e}")
+            return ""
+
+        return (
+            "\n            Computed figures for selling these positions (already calculated; explain them "
+            "rather than recalculating):\n"
+            f"{format_lot_figures(comparison, held)}\n"
+            f"{_unpriced_note(unknown)}"
+        )
@@ -0,0 +1,294 @@
+import numpy as np
+from tools.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Lot relief methods: which lots are sold first.
+RELIEF_METHODS = ("FIFO", "LIFO", "HIFO", "SPECIFIC")
+
+# A lot held for more than this many months, i.e. sold after the anniversary of
+# its purchase, produces a long-term gain.
+LONG_TERM_MONTHS = 12
+
+# Flat federal rates used for the tax estimate; callers can pass their own.
+SHORT_TERM_RATE = 0.24
+LONG_TERM_RATE = 0.15
+
+_DAYS_PER_MONTH = 365.25 / 12
+
+
+def _to_days(dates) -> np.ndarray:
+    return np.asarray(pd.to_datetime(dates)).astype("datetime64[D]").astype(np.int64)
+
+
+def _today() -> int:
+    return int(np.datetime64(pd.Timestamp.today().date(), "D").astype(np.int64))
+
+
+def _add_months(days, months) -> np.ndarray:
+    """Shifts dates (days since the epoch) by whole calendar months, clipping to the month's last day."""
+    dates = np.asarray(days, dtype=np.int64).astype("datetime64[D]")
+    month = dates.astype("datetime64[M]")
+    day = dates - month.astype("datetime64[D]")
+    target = month + np.asarray(months, dtype=np.int64)
+    length = (target + 1).astype("datetime64[D]") - target.astype("datetime64[D]")
+    return (target.astype("datetime64[D]") + np.minimum(day, length - 1)).astype(np.int64)
+
+
+def acquired_before(as_of: int, months) -> np.ndarray:
+    """
+    Purchase dates of holdings held for ``months`` (fractions allowed) on ``as_of``.
+
+    Whole months are counted in calendar months, the fraction in average-length days.
+
+    Args:
+        as_of (int): Reference date as days since the epoch.
+        months (array-like): Holding periods in months.
+
+    Returns:
+        np.ndarray: Purchase dates as days since the epoch.
+    """
+    months = np.asarray(months, dtype=float)
+    whole = np.floor(months)
+    return _add_months(as_of, -whole.astype(np.int64)) - np.round((months - whole) * _DAYS_PER_MONTH).astype(np.int64)
+
+
+def is_long_term(acquired, sold) -> np.ndarray:
+    """
+    Whether lots bought on ``acquired`` and sold on ``sold`` (days since the epoch) give
+    long-term gains: held past the anniversary of the purchase, so one year exactly is short-term.
+    """
+    return np.asarray(sold) > _add_months(acquired, LONG_TERM_MONTHS)
+
+
+def is_long_term_holding(holding_period, as_of=None) -> bool:
+    """
+    Whether selling a holding of ``holding_period`` months on ``as_of`` gives a long-term gain.
+
+    Uses the same dating as TaxLots.from_stock_data, so labels and lot figures agree.
+
+    Args:
+        holding_period: Months held (anything float() accepts).
+        as_of: Sale date; defaults to today.
+
+    Returns:
+        bool: True for a long-term holding.
+    """
+    today = _today() if as_of is None else int(_to_days([as_of])[0])
+    return bool(is_long_term(acquired_before(today, float(holding_period)), today))
+
+
+def estimate_tax(short_term_gain: float, long_term_gain: float, short_rate: float = SHORT_TERM_RATE,
+                 long_rate: float = LONG_TERM_RATE) -> float:
+    """
+    Estimates the tax on realized gains after netting losses across terms.
+
+    A net loss in one term offsets a net gain in the other; a net loss overall
+    produces no tax (the carry-forward and $3,000 deduction are not modelled).
+
+    Args:
+        short_term_gain (float): Net short-term gain (negative for a loss).
+        long_term_gain (float): Net long-term gain (negative for a loss).
+        short_rate (float): Tax rate on short-term gains.
+        long_rate (float): Tax rate on long-term gains.
+
+    Returns:
+        float: The estimated tax.
+    """
+    if short_term_gain < 0 <= long_term_gain:
+        long_term_gain, short_term_gain = max(long_term_gain + short_term_gain, 0.0), 0.0
+    elif long_term_gain < 0 <= short_term_gain:
+        short_term_gain, long_term_gain = max(short_term_gain + long_term_gain, 0.0), 0.0
+    return round(max(short_term_gain, 0.0) * short_rate + max(long_term_gain, 0.0) * long_rate, 2)
+
+
+class TaxLots:
+    def __init__(self, tickers, quantities, cost_basis, acquired, lot_ids=None):
+        """
+        Holds every tax lot of a portfolio as parallel NumPy arrays.
+
+        Args:
+            tickers (array-like): Ticker of each lot.
+            quantities (array-like): Shares in each lot.
+            cost_basis (array-like): Purchase price per share of each lot.
+            acquired (array-like): Purchase date of each lot (anything pd.to_datetime accepts).
+            lot_ids (array-like): Identifier of each lot, used for specific-ID relief.
+                Defaults to the lot's position.
+        """
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.quantities = np.asarray(quantities, dtype=float)
+        self.cost_basis = np.asarray(cost_basis, dtype=float)
+        self.acquired = _to_days(acquired)
+        self.lot_ids = np.asarray(lot_ids if lot_ids is not None else np.arange(len(self.tickers)), dtype=object)
+        self._codes, self._unique = pd.factorize(self.tickers)
+        self._index = {ticker: code for code, ticker in enumerate(self._unique)}
+
+    @classmethod
+    def from_frame(cls, df: "pd.DataFrame") -> "TaxLots":
+        """
+        Builds lots from a table with "Ticker", "Quantity", "Buy Price" and "Acquired"
+        columns, plus an optional "Lot" identifier column.
+        """
+        return cls(df["Ticker"], df["Quantity"], df["Buy Price"], df["Acquired"],
+                   df["Lot"] if "Lot" in df.columns else None)
+
+    @classmethod
+    def from_stock_data(cls, stock_data: dict, quantities: dict = None, as_of=None) -> "TaxLots":
+        """
+        Builds one lot per ticker from the ``{ticker: {"buy_price", "holding_period"}}``
+        dicts TaxAnalyser receives, dating each lot ``holding_period`` months before ``as_of``.
+
+        Args:
+            stock_data (dict): Buy price and holding period (months) per ticker; an
+                optional "quantity" entry overrides ``quantities``.
+            quantities (dict): Shares held per ticker, e.g. from Portfolio.position_quantities.
+            as_of: Reference date; defaults to today.
+
+        Returns:
+            TaxLots: One lot per ticker that has a buy price, holding period and
+                known quantity; tickers whose share count is unknown get no lot.
+        """
+        today = _today() if as_of is None else int(_to_days([as_of])[0])
+        quantities = quantities or {}
+        rows = [
+            (ticker, details.get("quantity", quantities.get(ticker)), details["buy_price"],
+             float(details["holding_period"]))
+            for ticker, details in stock_data.items()
+            if details.get("buy_price") is not None and details.get("holding_period") is not None
+        ]
+        rows = [row for row in rows if row[1] is not None]
+        tickers, qty, basis, months = zip(*rows) if rows else ((), (), (), ())
+        return cls(tickers, qty, basis, acquired_before(today, months).astype("datetime64[D]"))
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def _order(self, method: str) -> np.ndarray:
+        """Lot positions sorted by ticker, then by the order ``method`` sells them in."""
+        if method == "FIFO":
+            return np.lexsort((self.acquired, self._codes))
+        if method == "LIFO":
+            return np.lexsort((-self.acquired, self._codes))
+        if method == "HIFO":
+            return np.lexsort((self.acquired, -self.cost_basis, self._codes))
+        raise ValueError(f"Unknown relief method '{method}'; expected one of {', '.join(RELIEF_METHODS)}")
+
+    def _sell_array(self, sells: dict) -> np.ndarray:
+        wanted = np.zeros(len(self._unique))
+        for ticker, quantity in sells.items():
+            if ticker in self._index:
+                wanted[self._index[ticker]] = quantity
+        return wanted
+
+    def allocate(self, sells: dict, method: str = "FIFO", specific: dict = None) -> np.ndarray:
+        """
+        Works out how many shares are taken from each lot.
+
+        Every ticker is handled in the same vectorized pass: lots are sorted by ticker
+        and relief order, a running total of shares is taken per ticker, and each lot
+        contributes whatever is still needed after the lots before it.
+
+        Args:
+            sells (dict): Shares to sell per ticker (ignored for SPECIFIC).
+            method (str): "FIFO", "LIFO", "HIFO" or "SPECIFIC".
+            specific (dict): Lot id to shares sold from that lot, for SPECIFIC.
+
+        Returns:
+            np.ndarray: Shares sold from each lot, aligned with the lot arrays.
+        """
+        if method == "SPECIFIC":
+            requested = np.array([float((specific or {}).get(lot_id, 0)) for lot_id in self.lot_ids])
+            return np.minimum(requested, self.quantities)
+
+        if not len(self):
+            return np.zeros(0)
+
+        order = self._order(method)
+        codes = self._codes[order]
+        quantities = self.quantities[order]
+
+        held_before = np.cumsum(quantities) - quantities
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        held_before -= np.repeat(held_before[starts], np.diff(np.r_[starts, len(codes)]))
+
+        sold = np.empty(len(self))
+        sold[order] = np.clip(self._sell_array(sells)[codes] - held_before, 0, quantities)
+        return sold
+
+    def realize(self, sells: dict, prices: dict, method: str = "FIFO", as_of=None, specific: dict = None) -> dict:
+        """
+        Computes the realized gains of a sale under one relief method.
+
+        Args:
+            sells (dict): Shares to sell per ticker.
+            prices (dict): Sale price per ticker.
+            method (str): "FIFO", "LIFO", "HIFO" or "SPECIFIC".
+            as_of: Sale date; defaults to today.
+            specific (dict): Lot id to shares, for SPECIFIC.
+
+        Returns:
+            dict: Totals ("proceeds", "cost_basis", "short_term_gain", "long_term_gain",
+                "total_gain", "estimated_tax"), a per-ticker breakdown under "by_ticker"
+                and shares that could not be covered by lots under "unfilled".
+        """
+        sold = self.allocate(sells, method, specific)
+        today = _today() if as_of is None else int(_to_days([as_of])[0])
+
+        n = len(self._unique)
+        price = np.array([np.nan if prices.get(t) is None else prices[t] for t in self._unique], dtype=float)
+        missing = list(self._unique[np.isnan(price) & (np.bincount(self._codes, sold, n) > 0)])
+        if missing:
+            raise ValueError(f"No sale price for {', '.join(missing)}")
+
+        price = np.nan_to_num(price)[self._codes]
+        proceeds = sold * price
+        cost = sold * self.cost_basis
+        gain = proceeds - cost
+        long_term = is_long_term(self.acquired, today)
+
+        per_ticker = {
+            "quantity": np.bincount(self._codes, sold, n),
+            "proceeds": np.bincount(self._codes, proceeds, n),
+            "cost_basis": np.bincount(self._codes, cost, n),
+            "short_term_gain": np.bincount(self._codes, np.where(long_term, 0.0, gain), n),
+            "long_term_gain": np.bincount(self._codes, np.where(long_term, gain, 0.0), n),
+        }
+
+        requested = sells if method != "SPECIFIC" else {}
+        unfilled = {
+            ticker: float(quantity) - (float(per_ticker["quantity"][self._index[ticker]]) if ticker in self._index else 0.0)
+            for ticker, quantity in requested.items()
+        }
+
+        short_term, long_term_total = float(per_ticker["short_term_gain"].sum()), float(per_ticker["long_term_gain"].sum())
+        return {
+            "method": method,
+            "proceeds": round(float(proceeds.sum()), 2),
+            "cost_basis": round(float(cost.sum()), 2),
+            "short_term_gain": round(short_term, 2),
+            "long_term_gain": round(long_term_total, 2),
+            "total_gain": round(short_term + long_term_total, 2),
+            "estimated_tax": estimate_tax(short_term, long_term_total),
+            "by_ticker": {
+                ticker: {name: round(float(values[code]), 2) for name, values in per_ticker.items()}
+                for code, ticker in enumerate(self._unique) if per_ticker["quantity"][code] > 0
+            },
+            "unfilled": {ticker: qty for ticker, qty in unfilled.items() if qty > 1e-9},
+        }
+
+    def compare_methods(self, sells: dict, prices: dict, as_of=None, methods=("FIFO", "LIFO", "HIFO")) -> dict:
+        """Runs realize for each method; returns method name to result."""
+        return {method: self.realize(sells, prices, method, as_of) for method in methods}
+
+    def unrealized(self, prices: dict, as_of=None) -> dict:
+        """
+        Unrealized gain per ticker, split by term, for loss-harvesting decisions.
+
+        Returns:
+            dict: Ticker to {"quantity", "proceeds", "cost_basis", "short_term_gain",
+                "long_term_gain"} for every ticker with a known price.
+        """
+        priced = np.array([prices.get(ticker) is not None for ticker in self._unique], dtype=bool)
+        held = np.bincount(self._codes, self.quantities, len(self._unique))
+        sells = {ticker: held[code] for code, ticker in enumerate(self._unique) if priced[code] and held[code] > 0}
+        return self.realize(sells, prices, "FIFO", as_of)["by_ticker"]
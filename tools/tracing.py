@@ -0,0 +1,258 @@
+import contextvars
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+# Innermost open span of the current thread or asyncio task.
+_current = contextvars.ContextVar("current_span", default=None)
+_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "parent", "trace_id", "span_id", "attributes", "counters", "error",
+                 "started_at", "duration_ms", "_start", "_token")
+
+    def __init__(self, tracer, name: str, attributes: dict):
+        """
+        A timed stage of a request.
+
+        Counters recorded in a span are added to its parent when it ends, so the
+        root span of a trace holds the totals for the whole request.
+
+        Args:
+            tracer (Tracer): The tracer that emits the span when it ends.
+            name (str): Stage name, e.g. "classify_query" or "llm.invoke".
+            attributes (dict): Extra fields stored with the span.
+        """
+        self.tracer = tracer
+        self.name = name
+        self.parent = None
+        self.trace_id = None
+        self.span_id = next(_ids)
+        self.attributes = attributes
+        self.counters = {}
+        self.error = None
+        self.started_at = None
+        self.duration_ms = None
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self.trace_id = self.parent.trace_id if self.parent is not None else self.span_id
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        if exc is not None and self.error is None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Async generators can be closed from another context than the one they started in
+            _current.set(self.parent)
+
+        if self.parent is not None:
+            with self.tracer._lock:
+                for key, value in self.counters.items():
+                    self.parent.counters[key] = self.parent.counters.get(key, 0) + value
+        self.tracer.sink.emit(self.to_dict())
+        return False
+
+    def count(self, key: str, n: int = 1):
+        with self.tracer._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "attributes": self.attributes,
+            "counters": dict(self.counters),
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled so instrumented code pays almost nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def count(self, key: str, n: int = 1):
+        pass
+
+    def set(self, key: str, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class MemorySink:
+    """Keeps finished spans in a list, for tests and interactive inspection."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def emit(self, span: dict):
+        with self._lock:
+            self.spans.append(span)
+
+    def find(self, name: str) -> list:
+        """Returns every finished span with the given name, oldest first."""
+        with self._lock:
+            return [span for span in self.spans if span["name"] == name]
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+class JsonLogSink:
+    def __init__(self, stream=None, path: str = None):
+        """
+        Writes one JSON object per finished span.
+
+        Args:
+            stream: Text stream to write to; defaults to stderr.
+            path (str): File to append to instead of ``stream``.
+        """
+        self._owns_stream = path is not None
+        self.stream = open(path, "a") if path is not None else (stream or sys.stderr)
+        self._lock = threading.Lock()
+
+    def emit(self, span: dict):
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def close(self):
+        if self._owns_stream:
+            self.stream.close()
+
+
+class Tracer:
+    def __init__(self, sink):
+        """
+        Creates spans and hands them to ``sink`` when they end.
+
+        Args:
+            sink: Any object with an ``emit(span: dict)`` method, e.g. MemorySink or JsonLogSink.
+        """
+        self.sink = sink
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attributes) -> Span:
+        return Span(self, name, attributes)
+
+
+def _tracer_from_env():
+    path = os.getenv("TRACE_LOG")
+    if not path:
+        return None
+    return Tracer(JsonLogSink() if path == "-" else JsonLogSink(path=path))
+
+
+_tracer = _tracer_from_env()
+
+
+def get_tracer():
+    """Returns the process-wide tracer, or None while tracing is disabled."""
+    return _tracer
+
+
+def set_tracer(tracer):
+    """Replaces the process-wide tracer (None disables tracing) and returns the previous one."""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+def span(name: str, **attributes):
+    """
+    Opens a span around a stage of work; use as a context manager.
+
+    Args:
+        name (str): Stage name.
+        **attributes: Extra fields stored with the span.
+
+    Returns:
+        Span: A new span, or a shared no-op object while tracing is disabled.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP_SPAN
+    return Span(tracer, name, attributes)
+
+
+def traced(name: str = None):
+    """Decorator that runs every call of a function inside a span (named after the function by default)."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(key: str, n: int = 1):
+    """Adds ``n`` to a counter (network calls, cache hits, tokens...) of the current span."""
+    current = _current.get()
+    if current is not None:
+        current.count(key, n)
+
+
+def record_error(error):
+    """Attaches a handled error to the current span; errors that propagate are recorded automatically."""
+    current = _current.get()
+    if current is not None:
+        current.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+
+def current_span():
+    """Returns the innermost open span, or None."""
+    return _current.get()
+
+
+def bind(func):
+    """
+    Makes ``func`` record into the current span when it runs on another thread.
+
+    Thread pools do not inherit context variables, so work submitted to them
+    would otherwise start new, unrelated traces.
+    """
+    parent = _current.get()
+    if parent is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
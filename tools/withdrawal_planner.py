@@ -0,0 +1,261 @@
+import numpy as np
+
+# IRS Uniform Lifetime Table (used from 2022): distribution period by age.
+UNIFORM_LIFETIME_TABLE = {
+    72: 27.4, 73: 26.5, 74: 25.5, 75: 24.6, 76: 23.7, 77: 22.9, 78: 22.0, 79: 21.1, 80: 20.2,
+    81: 19.4, 82: 18.5, 83: 17.7, 84: 16.8, 85: 16.0, 86: 15.2, 87: 14.4, 88: 13.7, 89: 12.9,
+    90: 12.2, 91: 11.5, 92: 10.8, 93: 10.1, 94: 9.5, 95: 8.9, 96: 8.4, 97: 7.8, 98: 7.3, 99: 6.8,
+    100: 6.4, 101: 6.0, 102: 5.6, 103: 5.2, 104: 4.9, 105: 4.6, 106: 4.3, 107: 4.1, 108: 3.9,
+    109: 3.7, 110: 3.5, 111: 3.4, 112: 3.3, 113: 3.1, 114: 3.0, 115: 2.9, 116: 2.8, 117: 2.7,
+    118: 2.5, 119: 2.3, 120: 2.0,
+}
+
+# RMD starting age under SECURE 2.0 for people born 1951-1959 (75 from 1960).
+DEFAULT_RMD_START_AGE = 73
+
+# 2024 federal ordinary income brackets: (lower bound of taxable income, rate).
+TAX_BRACKETS = {
+    "single": [(0, 0.10), (11_600, 0.12), (47_150, 0.22), (100_525, 0.24), (191_950, 0.32), (243_725, 0.35),
+               (609_350, 0.37)],
+    "married": [(0, 0.10), (23_200, 0.12), (94_300, 0.22), (201_050, 0.24), (383_900, 0.32), (487_450, 0.35),
+                (731_200, 0.37)],
+}
+
+# 2024 standard deduction including the additional amount for filers aged 65+.
+STANDARD_DEDUCTION = {"single": 14_600 + 1_950, "married": 29_200 + 2 * 1_550}
+
+STRATEGIES = ("rmd", "fill_bracket", "fixed")
+
+DEFAULT_SCENARIOS = 5000
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+
+def distribution_period(ages) -> np.ndarray:
+    """Uniform Lifetime Table divisor for each age (ages past 120 use the age-120 value)."""
+    ages = np.clip(np.asarray(ages), min(UNIFORM_LIFETIME_TABLE), max(UNIFORM_LIFETIME_TABLE))
+    return np.vectorize(UNIFORM_LIFETIME_TABLE.get, otypes=[float])(ages)
+
+
+def required_minimum_distribution(balance, age: int, rmd_start_age: int = DEFAULT_RMD_START_AGE):
+    """
+    RMD for a year: the prior year-end balance divided by the age's distribution period.
+
+    Args:
+        balance (float or np.ndarray): Account balance at the end of the previous year.
+        age (int): Age reached during the distribution year.
+        rmd_start_age (int): First age an RMD is required.
+
+    Returns:
+        float or np.ndarray: The required distribution (0 before ``rmd_start_age``).
+    """
+    if age < rmd_start_age:
+        return np.zeros_like(balance, dtype=float) if isinstance(balance, np.ndarray) else 0.0
+    return balance / distribution_period(age)
+
+
+def bracket_tax(taxable_income: np.ndarray, brackets, scale: float = 1.0) -> np.ndarray:
+    """
+    Federal tax on taxable income for many scenarios at once.
+
+    Args:
+        taxable_income (np.ndarray): Taxable income per scenario.
+        brackets (list): (lower bound, rate) pairs in ascending order.
+        scale (float): Inflation factor applied to the bracket thresholds.
+
+    Returns:
+        np.ndarray: Tax per scenario.
+    """
+    lowers = np.array([lower for lower, _ in brackets], dtype=float) * scale
+    uppers = np.append(lowers[1:], np.inf)
+    rates = np.array([rate for _, rate in brackets])
+    income = np.asarray(taxable_income, dtype=float)[..., None]
+    return np.clip(income - lowers, 0, uppers - lowers) @ rates
+
+
+class WithdrawalPlanner:
+    def __init__(self, balance: float, age: int, years: int = 30, filing_status: str = "single",
+                 other_income: float = 0.0, strategy: str = "rmd", target_bracket: float = 0.22,
+                 annual_withdrawal: float = 0.0, rmd_start_age: int = DEFAULT_RMD_START_AGE,
+                 inflation: float = 0.025):
+        """
+        Initializes a multi-year IRA withdrawal planner.
+
+        Args:
+            balance (float): Current traditional IRA balance.
+            age (int): Age reached this year.
+            years (int): Number of years to plan.
+            filing_status (str): "single" or "married" (filing jointly).
+            other_income (float): Taxable income from other sources per year, in today's dollars.
+            strategy (str): "rmd" withdraws only the RMD; "fill_bracket" withdraws enough to
+                fill ``target_bracket``; "fixed" withdraws ``annual_withdrawal`` (inflation-adjusted).
+                The RMD is always the minimum.
+            target_bracket (float): Marginal rate whose bracket "fill_bracket" fills to the top.
+            annual_withdrawal (float): Yearly withdrawal in today's dollars for "fixed".
+            rmd_start_age (int): First age an RMD is required.
+            inflation (float): Yearly growth of brackets, deduction, other income and fixed withdrawals.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}'; expected one of {', '.join(STRATEGIES)}")
+        if filing_status not in TAX_BRACKETS:
+            raise ValueError(f"Unknown filing status '{filing_status}'; expected one of {', '.join(TAX_BRACKETS)}")
+
+        self.balance = float(balance)
+        self.age = int(age)
+        self.years = int(years)
+        self.filing_status = filing_status
+        self.other_income = float(other_income)
+        self.strategy = strategy
+        self.target_bracket = target_bracket
+        self.annual_withdrawal = float(annual_withdrawal)
+        self.rmd_start_age = rmd_start_age
+        self.inflation = inflation
+
+    @property
+    def ages(self) -> np.ndarray:
+        return self.age + np.arange(self.years)
+
+    def _bracket_top(self) -> float:
+        """Taxable income at the top of the target bracket, in today's dollars."""
+        brackets = TAX_BRACKETS[self.filing_status]
+        for (_, rate), (next_lower, _) in zip(brackets, brackets[1:]):
+            if rate == self.target_bracket:
+                return float(next_lower)
+        raise ValueError(f"No {self.target_bracket:.0%} bracket below the top rate for {self.filing_status} filers")
+
+    def _targets(self) -> np.ndarray:
+        """Withdrawal the strategy aims for each year before applying the RMD floor."""
+        scale = (1 + self.inflation) ** np.arange(self.years)
+        if self.strategy == "fixed":
+            return self.annual_withdrawal * scale
+        if self.strategy == "fill_bracket":
+            room = self._bracket_top() + STANDARD_DEDUCTION[self.filing_status] - self.other_income
+            return np.maximum(room, 0.0) * scale
+        return np.zeros(self.years)
+
+    def simulate(self, scenarios: int = DEFAULT_SCENARIOS, mean_return: float = 0.05, volatility: float = 0.12,
+                 seed: int = None, returns: np.ndarray = None) -> dict:
+        """
+        Simulates balances, withdrawals and taxes for every return scenario.
+
+        All scenarios advance together: each year is one set of array operations
+        over the whole (scenarios,) state, so the only Python-level loop is over the
+        years, whose balances depend on the previous year's withdrawal.
+
+        Args:
+            scenarios (int): Number of return paths.
+            mean_return (float): Mean yearly return.
+            volatility (float): Standard deviation of yearly returns.
+            seed (int): Random seed for reproducible paths.
+            returns (np.ndarray): Explicit (scenarios, years) returns, overriding the random draw.
+
+        Returns:
+            dict: (scenarios, years) arrays "start_balance", "rmd", "withdrawal", "tax"
+                and "end_balance", plus the "returns" used.
+        """
+        if returns is None:
+            returns = np.random.default_rng(seed).normal(mean_return, volatility, (scenarios, self.years))
+        returns = np.maximum(np.asarray(returns, dtype=float), -1.0)
+        scenarios = returns.shape[0]
+
+        shape = (scenarios, self.years)
+        start, rmd, withdrawal, tax, end = (np.empty(shape) for _ in range(5))
+        targets = self._targets()
+        brackets = TAX_BRACKETS[self.filing_status]
+        deduction = STANDARD_DEDUCTION[self.filing_status]
+
+        balance = np.full(scenarios, self.balance)
+        for year, age in enumerate(self.ages):
+            scale = (1 + self.inflation) ** year
+            start[:, year] = balance
+            rmd[:, year] = required_minimum_distribution(balance, int(age), self.rmd_start_age)
+            withdrawal[:, year] = np.minimum(np.maximum(rmd[:, year], targets[year]), balance)
+
+            taxable = np.maximum(self.other_income * scale + withdrawal[:, year] - deduction * scale, 0.0)
+            other_tax = bracket_tax(np.maximum(self.other_income * scale - deduction * scale, 0.0), brackets, scale)
+            tax[:, year] = np.maximum(bracket_tax(taxable, brackets, scale) - other_tax, 0.0)
+
+            balance = (balance - withdrawal[:, year]) * (1 + returns[:, year])
+            end[:, year] = balance
+
+        return {"start_balance": start, "rmd": rmd, "withdrawal": withdrawal, "tax": tax, "end_balance": end,
+                "returns": returns}
+
+    def plan(self, scenarios: int = DEFAULT_SCENARIOS, percentiles=DEFAULT_PERCENTILES, **simulate_kwargs) -> dict:
+        """
+        Runs the simulation and reduces it to percentile outcomes.
+
+        Args:
+            scenarios (int): Number of return paths.
+            percentiles (tuple): Percentiles to report (e.g. 10, 50, 90).
+            **simulate_kwargs: Passed to simulate (mean_return, volatility, seed, returns).
+
+        Returns:
+            dict: Inputs, "ages", per-year percentile paths under "yearly" (balance,
+                withdrawal, tax), totals under "totals", the first RMD and the share
+                of scenarios that empty the account.
+        """
+        result = self.simulate(scenarios, **simulate_kwargs)
+
+        def spread(values, axis=0):
+            return {p: np.round(np.percentile(values, p, axis=axis), 2).tolist() for p in percentiles}
+
+        first_rmd_year = np.flatnonzero(self.ages >= self.rmd_start_age)
+        return {
+            "strategy": self.strategy,
+            "filing_status": self.filing_status,
+            "scenarios": int(result["returns"].shape[0]),
+            "ages": self.ages.tolist(),
+            "yearly": {
+                "balance": spread(result["end_balance"]),
+                "withdrawal": spread(result["withdrawal"]),
+                "tax": spread(result["tax"]),
+            },
+            "totals": {
+                "withdrawn": spread(result["withdrawal"].sum(axis=1)),
+                "tax": spread(result["tax"].sum(axis=1)),
+                "final_balance": spread(result["end_balance"][:, -1]),
+            },
+            "first_rmd": {
+                "age": int(self.ages[first_rmd_year[0]]) if len(first_rmd_year) else None,
+                "amount": spread(result["rmd"][:, first_rmd_year[0]]) if len(first_rmd_year) else None,
+            },
+            "depletion_probability": round(float((result["end_balance"][:, -1] <= 0.01).mean()), 4),
+        }
+
+
+def summarize_plan(plan: dict) -> str:
+    """
+    Renders a plan as short plain text for the tax advisor's prompt.
+
+    Args:
+        plan (dict): Result of WithdrawalPlanner.plan.
+
+    Returns:
+        str: Key percentile outcomes, one per line.
+    """
+    percentiles = list(plan["totals"]["tax"])
+    low, mid, high = percentiles[0], percentiles[len(percentiles) // 2], percentiles[-1]
+    totals = plan["totals"]
+    ages = plan["ages"]
+
+    def band(values):
+        return f"{values[mid]:,.0f} (P{low} {values[low]:,.0f} – P{high} {values[high]:,.0f})"
+
+    lines = [
+        f"Strategy: {plan['strategy']} | filing status: {plan['filing_status']} | "
+        f"ages {ages[0]}–{ages[-1]} | {plan['scenarios']} return scenarios",
+        f"Total withdrawn (median): {band(totals['withdrawn'])}",
+        f"Total federal tax on withdrawals (median): {band(totals['tax'])}",
+        f"Final balance (median): {band(totals['final_balance'])}",
+        f"Probability the account is emptied: {plan['depletion_probability']:.1%}",
+    ]
+    if plan["first_rmd"]["age"] is not None:
+        lines.append(f"First RMD at age {plan['first_rmd']['age']}: {band(plan['first_rmd']['amount'])}")
+
+    yearly = plan["yearly"]
+    for i in range(0, len(ages), 5):
+        lines.append(
+            f"Age {ages[i]}: withdrawal {yearly['withdrawal'][mid][i]:,.0f}, tax {yearly['tax'][mid][i]:,.0f}, "
+            f"year-end balance {yearly['balance'][mid][i]:,.0f} (median)"
+        )
+    return "\n".join(lines)
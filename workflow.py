@@ -1,73 +1,227 @@
-from langgraph.graph import StateGraph
+import asyncio
+from functools import cached_property
 from pydantic import BaseModel
 from agents.stock_advisor import StockAdvisor
 from agents.tax_advisor import TaxAdvisor
-from openai import OpenAI
-from typing import Literal
+from typing import Literal, Optional
+from tools import tracing
+from tools.lazy import lazy_import
+from tools.llm_clients import SharedClient, get_llm_clients
+from tools.portfolio_calculator import calculate_portfolio_value
+from tools.query_classifier import QueryClassifier
+
+langgraph_graph = lazy_import("langgraph.graph")
+
+
+def _discard(task: asyncio.Task):
+    """Cancels a speculative task and retrieves its outcome so a failure is never reported as unhandled."""
+    task.cancel()
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
 
 
 class PortfolioState(BaseModel):
-    stock_question: str = None
+    question: str = None
+    query_type: str = None
+    portfolio_data: Optional[dict] = None
     stock_response: str = None
-    tax_question: str = None
     tax_response: str = None
+    response: str = None
+
+
+def classify_with_gpt4(openai_client: "OpenAI", query: str) -> Literal["stock", "tax"]:
+    """Asks GPT-4 whether a query is about stocks or taxes."""
+    system_prompt = (
+        "You are a classifier that determines whether a user query is about stocks or taxes. "
+        "Only respond with 'stock' or 'tax'."
+    )
+
+    tracing.count("network.openai")
+    response = openai_client.chat.completions.create(
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": query}
+        ],
+        max_tokens=1,
+        temperature=0
+    )
+
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        tracing.count("llm.prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+        tracing.count("llm.completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+    result = response.choices[0].message.content.strip().lower()
+    return "tax" if "tax" in result else "stock"
+
+
+def shared_classifier(api_key: str, threshold: float = 0.8) -> QueryClassifier:
+    """
+    A QueryClassifier that is not tied to one workflow, for passing to many.
+
+    Training the n-gram model takes tens of milliseconds, so callers that build
+    a workflow per portfolio train it once. Its GPT-4 fallback uses the shared
+    OpenAI client for ``api_key``.
+
+    Args:
+        api_key (str): OpenAI API key.
+        threshold (float): Local classifier confidence needed to skip GPT-4.
+    """
+    return QueryClassifier(
+        llm_classify=lambda query: classify_with_gpt4(get_llm_clients(api_key).openai(), query), threshold=threshold
+    )
 
 
 class PortfolioWorkflow:
-    def __init__(self, file_path: str, api_key: str):
+    openai_client = SharedClient("openai")
+
+    def __init__(self, file_path: str, api_key: str, classifier_threshold: float = 0.8,
+                 openai_client: "OpenAI" = None, tax_agent: TaxAdvisor = None, classifier: QueryClassifier = None):
+        """
+        Builds the agents for one portfolio file.
+
+        Args:
+            file_path (str): Path to the portfolio file.
+            api_key (str): OpenAI API key.
+            classifier_threshold (float): Local classifier confidence needed to skip GPT-4.
+            openai_client (OpenAI): Client for GPT-4 classification; defaults to the
+                shared client of get_llm_clients, created on first use.
+            tax_agent (TaxAdvisor): Tax agent to share with other workflows; created if omitted.
+            classifier (QueryClassifier): Query classifier to share with other workflows,
+                e.g. from shared_classifier; one is trained if omitted.
+        """
+        self.file_path = file_path
+        self.api_key = api_key
         self.stock_agent = StockAdvisor(file_path, api_key)
-        self.tax_agent = TaxAdvisor(api_key)
-        self.openai_client = OpenAI(api_key=api_key)
+        self.tax_agent = tax_agent or TaxAdvisor(api_key)
+        if openai_client is not None:
+            self.openai_client = openai_client
+        self.classifier = classifier or QueryClassifier(llm_classify=self.classify_with_llm,
+                                                        threshold=classifier_threshold)
 
-        # Setup stock workflow
-        stock_graph = StateGraph(PortfolioState)
-        stock_graph.add_node("fetch_stock_response", self.fetch_stock_response)
-        stock_graph.set_entry_point("fetch_stock_response")
-        self.stock_executor = stock_graph.compile()
+    @cached_property
+    def graph(self):
+        """The compiled routing graph, built on first use so LangGraph is not imported at start-up."""
+        # Single graph: route -> (load_portfolio -> stock) and/or tax -> merge.
+        # Mixed questions load the portfolio once, then run both agents in parallel.
+        graph = langgraph_graph.StateGraph(PortfolioState)
+        graph.add_node("route", self.route)
+        graph.add_node("load_portfolio", self.load_portfolio)
+        graph.add_node("stock", self.fetch_stock_response)
+        graph.add_node("tax", self.fetch_tax_response)
+        graph.add_node("merge", self.merge_responses)
 
-        # Setup tax workflow
-        tax_graph = StateGraph(PortfolioState)
-        tax_graph.add_node("fetch_tax_response", self.fetch_tax_response)
-        tax_graph.set_entry_point("fetch_tax_response")
-        self.tax_executor = tax_graph.compile()
+        graph.set_entry_point("route")
+        graph.add_conditional_edges(
+            "route",
+            lambda state: ["tax"] if state.query_type == "tax" else ["load_portfolio"],
+            ["load_portfolio", "tax"],
+        )
+        graph.add_conditional_edges(
+            "load_portfolio",
+            lambda state: ["stock", "tax"] if state.query_type == "both" else ["stock"],
+            ["stock", "tax"],
+        )
+        graph.add_edge("stock", "merge")
+        graph.add_edge("tax", "merge")
+        graph.set_finish_point("merge")
+        return graph.compile()
+
+    def route(self, state: PortfolioState) -> dict:
+        return {"query_type": state.query_type or self.route_query(state.question)}
 
-    def fetch_stock_response(self, state: PortfolioState) -> PortfolioState:
-        response = self.stock_agent.ask_stock_question(state.stock_question)
-        return PortfolioState(stock_question=state.stock_question, stock_response=response)
+    @tracing.traced("load_portfolio")
+    def load_portfolio(self, state: PortfolioState) -> dict:
+        if state.portfolio_data is not None:
+            return {}
+        return {"portfolio_data": calculate_portfolio_value(self.file_path)}
 
-    def fetch_tax_response(self, state: PortfolioState) -> PortfolioState:
-        response = self.tax_agent.ask_tax_question(state.tax_question)
-        return PortfolioState(tax_question=state.tax_question, tax_response=response)
+    @tracing.traced("stock_agent")
+    def fetch_stock_response(self, state: PortfolioState) -> dict:
+        response = self.stock_agent.ask_stock_question(state.question, state.portfolio_data)
+        return {"stock_response": response}
+
+    @tracing.traced("tax_agent")
+    def fetch_tax_response(self, state: PortfolioState) -> dict:
+        response = self.tax_agent.ask_tax_question(state.question)
+        return {"tax_response": response}
+
+    def merge_responses(self, state: PortfolioState) -> dict:
+        if state.stock_response and state.tax_response:
+            response = f"Portfolio:\n{state.stock_response}\n\nTax:\n{state.tax_response}"
+        else:
+            response = state.stock_response or state.tax_response
+        return {"response": response}
+
+    def route_query(self, query: str) -> Literal["stock", "tax", "both"]:
+        """Classifies the query, recognising mixed questions that need both agents."""
+        with tracing.span("classify_query") as span:
+            query_type = self.classifier.route(query)
+            span.set("query_type", query_type)
+            return query_type
 
     def classify_query(self, query: str) -> Literal["stock", "tax"]:
+        """Classifies the query locally, falling back to GPT-4 only when the local tiers are unsure."""
+        return self.classifier.classify(query)
+
+    def classify_with_llm(self, query: str) -> Literal["stock", "tax"]:
         """Uses GPT-4 to classify the query type."""
-        system_prompt = (
-            "You are a classifier that determines whether a user query is about stocks or taxes. "
-            "Only respond with 'stock' or 'tax'."
-        )
+        return classify_with_gpt4(self.openai_client, query)
 
-        response = self.openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ],
-            max_tokens=1,
-            temperature=0
-        )
+    def handle_query(self, question: str, portfolio_data: dict = None) -> str:
+        """
+        Routes the query through the workflow graph and returns the merged answer.
 
-        result = response.choices[0].message.content.strip().lower()
-        return "tax" if "tax" in result else "stock"
+        Args:
+            question (str): The user's question.
+            portfolio_data (dict): Already calculated portfolio value; fetched on demand if omitted.
+        """
+        with tracing.span("handle_query", question_chars=len(question)):
+            result = self.graph.invoke(PortfolioState(question=question, portfolio_data=portfolio_data))
+            return result["response"]
 
-    def handle_query(self, question: str) -> str:
-        """Routes query to the appropriate agent using GPT classification."""
-        query_type = self.classify_query(question)
+    async def ahandle_query(self, question: str):
+        """
+        Routes a query and streams the agent's answer as it is generated.
 
-        if query_type == "tax":
-            state = PortfolioState(tax_question=question)
-            result = self.tax_executor.invoke(state)
-            return result["tax_response"]
-        else:
-            state = PortfolioState(stock_question=question)
-            result = self.stock_executor.invoke(state)
-            return result["stock_response"]
+        When the rule and model tiers can decide the route, prices are only
+        fetched once it says the stock agent is needed, so tax questions never pay
+        for them. When routing has to ask the LLM, the price fetch starts first and
+        overlaps that round trip; it is cancelled if the answer is "tax". Mixed
+        questions run through the graph, which answers both parts in parallel, and
+        are yielded as a single merged chunk.
+
+        Args:
+            question (str): The user's question.
+
+        Yields:
+            str: Chunks of the answer as they arrive.
+        """
+        with tracing.span("ahandle_query", question_chars=len(question)):
+            prices = None
+            if self.classifier.needs_llm(question):
+                prices = asyncio.create_task(asyncio.to_thread(calculate_portfolio_value, self.file_path))
+            try:
+                query_type = await asyncio.to_thread(self.route_query, question)
+            except BaseException:
+                if prices is not None:
+                    _discard(prices)
+                raise
+
+            if query_type == "tax":
+                if prices is not None:
+                    _discard(prices)
+                stream = self.tax_agent.astream_tax_question(question)
+            else:
+                if prices is None:
+                    prices = asyncio.to_thread(calculate_portfolio_value, self.file_path)
+                portfolio_data = await prices
+                if query_type == "both":
+                    state = PortfolioState(question=question, query_type="both", portfolio_data=portfolio_data)
+                    result = await self.graph.ainvoke(state)
+                    yield result["response"]
+                    return
+                stream = self.stock_agent.astream_stock_question(question, portfolio_data)
+
+            async for token in stream:
+                yield token